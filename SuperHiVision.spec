@@ -10,7 +10,7 @@ a = Analysis(
     binaries=[],
     datas=[],
     hiddenimports=[
-        'cv2', 'PIL', 'numpy', 'pyaudio', 'wave', 'struct', 'math',
+        'cv2', 'PIL', 'numpy', 'pyaudio', 'wave', 'struct', 'math', 'mss',
         'PyQt5', 'PyQt5.QtCore', 'PyQt5.QtGui', 'PyQt5.QtWidgets',
     ],
     hookspath=[],
@@ -103,16 +103,6 @@ SUPPORTED_FORMATS = {
     "MOV": {"ext": "mov", "mime": "video/quicktime", "fourcc": "avc1"}
 }
 
-# 新增：支持的视频编码器
-SUPPORTED_CODECS = {
-    "H.264 (libx264)": "libx264",
-    "H.265/HEVC (libx265)": "libx265",
-    "MPEG-4 (mpeg4)": "mpeg4",
-    "VP8 (libvpx)": "libvpx",
-    "VP9 (libvpx-vp9)": "libvpx-vp9",
-    "AV1 (libaom-av1)": "libaom-av1"
-}
-
 # 新增：FPS选项
 FPS_OPTIONS = {
     "10 FPS (低功耗)": 10,
@@ -125,21 +115,13 @@ FPS_OPTIONS = {
     "120 FPS (电竞)": 120
 }
 
-# 新增：录制质量配置，包括蓝光选项
-QUALITY_PRESETS = {
-    "low": {"fps": 15, "bitrate": "500k", "crf": 30},
-    "medium": {"fps": 30, "bitrate": "2000k", "crf": 25},
-    "high": {"fps": 30, "bitrate": "5000k", "crf": 20},
-    "ultra": {"fps": 60, "bitrate": "10000k", "crf": 18},
-    "bluray": {"fps": 60, "bitrate": "25000k", "crf": 15}  # 蓝光配置
-}
-
 # 新增：性能优化配置
+# capture_ratio: 实际抓屏次数占输出帧数的比例，其余帧位重复写入（输出帧率不变）
 PERFORMANCE_OPTIONS = {
-    "low": {"compression": 0.7, "sleep_factor": 0.8, "frame_skip": 1},
-    "medium": {"compression": 0.8, "sleep_factor": 0.6, "frame_skip": 0},
-    "high": {"compression": 0.9, "sleep_factor": 0.4, "frame_skip": 0},
-    "ultra": {"compression": 1.0, "sleep_factor": 0.2, "frame_skip": 0}
+    "low": {"compression": 0.7, "capture_ratio": 0.5, "queue_size": 4},
+    "medium": {"compression": 0.8, "capture_ratio": 1.0, "queue_size": 8},
+    "high": {"compression": 0.9, "capture_ratio": 1.0, "queue_size": 12},
+    "ultra": {"compression": 1.0, "capture_ratio": 1.0, "queue_size": 16}
 }
 
 def check_audio_environment():
@@ -416,7 +398,8 @@ def install_packages():
         'opencv-python': 'cv2',
         'pygame': 'pygame',
         'pyautogui': 'pyautogui',
-        'pyaudio': 'pyaudio'
+        'pyaudio': 'pyaudio',
+        'mss': 'mss'
     }
     
     print("正在检查并安装必要的依赖包...")
@@ -525,18 +508,72 @@ except ImportError as e:
         print(f"❌ 最终导入失败: {final_import_error}")
         sys.exit(1)
 
-class DrawingTool:
-    """画图工具类"""
+# 屏幕捕获后端（Tk 版与 PyQt5 版共用）
+from capture_backends import CAPTURE_BACKENDS, create_capture_backend
+# 捕获/编码解耦的帧流水线
+from frame_pipeline import (
+    BACKPRESSURE_POLICIES, FramePool, FrameQueue, FrameEncoderThread, FramePacer, StaticFrameDetector
+)
+# 显示器布局服务（缓存屏幕尺寸，避免逐帧查询）
+from display_geometry import VIRTUAL_DESKTOP, VirtualDesktopCompositor, get_display_geometry, monitor_bbox
+from follow_camera import FOLLOW_CAMERA_MODES, FollowCamera
+from annotation_overlay import INK_LIFETIMES, AnnotationEditor, KeyPressOverlay, new_stroke, new_text
+# 异步截图服务（编码和写盘在后台线程完成）
+from screenshot_service import BURST_DURATIONS, BURST_INTERVALS, SCREENSHOT_FORMATS, BurstCapture, ScreenshotService
+# 即时回放（最近 N 秒的已编码片段保存在内存环形缓冲区）
+from replay_buffer import REPLAY_DURATIONS, ReplaySegmentEncoder
+# 音频流式落盘（内存占用与录制时长无关）
+from audio_spool import AudioSpool
+# 音视频同步（统一的会话时钟和音频漂移校正）
+from av_sync import AudioSyncer, SessionClock
+# 回调模式音频采集（不受视频循环占用 GIL 的影响）
+from audio_capture import CallbackAudioCapture
+# 视频编码后端（编码器与质量预设两个版本共用）
+from video_encoders import (
+    SUPPORTED_CODECS, QUALITY_PRESETS, FRAME_RATE_MODES, FFmpegPipeEncoder, OpenCVVideoEncoder,
+    codec_quality_args, negotiate_pixel_format, resolve_codec
+)
+
+# 按键显示名称（pynput 的 Key 名称 -> 显示文字），未列出的按首字母大写显示
+KEY_LABELS = {
+    "space": "Space", "enter": "Enter", "tab": "Tab", "backspace": "Backspace",
+    "delete": "Del", "esc": "Esc", "caps_lock": "CapsLock", "up": "Up", "down": "Down",
+    "left": "Left", "right": "Right", "page_up": "PgUp", "page_down": "PgDn",
+    "home": "Home", "end": "End", "insert": "Ins", "print_screen": "PrtSc"
+}
+
+# 修饰键（pynput 的 Key 名称前缀 -> 显示文字）
+MODIFIER_LABELS = {"ctrl": "Ctrl", "alt": "Alt", "shift": "Shift", "cmd": "Win"}
+
+
+def describe_key(key):
+    """把 pynput 按键转换为 (显示文字, 类型)，类型为 modifier / char / key"""
+    name = getattr(key, "name", None)
+    if name:
+        for prefix, label in MODIFIER_LABELS.items():
+            if name.startswith(prefix):
+                return label, "modifier"
+        return KEY_LABELS.get(name, name.capitalize()), "key"
+    char = getattr(key, "char", None)
+    if char:
+        if ord(char) < 32:
+            # 按住 Ctrl 时 pynput 给出的是控制字符
+            return chr(ord(char) + 64), "key"
+        return char.upper() if char.isalpha() else char, "char"
+    return f"<{getattr(key, 'vk', '?')}>", "key"
+
+
+class DrawingTool(AnnotationEditor):
+    """画图工具类（图形存储、撤销重做与渲染见 AnnotationEditor）"""
     def __init__(self, recorder):
+        super().__init__()
         self.recorder = recorder
         self.drawing = False
         self.last_x = None
         self.last_y = None
-        self.shapes = []  # 存储绘制的图形
         self.current_color = (255, 0, 0)  # 默认红色
         self.current_thickness = 3
-        self.current_tool = "pen"  # pen, rectangle, circle, text
-        self.temp_shape = None  # 临时图形，用于拖拽绘制
+        self.current_tool = "pen"  # pen, rectangle, circle, text, eraser
         self.drawing_window = None  # 延迟创建窗口
     
     def create_drawing_window(self):
@@ -546,7 +583,7 @@ class DrawingTool:
         
         self.drawing_window = tk.Toplevel(self.recorder.root)
         self.drawing_window.title("🎨 画图工具")
-        self.drawing_window.geometry("300x500")
+        self.drawing_window.geometry("300x570")
         self.drawing_window.configure(bg="#f0f0f0")
         self.drawing_window.attributes("-topmost", True)  # 窗口置顶
         
@@ -560,7 +597,8 @@ class DrawingTool:
             ("画笔", "pen"),
             ("矩形", "rectangle"),
             ("圆形", "circle"),
-            ("文字", "text")
+            ("文字", "text"),
+            ("橡皮擦", "eraser")
         ]
         
         for text, value in tools:
@@ -596,10 +634,27 @@ class DrawingTool:
         self.text_var = tk.StringVar(value="标注文字")
         tk.Entry(text_frame, textvariable=self.text_var).pack(fill=tk.X, padx=5, pady=5)
         
+        # 墨迹消退
+        lifetime_frame = tk.LabelFrame(self.drawing_window, text="墨迹消退", bg="#f0f0f0")
+        lifetime_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.lifetime_var = tk.StringVar(value=list(INK_LIFETIMES.keys())[0])
+        lifetime_combo = ttk.Combobox(lifetime_frame, textvariable=self.lifetime_var,
+                                      values=list(INK_LIFETIMES.keys()), state="readonly")
+        lifetime_combo.pack(fill=tk.X, padx=5, pady=5)
+        lifetime_combo.bind("<<ComboboxSelected>>", self.set_ink_lifetime)
+        
         # 控制按钮
         control_frame = tk.LabelFrame(self.drawing_window, text="控制", bg="#f0f0f0")
         control_frame.pack(fill=tk.X, padx=10, pady=5)
         
+        history_frame = tk.Frame(control_frame, bg="#f0f0f0")
+        history_frame.pack(fill=tk.X, padx=5, pady=5)
+        tk.Button(history_frame, text="撤销", bg="#95a5a6", fg="white",
+                 command=self.undo).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 3))
+        tk.Button(history_frame, text="重做", bg="#95a5a6", fg="white",
+                 command=self.redo).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(3, 0))
+        
         tk.Button(control_frame, text="清除所有", bg="#e74c3c", fg="white",
                  command=self.clear_all).pack(fill=tk.X, padx=5, pady=5)
         
@@ -610,6 +665,10 @@ class DrawingTool:
         """设置当前工具"""
         self.current_tool = self.tool_var.get()
     
+    def set_ink_lifetime(self, event=None):
+        """设置新墨迹的保留时间（0 为永久保留）"""
+        self.ink_lifetime = INK_LIFETIMES.get(self.lifetime_var.get(), 0)
+    
     def choose_color(self):
         """选择颜色"""
         color = colorchooser.askcolor(title="选择颜色")[0]
@@ -628,7 +687,14 @@ class DrawingTool:
         self.last_x = x
         self.last_y = y
         
-        if self.current_tool in ["rectangle", "circle"]:
+        if self.current_tool == "eraser":
+            # 橡皮擦按图形整体擦除
+            self.erase_at(x, y, max(4, self.current_thickness))
+        elif self.current_tool == "pen":
+            # 一笔的所有点保存在同一个图形中，松开鼠标后才提交
+            self.temp_shape = new_stroke(x, y, self.current_color, self.current_thickness)
+            self.version += 1
+        elif self.current_tool in ["rectangle", "circle"]:
             self.temp_shape = {
                 "type": self.current_tool,
                 "x1": x,
@@ -638,101 +704,44 @@ class DrawingTool:
                 "color": self.current_color,
                 "thickness": self.current_thickness
             }
+            self.version += 1
         elif self.current_tool == "text":
             # 添加文字
-            self.shapes.append({
-                "type": "text",
-                "x": x,
-                "y": y,
-                "text": self.text_var.get(),
-                "color": self.current_color,
-                "size": self.current_thickness * 5  # 文字大小基于线条粗细
-            })
+            # 文字大小基于线条粗细
+            self.commit_shape(new_text(x, y, self.text_var.get(), self.current_color,
+                                       self.current_thickness * 5))
     
     def draw(self, x, y):
         """绘制中"""
         if not self.drawing:
             return
             
-        if self.current_tool == "pen":
-            # 添加线条段
-            self.shapes.append({
-                "type": "line",
-                "x1": self.last_x,
-                "y1": self.last_y,
-                "x2": x,
-                "y2": y,
-                "color": self.current_color,
-                "thickness": self.current_thickness
-            })
+        if self.current_tool == "eraser":
+            self.erase_at(x, y, max(4, self.current_thickness))
+        elif self.current_tool == "pen" and self.temp_shape:
+            # 追加到当前笔画
+            if self.temp_shape["points"].append(x, y):
+                self.version += 1
             self.last_x = x
             self.last_y = y
         elif self.current_tool in ["rectangle", "circle"] and self.temp_shape:
             # 更新临时图形
             self.temp_shape["x2"] = x
             self.temp_shape["y2"] = y
+            self.version += 1
     
     def stop_drawing(self):
         """停止绘制"""
         self.drawing = False
         
-        # 如果是矩形或圆形，保存最终图形
+        # 保存最终图形（只有一个点的笔画不保存）
         if self.temp_shape:
-            self.shapes.append(self.temp_shape)
+            temp_shape = self.temp_shape
+            if temp_shape["type"] != "stroke" or len(temp_shape["points"]) > 1:
+                self.commit_shape(temp_shape)
             self.temp_shape = None
+            self.version += 1
     
-    def clear_all(self):
-        """清除所有绘制内容"""
-        self.shapes = []
-        self.temp_shape = None
-    
-    def apply_drawings(self, frame):
-        """将绘制的图形应用到帧上"""
-        # 创建一个可绘制的副本
-        frame_copy = frame.copy()
-        
-        # 绘制所有保存的图形
-        for shape in self.shapes:
-            if shape["type"] == "line":
-                cv2.line(frame_copy, 
-                        (shape["x1"], shape["y1"]), 
-                        (shape["x2"], shape["y2"]), 
-                        shape["color"], 
-                        shape["thickness"])
-            elif shape["type"] == "rectangle":
-                cv2.rectangle(frame_copy, 
-                             (shape["x1"], shape["y1"]), 
-                             (shape["x2"], shape["y2"]), 
-                             shape["color"], 
-                             shape["thickness"])
-            elif shape["type"] == "circle":
-                center = (shape["x1"], shape["y1"])
-                radius = int(math.sqrt((shape["x2"] - shape["x1"])**2 + 
-                                      (shape["y2"] - shape["y1"])** 2))
-                cv2.circle(frame_copy, center, radius, shape["color"], shape["thickness"])
-            elif shape["type"] == "text":
-                font = cv2.FONT_HERSHEY_SIMPLEX
-                cv2.putText(frame_copy, shape["text"], 
-                           (shape["x"], shape["y"]), 
-                           font, shape["size"] / 10,  # 调整字体大小
-                           shape["color"], shape["thickness"], cv2.LINE_AA)
-        
-        # 绘制临时图形（如果有）
-        if self.temp_shape:
-            if self.temp_shape["type"] == "rectangle":
-                cv2.rectangle(frame_copy, 
-                             (self.temp_shape["x1"], self.temp_shape["y1"]), 
-                             (self.temp_shape["x2"], self.temp_shape["y2"]), 
-                             self.temp_shape["color"], 
-                             self.temp_shape["thickness"])
-            elif self.temp_shape["type"] == "circle":
-                center = (self.temp_shape["x1"], self.temp_shape["y1"])
-                radius = int(math.sqrt((self.temp_shape["x2"] - self.temp_shape["x1"])**2 + 
-                                      (self.temp_shape["y2"] - self.temp_shape["y1"])** 2))
-                cv2.circle(frame_copy, center, radius, self.temp_shape["color"], self.temp_shape["thickness"])
-        
-        return frame_copy
-
 class MouseTracker:
     """鼠标跟踪器类"""
     def __init__(self):
@@ -744,6 +753,7 @@ class MouseTracker:
         self.tracking_area = None  # (x, y, width, height)
         self.mouse_listener = None
         self.is_tracking = False
+        self.geometry = get_display_geometry()
     
     def start_tracking(self):
         """开始跟踪鼠标"""
@@ -776,41 +786,13 @@ class MouseTracker:
         if not self.click_detected:
             return None
         
-        # 计算区域，确保在屏幕范围内
-        screen_width, screen_height = pyautogui.size()
-        
-        x1 = max(0, self.last_click_x - width // 2)
-        y1 = max(0, self.last_click_y - height // 2)
-        
-        # 调整区域确保不超出屏幕
-        if x1 + width > screen_width:
-            x1 = screen_width - width
-        if y1 + height > screen_height:
-            y1 = screen_height - height
-        
-        x1 = max(0, x1)
-        y1 = max(0, y1)
-        
-        self.tracking_area = (x1, y1, width, height)
+        # 计算区域，确保在屏幕范围内（屏幕尺寸取自缓存的显示器布局）
+        self.tracking_area = self.geometry.clamp_area(self.last_click_x, self.last_click_y, width, height)
         return self.tracking_area
     
     def get_tracking_area_around_cursor(self, width=800, height=600):
         """根据当前光标位置获取跟踪区域"""
-        screen_width, screen_height = pyautogui.size()
-        
-        x1 = max(0, self.current_x - width // 2)
-        y1 = max(0, self.current_y - height // 2)
-        
-        # 调整区域确保不超出屏幕
-        if x1 + width > screen_width:
-            x1 = screen_width - width
-        if y1 + height > screen_height:
-            y1 = screen_height - height
-        
-        x1 = max(0, x1)
-        y1 = max(0, y1)
-        
-        self.tracking_area = (x1, y1, width, height)
+        self.tracking_area = self.geometry.clamp_area(self.current_x, self.current_y, width, height)
         return self.tracking_area
 
 class ScreenRecorder:
@@ -821,16 +803,22 @@ class ScreenRecorder:
         self.paused = False
         self.video_writer = None
         self.audio_writer = None
-        self.audio_frames = []
+        self.audio_spool = None  # 未实时混流时音频流式写入临时 WAV，录制结束后合并
+        self.session_clock = None  # 录制会话时钟（扣除暂停时长），视频帧和音频块共用
+        self.audio_syncer = None  # 按会话时钟校正音频块的空缺和漂移
         self.mouse_tracker = MouseTracker()
         
         # 音频相关变量 - 默认开启录制声音
         self.record_audio = True  # 默认开启音频录制
         self.audio_enabled = False
         self.audio_thread = None
+        self.audio_capture = None  # 回调模式音频采集（环形缓冲区）
         self.audio_stop_event = threading.Event()
         self.audio_device_index = None  # 音频设备索引
         self.audio_devices = []  # 初始化音频设备列表
+        self.audio_channels = 1
+        self.audio_rate = 44100
+        self.live_audio_mux = True  # FFmpeg管道编码时音频实时混流，无需录制后合并
         
         # 录制参数 - 新增蓝光、格式、编码器和FPS选项
         self.quality = "high"  # 包括新增的bluray选项
@@ -841,15 +829,41 @@ class ScreenRecorder:
         self.output_file = None
         self.temp_audio_file = None
         
+        # 屏幕捕获后端（录制开始时创建，录制结束时关闭）
+        self.capture_backend_name = "auto"
+        self.capture_backend = None
+        self.pixel_format = "bgr"  # 捕获后端与编码器协商后的帧格式
+        self.needs_compression = False  # 仅OpenCV写入器的输出需要录制后再压缩
+        
+        # 捕获线程与编码线程之间的帧队列
+        self.backpressure_policy = "block"
+        self.frame_rate_mode = "cfr"  # vfr: 按抓取时间戳写帧（需要FFmpeg）
+        self.skip_static_frames = True  # 画面未变化时不再叠加和编码新帧
+        self.show_key_presses = False  # 在录制画面上显示按键
+        self.key_overlay = KeyPressOverlay()
+        self.static_detector = None
+        self.follow_camera_mode = "smooth"  # 跟随鼠标时的虚拟镜头模式
+        self.follow_camera = None
+        self.desktop_compositor = None  # 录制虚拟桌面（全部显示器）时使用
+        self.frame_pool = None
+        self.frame_queue = None
+        self.encoder_thread = None
+        
         # 性能优化变量
         self.frame_count = 0
-        self.last_frame_time = 0
         self.target_frame_time = 1.0 / self.fps
         self.performance_mode = "medium"  # 性能模式
-        self.frame_skip_counter = 0
+        self.frame_pacer = None  # 按截止时间调度抓屏，保持恒定帧率
         
         # 新增：临时截图文件管理
         self.temp_screenshots = []
+        self.screenshot_format = "png"
+        self.screenshot_service = ScreenshotService(os.path.join(self.output_dir, "Screenshots"),
+                                                    on_saved=self.on_screenshot_saved,
+                                                    on_error=self.on_screenshot_error)
+        self.burst = None  # 进行中的连拍
+        self.replay_mode = False  # 当前录制会话是即时回放缓冲，不写输出文件
+        self.replay_seconds = 60
         self.temp_dir = tempfile.mkdtemp(prefix="screen_recorder_")
         
         # 初始化音频设备
@@ -1184,10 +1198,41 @@ class ScreenRecorder:
                       font=("Segoe UI", 10),
                       command=self.update_area_mode).pack(side=tk.LEFT, padx=15)
         
+        # 全屏显示器选择
+        self.monitor_frame = tk.Frame(area_frame, bg="#16213e")
+        self.monitor_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        tk.Label(self.monitor_frame, text="显示器:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        self.monitor_choices = get_display_geometry().monitor_choices()
+        self.monitor_var = tk.StringVar(value=next(iter(self.monitor_choices)))
+        self.monitor_combo = ttk.Combobox(self.monitor_frame, textvariable=self.monitor_var,
+                                          values=list(self.monitor_choices.keys()), state="readonly", width=42,
+                                          postcommand=self.refresh_monitor_choices)
+        self.monitor_combo.pack(side=tk.LEFT, padx=(5,15))
+        
         # 自定义区域设置
         self.custom_frame = tk.Frame(area_frame, bg="#16213e")
         self.custom_frame.pack(fill=tk.X, padx=10, pady=5)
         
+        tk.Label(self.custom_frame, text="X:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        self.x_var = tk.StringVar(value="0")
+        x_entry = tk.Entry(self.custom_frame, textvariable=self.x_var, width=6,
+                          bg="#0f3460", fg="#ffffff",
+                          font=("Segoe UI", 10),
+                          insertbackground="#ffffff")
+        x_entry.pack(side=tk.LEFT, padx=(5,10))
+        
+        tk.Label(self.custom_frame, text="Y:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        self.y_var = tk.StringVar(value="0")
+        y_entry = tk.Entry(self.custom_frame, textvariable=self.y_var, width=6,
+                          bg="#0f3460", fg="#ffffff",
+                          font=("Segoe UI", 10),
+                          insertbackground="#ffffff")
+        y_entry.pack(side=tk.LEFT, padx=(5,15))
+        
         tk.Label(self.custom_frame, text="宽度:", bg="#16213e", fg="#a2a2a2",
                 font=("Segoe UI", 10)).pack(side=tk.LEFT)
         self.width_var = tk.StringVar(value="1920")
@@ -1236,6 +1281,13 @@ class ScreenRecorder:
                             insertbackground="#ffffff")
         fh_entry.pack(side=tk.LEFT, padx=(5,15))
         
+        tk.Label(self.follow_frame, text="镜头:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        self.follow_camera_var = tk.StringVar(value="平滑镜头 (smooth)")
+        follow_camera_combo = ttk.Combobox(self.follow_frame, textvariable=self.follow_camera_var,
+                                           values=list(FOLLOW_CAMERA_MODES.keys()), state="readonly", width=16)
+        follow_camera_combo.pack(side=tk.LEFT, padx=(5,15))
+        
         tk.Button(self.follow_frame, text="🧪 测试跟随", 
                  bg="#4ecca3", fg="#ffffff",
                  font=("Segoe UI", 10, "bold"),
@@ -1358,6 +1410,64 @@ class ScreenRecorder:
         fps_combo.pack(side=tk.LEFT, padx=(10,25))
         fps_combo.bind('<<ComboboxSelected>>', self.on_fps_change)
         
+        tk.Label(format_row2, text="捕获后端:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        self.capture_backend_var = tk.StringVar(value="自动 (auto)")
+        backend_combo = ttk.Combobox(format_row2, textvariable=self.capture_backend_var, 
+                                    values=list(CAPTURE_BACKENDS.keys()), state="readonly", width=20)
+        backend_combo.pack(side=tk.LEFT, padx=(10,0))
+        
+        # 帧队列背压策略
+        format_row3 = tk.Frame(format_frame, bg="#16213e")
+        format_row3.pack(fill=tk.X, padx=10, pady=8)
+        
+        tk.Label(format_row3, text="队列满时:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        self.backpressure_var = tk.StringVar(value="阻塞等待 (block)")
+        backpressure_combo = ttk.Combobox(format_row3, textvariable=self.backpressure_var, 
+                                         values=list(BACKPRESSURE_POLICIES.keys()), state="readonly", width=20)
+        backpressure_combo.pack(side=tk.LEFT, padx=(10,0))
+        
+        tk.Label(format_row3, text="帧率模式:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT, padx=(20,0))
+        self.frame_rate_mode_var = tk.StringVar(value="恒定帧率 (CFR)")
+        frame_rate_mode_combo = ttk.Combobox(format_row3, textvariable=self.frame_rate_mode_var, 
+                                            values=list(FRAME_RATE_MODES.keys()), state="readonly", width=15)
+        frame_rate_mode_combo.pack(side=tk.LEFT, padx=(10,0))
+        
+        # 截图格式
+        format_row4 = tk.Frame(format_frame, bg="#16213e")
+        format_row4.pack(fill=tk.X, padx=10, pady=8)
+        
+        tk.Label(format_row4, text="截图格式:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        self.screenshot_format_var = tk.StringVar(value="PNG (无损)")
+        screenshot_format_combo = ttk.Combobox(format_row4, textvariable=self.screenshot_format_var, 
+                                              values=list(SCREENSHOT_FORMATS.keys()), state="readonly", width=20)
+        screenshot_format_combo.pack(side=tk.LEFT, padx=(10,0))
+        screenshot_format_combo.bind('<<ComboboxSelected>>', self.on_screenshot_format_change)
+        
+        tk.Label(format_row4, text="连拍:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT, padx=(20,0))
+        self.burst_interval_var = tk.StringVar(value="每 200 毫秒")
+        ttk.Combobox(format_row4, textvariable=self.burst_interval_var, 
+                    values=list(BURST_INTERVALS.keys()), state="readonly", width=12).pack(side=tk.LEFT, padx=(10,0))
+        self.burst_duration_var = tk.StringVar(value="10 秒")
+        ttk.Combobox(format_row4, textvariable=self.burst_duration_var, 
+                    values=list(BURST_DURATIONS.keys()), state="readonly", width=8).pack(side=tk.LEFT, padx=(5,0))
+        
+        # 即时回放
+        format_row5 = tk.Frame(format_frame, bg="#16213e")
+        format_row5.pack(fill=tk.X, padx=10, pady=8)
+        
+        tk.Label(format_row5, text="即时回放:", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 10)).pack(side=tk.LEFT)
+        self.replay_duration_var = tk.StringVar(value="最近 1 分钟")
+        ttk.Combobox(format_row5, textvariable=self.replay_duration_var, 
+                    values=list(REPLAY_DURATIONS.keys()), state="readonly", width=12).pack(side=tk.LEFT, padx=(10,0))
+        tk.Label(format_row5, text="F7 开启/关闭缓冲，F6 保存", bg="#16213e", fg="#a2a2a2",
+                font=("Segoe UI", 9)).pack(side=tk.LEFT, padx=(10,0))
+        
         # 质量设置
         quality_frame = tk.LabelFrame(parent, text="📊 录制质量", 
                                     font=("Segoe UI", 12, "bold"), 
@@ -1413,6 +1523,25 @@ class ScreenRecorder:
                           font=("Segoe UI", 10),
                           command=self.update_performance).pack(anchor=tk.W, pady=2)
         
+        self.skip_static_var = tk.BooleanVar(value=self.skip_static_frames)
+        tk.Checkbutton(perf_frame, text="💤 跳过静止画面（画面无变化时重复上一帧，节省编码CPU）",
+                      variable=self.skip_static_var,
+                      bg="#16213e", fg="#ffffff",
+                      selectcolor="#0f3460",
+                      activebackground="#16213e",
+                      activeforeground="#e94560",
+                      font=("Segoe UI", 10)).pack(anchor=tk.W, pady=(8, 2))
+        
+        self.show_keys_var = tk.BooleanVar(value=self.show_key_presses)
+        tk.Checkbutton(perf_frame, text="⌨️ 显示按键（在录制画面左下角显示按下的按键）",
+                      variable=self.show_keys_var,
+                      bg="#16213e", fg="#ffffff",
+                      selectcolor="#0f3460",
+                      activebackground="#16213e",
+                      activeforeground="#e94560",
+                      font=("Segoe UI", 10),
+                      command=self.toggle_key_overlay).pack(anchor=tk.W, pady=2)
+        
         # 画图工具按钮
         drawing_frame = tk.Frame(parent, bg="#16213e")
         drawing_frame.pack(fill=tk.X, padx=15, pady=10)
@@ -1448,6 +1577,16 @@ class ScreenRecorder:
                                     command=self.toggle_audio_recording)
         audio_switch.pack(anchor=tk.W)
         
+        self.live_mux_var = tk.BooleanVar(value=self.live_audio_mux)
+        live_mux_switch = tk.Checkbutton(switch_frame, text="⚡ 实时混流（录制时直接写入视频文件，无需录制后合并）", 
+                                       variable=self.live_mux_var,
+                                       bg="#16213e", fg="#ffffff",
+                                       selectcolor="#0f3460",
+                                       activebackground="#16213e",
+                                       activeforeground="#e94560",
+                                       font=("Segoe UI", 10))
+        live_mux_switch.pack(anchor=tk.W)
+        
         # 音频设备选择
         device_frame = tk.LabelFrame(parent, text="🎤 音频设备", 
                                    font=("Segoe UI", 12, "bold"), 
@@ -1524,6 +1663,9 @@ class ScreenRecorder:
 • F9  - 开始/暂停录制
 • F10 - 停止录制
 • F11 - 截图（录制中也可用）
+• F8  - 开始/停止连拍（按设置的间隔和时长连续截图）
+• F7  - 开启/关闭即时回放缓冲（后台保留最近 N 秒）
+• F6  - 保存即时回放（不重新编码，立即写出文件）
 • F12 - 显示/隐藏画图工具
 
 🎨 画图工具热键：
@@ -1722,21 +1864,51 @@ class ScreenRecorder:
                                   font=("Segoe UI", 9),
                                   bg="#1a1a2e", fg="#a2a2a2")
         screenshot_hint.pack(side=tk.LEFT)
+        
+        # 连拍按钮
+        self.burst_button = tk.Button(button_container, text="🎞️ 连拍", 
+                                    font=("Segoe UI", 11, "bold"), 
+                                    bg="#8e44ad", fg="#ffffff",
+                                    padx=18, pady=10,
+                                    cursor="hand2",
+                                    activebackground="#a569bd",
+                                    activeforeground="#ffffff",
+                                    relief="flat",
+                                    command=self.toggle_burst)
+        self.burst_button.pack(side=tk.LEFT, padx=8)
+        
+        burst_hint = tk.Label(button_container, text="F8",
+                             font=("Segoe UI", 9),
+                             bg="#1a1a2e", fg="#a2a2a2")
+        burst_hint.pack(side=tk.LEFT)
     
     def update_area_mode(self):
         """更新区域模式显示"""
         mode = self.area_mode.get()
         
         # 隐藏所有区域设置框架
+        self.monitor_frame.pack_forget()
         self.custom_frame.pack_forget()
         self.follow_frame.pack_forget()
         
         # 显示对应的设置框架
-        if mode == "custom":
+        if mode == "fullscreen":
+            self.monitor_frame.pack(fill=tk.X, padx=10, pady=5)
+        elif mode == "custom":
             self.custom_frame.pack(fill=tk.X, padx=10, pady=5)
         elif mode == "follow_mouse":
             self.follow_frame.pack(fill=tk.X, padx=10, pady=5)
     
+    def refresh_monitor_choices(self):
+        """展开显示器列表时按最新的显示器布局刷新选项"""
+        selected = self.monitor_choices.get(self.monitor_var.get(), 0)
+        self.monitor_choices = get_display_geometry().monitor_choices()
+        self.monitor_combo["values"] = list(self.monitor_choices.keys())
+        # 尽量保持原来选择的显示器，已不存在时回到主显示器
+        label = next((name for name, value in self.monitor_choices.items() if value == selected),
+                     next(iter(self.monitor_choices)))
+        self.monitor_var.set(label)
+    
     def update_quality(self):
         """更新质量设置"""
         quality = self.quality_var.get()
@@ -1926,11 +2098,19 @@ class ScreenRecorder:
         """应用热键设置"""
         messagebox.showinfo("热键设置", "热键设置已应用！\n\n注意：部分热键可能需要重启程序才能生效")
     
+    def toggle_key_overlay(self):
+        """切换录制画面上的按键显示"""
+        self.show_key_presses = self.show_keys_var.get()
+        if not self.show_key_presses:
+            self.key_overlay.clear()
+    
     def setup_hotkeys(self):
         """设置热键监听"""
         try:
             # 创建键盘监听器
             def on_press(key):
+                if self.show_key_presses:
+                    self.key_overlay.press(*describe_key(key))
                 try:
                     if hasattr(key, 'char') and key.char:
                         key_char = key.char.lower()
@@ -1951,6 +2131,12 @@ class ScreenRecorder:
                         self.stop_recording()
                     elif key == keyboard.Key.f11:
                         self.take_screenshot()
+                    elif key == keyboard.Key.f8:
+                        self.toggle_burst()
+                    elif key == keyboard.Key.f7:
+                        self.toggle_replay()
+                    elif key == keyboard.Key.f6:
+                        self.save_replay()
                     elif key == keyboard.Key.f12:
                         self.open_drawing_tool()
                         
@@ -1958,7 +2144,12 @@ class ScreenRecorder:
                     print(f"热键处理错误: {e}")
             
             # 启动监听器
-            self.keyboard_listener = keyboard.Listener(on_press=on_press)
+            def on_release(key):
+                label, kind = describe_key(key)
+                if kind == "modifier":
+                    self.key_overlay.release(label)
+            
+            self.keyboard_listener = keyboard.Listener(on_press=on_press, on_release=on_release)
             self.keyboard_listener.start()
             print("✅ 热键监听器已启动")
             
@@ -1986,22 +2177,65 @@ class ScreenRecorder:
             # 获取录制参数
             self.get_recording_params()
             
-            # 创建输出文件
-            self.create_output_file()
+            # 创建输出文件（即时回放只在保存时写文件）
+            if self.replay_mode:
+                self.output_file = None
+            else:
+                self.create_output_file()
+            
+            # 创建捕获后端（整个录制过程复用同一个连接）
+            self.capture_backend = create_capture_backend(self.capture_backend_name, size=self.area_size)
+            if self.recording_area is None:
+                # 全屏时以后端实际抓到的尺寸为准（高DPI下可能与逻辑分辨率不同）
+                self.area_size = self.capture_backend.screen_size()
             
             # 初始化视频写入器
             if not self.init_video_writer():
                 return
             
-            # 启动音频录制（如果启用）
-            if self.record_audio and AUDIO_SUPPORT:
+            # 启动编码线程，捕获线程只负责抓屏入队
+            # 缓冲池大小 = 队列长度 + 正在抓取的一帧 + 正在编码的一帧 + 编码线程保留的上一帧
+            performance_config = PERFORMANCE_OPTIONS.get(self.performance_mode, PERFORMANCE_OPTIONS["medium"])
+            queue_size = performance_config["queue_size"]
+            self.frame_pool = FramePool(queue_size + 3)
+            self.frame_queue = FrameQueue(queue_size, self.backpressure_policy,
+                                          on_drop=self.frame_pool.release)
+            self.encoder_thread = FrameEncoderThread(self.frame_queue, self.video_writer.write,
+                                                     process=self.apply_overlays,
+                                                     release=self.frame_pool.release)
+            self.encoder_thread.start()
+            self.session_clock = SessionClock()
+            self.frame_pacer = FramePacer(self.fps, performance_config["capture_ratio"],
+                                          clock=self.session_clock.now)
+            self.static_detector = StaticFrameDetector() if self.skip_static_frames else None
+            if self.recording_area == "follow":
+                self.follow_camera = FollowCamera(self.area_size[0], self.area_size[1],
+                                                  self.follow_camera_mode, self.mouse_tracker.geometry)
+            else:
+                self.follow_camera = None
+            if self.recording_area == "desktop":
+                self.desktop_compositor = VirtualDesktopCompositor(self.mouse_tracker.geometry)
+            else:
+                self.desktop_compositor = None
+            
+            # 会话时间轴从这里开始，视频第一帧和音频第一个采样都对应会话时刻 0
+            self.session_clock.start()
+            
+            # 启动音频录制（如果启用；即时回放只缓冲视频）
+            self.audio_spool = None
+            self.audio_syncer = None
+            if self.record_audio and AUDIO_SUPPORT and not self.replay_mode:
+                if not self.live_audio_active():
+                    self.audio_spool = AudioSpool(os.path.join(self.temp_dir, "temp_audio.wav"),
+                                                  self.audio_rate, self.audio_channels)
+                # 音视频偏差控制在半帧以内
+                self.audio_syncer = AudioSyncer(self.audio_rate, self.audio_channels, tolerance=0.5 / self.fps)
                 self.start_audio_recording()
             
             # 更新状态
             self.recording = True
             self.paused = False
             self.recording_start_time = time.time()
-            self.last_frame_time = time.time()
             self.frame_count = 0
             
             # 更新UI（使用after确保在主线程）
@@ -2014,11 +2248,18 @@ class ScreenRecorder:
             # 启动计时器
             self.start_timer()
             
-            print("🎬 开始屏幕录制...")
+            if self.replay_mode:
+                print(f"⏪ 即时回放缓冲已开启（最近 {self.replay_seconds} 秒）")
+            else:
+                print("🎬 开始屏幕录制...")
             
         except Exception as e:
             # 使用after确保错误消息在主线程显示
             self.root.after(0, lambda err=str(e): messagebox.showerror("录制错误", f"开始录制失败: {err}"))
+            self.stop_audio_recording()
+            if self.audio_spool is not None:
+                self.audio_spool.close()
+                self.audio_spool = None
             self.cleanup_recording()
     
     def pause_recording(self):
@@ -2029,16 +2270,21 @@ class ScreenRecorder:
         self.paused = not self.paused
         
         if self.paused:
-            # 暂停音频录制
+            # 冻结会话时间轴，暂停期间既不产生帧位也不接收音频
+            self.session_clock.pause()
+            
+            # 暂停音频录制（关闭音频流，恢复时重新打开）
             if self.audio_enabled:
-                self.audio_stop_event.set()
+                self.stop_audio_recording()
             
             # 使用after确保UI更新在主线程
             self.root.after(0, lambda: self.pause_button.config(text="▶️ 恢复录制 (F9)", bg="#27ae60"))
             self.root.after(0, lambda: self.recording_status_var.set("⏸️ 录制已暂停"))
             print("⏸️ 录制暂停")
         else:
-            # 恢复音频录制
+            self.session_clock.resume()
+            
+            # 恢复音频录制（新音频流的第一块按会话时刻对齐，启动延迟用静音补齐）
             if self.record_audio and AUDIO_SUPPORT and not self.audio_enabled:
                 self.start_audio_recording()
             
@@ -2060,9 +2306,17 @@ class ScreenRecorder:
         # 更新状态
         self.recording = False
         self.paused = False
+        if self.session_clock:
+            # 暂停中停止时让调度器的等待结束
+            self.session_clock.resume()
         
         # 停止音频录制
         self.stop_audio_recording()
+        if self.audio_syncer:
+            sync_stats = self.audio_syncer.stats()
+            print(f"📊 音视频同步统计: 补静音 {sync_stats['padded']:.2f}s, 丢弃 {sync_stats['dropped']:.2f}s, "
+                  f"重采样修正 {sync_stats['stretched'] * 1000:.0f}ms, "
+                  f"最大偏差 {sync_stats['max_drift'] * 1000:.0f}ms")
         
         # 等待录制线程结束
         if hasattr(self, 'recording_thread') and self.recording_thread.is_alive():
@@ -2071,17 +2325,29 @@ class ScreenRecorder:
         # 清理资源
         self.cleanup_recording()
         
-        # 合并音视频（如果录制了音频）
-        if self.record_audio and AUDIO_SUPPORT and self.audio_frames:
-            self.merge_audio_video()
-        
-        # 视频压缩处理
-        if self.output_file and os.path.exists(self.output_file):
+        # 合并音视频（实时混流时音频已写入视频文件，不使用音频缓存文件）
+        if self.audio_spool is not None:
+            self.audio_spool.close()
+            spool_stats = self.audio_spool.stats()
+            print(f"📊 音频落盘统计: {spool_stats['seconds']:.1f}s, 溢出 {spool_stats['overflows']} 次, "
+                  f"缓冲区最高占用 {spool_stats['max_fill'] * 100:.0f}%")
+            if spool_stats['bytes']:
+                self.merge_audio_video()
+            self.audio_spool = None
+            self.cleanup_temp_files()
+        
+        # 视频压缩处理（FFmpeg管道已按质量预设一次编码完成，无需二次压缩）
+        if self.needs_compression and self.output_file and os.path.exists(self.output_file):
             self.compress_video()
         
         # 更新UI（使用after确保在主线程）
         self.root.after(0, self.update_ui_for_stopped)
         
+        if self.replay_mode:
+            self.replay_mode = False
+            print("⏪ 即时回放缓冲已关闭")
+            return
+        
         # 显示完成消息（使用after确保在主线程）
         self.root.after(0, self.show_completion_message)
     
@@ -2102,13 +2368,26 @@ class ScreenRecorder:
         # 获取录制区域
         mode = self.area_mode.get()
         if mode == "fullscreen":
-            self.recording_area = None  # 全屏
-            self.area_size = pyautogui.size()
+            geometry = get_display_geometry()
+            monitors = geometry.monitors()
+            monitor = self.monitor_choices.get(self.monitor_var.get(), 0)
+            if monitor == VIRTUAL_DESKTOP:
+                self.recording_area = "desktop"  # 特殊标记：所有显示器合成一帧
+                left, top, right, bottom = geometry.virtual_bounds()
+                self.area_size = (right - left, bottom - top)
+            elif monitor == 0 or monitor >= len(monitors):
+                self.recording_area = None  # 主显示器全屏
+                self.area_size = geometry.screen_size()
+            else:
+                self.recording_area = monitor_bbox(monitors[monitor])
+                self.area_size = (monitors[monitor]["width"], monitors[monitor]["height"])
         elif mode == "custom":
             try:
+                x = int(self.x_var.get())
+                y = int(self.y_var.get())
                 width = int(self.width_var.get())
                 height = int(self.height_var.get())
-                self.recording_area = (0, 0, width, height)  # 从左上角开始
+                self.recording_area = (x, y, x + width, y + height)
                 self.area_size = (width, height)
             except ValueError:
                 messagebox.showerror("错误", "请输入有效的宽度和高度数值")
@@ -2129,6 +2408,12 @@ class ScreenRecorder:
         self.fps = FPS_OPTIONS.get(self.fps_var.get(), 30)
         self.codec = SUPPORTED_CODECS.get(self.codec_var.get(), "libx264")
         self.performance_mode = self.performance_var.get()
+        self.capture_backend_name = CAPTURE_BACKENDS.get(self.capture_backend_var.get(), "auto")
+        self.backpressure_policy = BACKPRESSURE_POLICIES.get(self.backpressure_var.get(), "block")
+        self.live_audio_mux = self.live_mux_var.get()
+        self.frame_rate_mode = FRAME_RATE_MODES.get(self.frame_rate_mode_var.get(), "cfr")
+        self.skip_static_frames = self.skip_static_var.get()
+        self.follow_camera_mode = FOLLOW_CAMERA_MODES.get(self.follow_camera_var.get(), "smooth")
         
         print(f"📊 录制参数: {self.area_size}, FPS: {self.fps}, 质量: {self.quality}")
     
@@ -2173,17 +2458,61 @@ class ScreenRecorder:
     def init_video_writer(self):
         """初始化视频写入器"""
         try:
-            # 获取FourCC编码
-            format_info = SUPPORTED_FORMATS.get(self.format, SUPPORTED_FORMATS["MP4"])
-            fourcc = cv2.VideoWriter_fourcc(*format_info["fourcc"])
-            
-            # 创建视频写入器
-            self.video_writer = cv2.VideoWriter(
-                self.output_file,
-                fourcc,
-                self.fps,
-                self.area_size
-            )
+            if self.replay_mode:
+                # 即时回放：分段编码到内存环形缓冲区，保存时直接重新封装
+                self.pixel_format = negotiate_pixel_format(
+                    self.capture_backend.native_format, ReplaySegmentEncoder.accepted_formats
+                )
+                preset = QUALITY_PRESETS.get(self.quality, QUALITY_PRESETS["medium"])
+                self.video_writer = ReplaySegmentEncoder(
+                    self.temp_dir,
+                    self.area_size,
+                    self.fps,
+                    pixel_format=self.pixel_format,
+                    crf=preset["crf"],
+                    bitrate=preset["bitrate"],
+                    seconds=self.replay_seconds,
+                    vfr=self.frame_rate_mode == "vfr"
+                )
+            elif FFMPEG_AVAILABLE:
+                # FFmpeg管道可直接接收捕获后端的原生帧格式（如BGRA），省去颜色转换
+                self.pixel_format = negotiate_pixel_format(
+                    self.capture_backend.native_format, FFmpegPipeEncoder.accepted_formats
+                )
+                # 按所选编码器和质量预设一次编码出最终文件
+                preset = QUALITY_PRESETS.get(self.quality, QUALITY_PRESETS["medium"])
+                # 实时混流：音频作为 FFmpeg 的第二路输入，边录边编码
+                audio_format = None
+                if self.live_audio_mux and self.record_audio and AUDIO_SUPPORT:
+                    audio_format = {"rate": self.audio_rate, "channels": self.audio_channels}
+                self.video_writer = FFmpegPipeEncoder(
+                    self.output_file,
+                    self.area_size,
+                    self.fps,
+                    pixel_format=self.pixel_format,
+                    codec=self.codec,
+                    crf=preset["crf"],
+                    bitrate=preset["bitrate"],
+                    audio_format=audio_format,
+                    vfr=self.frame_rate_mode == "vfr"
+                )
+            else:
+                # 获取FourCC编码
+                format_info = SUPPORTED_FORMATS.get(self.format, SUPPORTED_FORMATS["MP4"])
+                self.pixel_format = "bgr"
+                if self.frame_rate_mode == "vfr":
+                    print("⚠️ 可变帧率需要FFmpeg，改用恒定帧率")
+                    self.frame_rate_mode = "cfr"
+                
+                # 创建视频写入器
+                self.video_writer = OpenCVVideoEncoder(
+                    self.output_file,
+                    format_info["fourcc"],
+                    self.fps,
+                    self.area_size
+                )
+            self.needs_compression = self.video_writer.needs_compression
+            print(f"🎞️ 帧格式: {self.pixel_format} ({type(self.video_writer).__name__})")
             
             if not self.video_writer.isOpened():
                 messagebox.showerror("错误", "无法创建视频文件，请检查编码器和格式设置")
@@ -2201,30 +2530,20 @@ class ScreenRecorder:
             return
         
         try:
-            import pyaudio
-            
-            # 音频参数
-            self.audio_format = pyaudio.paInt16
-            self.audio_channels = 1
-            self.audio_rate = 44100
+            # 音频参数（声道数和采样率在 __init__ 中设置，实时混流时编码器按此创建音频输入）
             self.audio_chunk = 1024
-            self.audio_frames = []
-            
-            # 创建PyAudio实例
-            self.audio = pyaudio.PyAudio()
-            
-            # 打开音频流
-            self.audio_stream = self.audio.open(
-                format=self.audio_format,
-                channels=self.audio_channels,
-                rate=self.audio_rate,
-                input=True,
-                input_device_index=self.audio_device_index,
-                frames_per_buffer=self.audio_chunk
-            )
+            
+            # 回调模式打开音频流：PortAudio 回调把数据拷贝进环形缓冲区，录音线程成批取出
+            clock = self.session_clock.now if self.session_clock else time.perf_counter
+            self.audio_capture = CallbackAudioCapture(self.audio_device_index, self.audio_rate,
+                                                      self.audio_channels, self.audio_chunk, clock=clock)
+            self.audio_capture.start()
             
             self.audio_enabled = True
             self.audio_stop_event.clear()
+            if self.audio_syncer:
+                # 采集时间戳已扣除输入延迟
+                self.audio_syncer.begin(0.0)
             
             # 启动音频录制线程
             self.audio_thread = threading.Thread(target=self.record_audio_thread, daemon=True)
@@ -2235,13 +2554,36 @@ class ScreenRecorder:
         except Exception as e:
             print(f"❌ 启动音频录制失败: {e}")
             self.audio_enabled = False
+            # 结束实时混流的音频输入，避免 FFmpeg 一直等待音频数据
+            if self.live_audio_active():
+                self.video_writer.close_audio()
+    
+    def live_audio_active(self):
+        """当前视频写入器是否在实时混流音频"""
+        return getattr(self.video_writer, 'live_audio', False)
     
     def record_audio_thread(self):
         """音频录制线程"""
+        # 实时混流时音频块直接写入编码器，否则流式写入临时 WAV，录制结束后合并
+        writer = self.video_writer if self.live_audio_active() else None
+        spool = self.audio_spool
+        syncer = self.audio_syncer
+        capture = self.audio_capture
         try:
-            while not self.audio_stop_event.is_set() and self.audio_enabled:
-                data = self.audio_stream.read(self.audio_chunk, exception_on_overflow=False)
-                self.audio_frames.append(data)
+            # 音频流关闭后取完缓冲区中剩余的数据再退出
+            while capture.active or capture.available():
+                data, timestamp = capture.read()
+                if not data:
+                    continue
+                if syncer:
+                    # 按会话时刻补齐空缺、丢弃暂停期间的数据、修正声卡时钟漂移
+                    data = syncer.process(data, timestamp)
+                    if not data:
+                        continue
+                if writer:
+                    writer.write_audio(data)
+                elif spool:
+                    spool.write(data)
         except Exception as e:
             print(f"❌ 音频录制错误: {e}")
     
@@ -2251,19 +2593,21 @@ class ScreenRecorder:
             self.audio_stop_event.set()
             self.audio_enabled = False
             
-            if hasattr(self, 'audio_stream'):
-                self.audio_stream.stop_stream()
-                self.audio_stream.close()
-            
-            if hasattr(self, 'audio'):
-                self.audio.terminate()
+            # 先关闭音频流，录音线程取完缓冲区中剩余的数据后退出
+            self.audio_capture.stop()
+            if self.audio_thread and self.audio_thread.is_alive():
+                self.audio_thread.join(timeout=1.0)
             
+            capture_stats = self.audio_capture.stats()
+            if capture_stats['overflows'] or capture_stats['input_overflows']:
+                print(f"⚠️ 音频采集溢出: 缓冲区 {capture_stats['overflows']} 次, "
+                      f"设备输入 {capture_stats['input_overflows']} 次")
             print("🔇 音频录制已停止")
     
     def merge_audio_video(self):
         """合并音视频"""
-        if not self.audio_frames or not self.output_file:
-            print("⚠️ 音频帧为空或输出文件不存在，跳过音视频合并")
+        if self.audio_spool is None or not self.output_file:
+            print("⚠️ 没有录制音频或输出文件不存在，跳过音视频合并")
             return
         
         if not FFMPEG_AVAILABLE:
@@ -2271,26 +2615,8 @@ class ScreenRecorder:
             return
         
         try:
-            # 创建临时音频文件
-            import wave
-            
-            self.temp_audio_file = os.path.join(self.temp_dir, "temp_audio.wav")
-            
-            # 确保audio相关属性存在
-            audio_channels = getattr(self, 'audio_channels', 1)
-            audio_rate = getattr(self, 'audio_rate', 44100)
-            audio_format = getattr(self, 'audio_format', None)
-            
-            # 保存音频到WAV文件
-            wf = wave.open(self.temp_audio_file, 'wb')
-            wf.setnchannels(audio_channels)
-            if audio_format is not None:
-                wf.setsampwidth(pyaudio.PyAudio().get_sample_size(audio_format))
-            else:
-                wf.setsampwidth(2)  # 默认16位
-            wf.setframerate(audio_rate)
-            wf.writeframes(b''.join(self.audio_frames))
-            wf.close()
+            # 录制过程中已流式写入的临时音频文件
+            self.temp_audio_file = self.audio_spool.path
             
             # 检查临时音频文件
             if not os.path.exists(self.temp_audio_file) or os.path.getsize(self.temp_audio_file) == 0:
@@ -2304,9 +2630,10 @@ class ScreenRecorder:
             format_info = SUPPORTED_FORMATS.get(self.format, SUPPORTED_FORMATS["MP4"])
             file_ext = format_info["ext"]
             base_name = os.path.splitext(self.output_file)[0]
-            temp_output = base_name + "_with_audio.mp4"
+            temp_output = f"{base_name}_with_audio.{file_ext}"
             
-            # FFmpeg合并命令 - 修复音视频同步问题
+            # FFmpeg合并命令：音频已按会话时钟对齐到视频时间轴，直接拼接，
+            # -shortest 只裁掉停止录制时多出的最后一小段
             ffmpeg_cmd = [
                 'ffmpeg', '-y',
                 '-i', self.output_file,
@@ -2316,7 +2643,6 @@ class ScreenRecorder:
                 '-ar', '44100',
                 '-ac', '2',
                 '-shortest',
-                '-async', '1',
                 '-strict', 'experimental',
                 temp_output
             ]
@@ -2346,6 +2672,9 @@ class ScreenRecorder:
                 
         except Exception as e:
             print(f"❌ 音视频合并错误: {e}")
+        finally:
+            # 音频缓存文件路径每次录制都相同，合并后不再保留，避免下次录制时被当作旧文件删除
+            self.temp_audio_file = None
     
     def compress_video(self):
         """视频压缩处理"""
@@ -2364,17 +2693,20 @@ class ScreenRecorder:
         """视频压缩处理线程"""
         try:
             original_size = os.path.getsize(self.output_file)
-            temp_compressed = os.path.join(self.temp_dir, "compressed_temp.mp4")
+            file_ext = os.path.splitext(self.output_file)[1]
+            temp_compressed = os.path.join(self.temp_dir, f"compressed_temp{file_ext}")
             
             quality = self.quality_var.get()
-            crf_value = QUALITY_PRESETS.get(quality, QUALITY_PRESETS["medium"])["crf"]
+            preset = QUALITY_PRESETS.get(quality, QUALITY_PRESETS["medium"])
+            codec = resolve_codec(self.output_file, self.codec)
             
             ffmpeg_cmd = [
                 'ffmpeg', '-y',
                 '-i', self.output_file,
-                '-c:v', 'libx264',
-                '-crf', str(crf_value),
-                '-preset', 'medium',
+                '-c:v', codec
+            ]
+            ffmpeg_cmd += codec_quality_args(codec, preset["crf"], preset["bitrate"], preset='medium')
+            ffmpeg_cmd += [
                 '-c:a', 'aac',
                 '-b:a', '128k',
                 '-progress', 'pipe:1',
@@ -2432,51 +2764,65 @@ class ScreenRecorder:
     
     def record_screen(self):
         """录制屏幕主循环"""
-        performance_config = PERFORMANCE_OPTIONS.get(self.performance_mode, PERFORMANCE_OPTIONS["medium"])
-        frame_skip = performance_config["frame_skip"]
-        sleep_factor = performance_config["sleep_factor"]
+        pacer = self.frame_pacer
+        # 与音频共用会话时间轴的起点
+        pacer.start(0.0)
+        vfr = self.frame_rate_mode == "vfr"
+        detector = self.static_detector
         
         while self.recording:
             if self.paused:
+                pacer.pause()
+                if detector:
+                    detector.reset()
                 time.sleep(0.1)
                 continue
+            pacer.resume()
             
             try:
-                current_time = time.time()
-                elapsed = current_time - self.last_frame_time
-                
-                # 帧跳过逻辑
-                self.frame_skip_counter += 1
-                if frame_skip > 0 and self.frame_skip_counter % (frame_skip + 1) != 0:
-                    time.sleep(self.target_frame_time * sleep_factor)
-                    continue
+                # 等到下一个抓屏截止时间（抓屏耗时已计入，不再额外睡一个帧间隔）
+                capture_time = pacer.wait()
                 
                 # 获取屏幕帧
                 frame = self.capture_screen_frame()
                 if frame is None:
                     continue
                 
-                # 应用画图（如果有）
-                if hasattr(self, 'drawing_tool') and self.drawing_tool.shapes:
-                    frame = self.drawing_tool.apply_drawings(frame)
-                
-                # 写入帧
-                self.video_writer.write(frame)
+                # 静止画面：归还缓冲区，CFR 下由编码线程重写上一帧，VFR 下直接不写
+                static = detector is not None and detector.is_static(frame, self.overlay_token(),
+                                                                     self.frame_changed_regions())
+                if static:
+                    self.frame_pool.release(frame)
+                    if not vfr:
+                        repeat = pacer.commit(capture_time)
+                        if repeat:
+                            self.frame_queue.put(None, repeat)
+                elif vfr:
+                    # 可变帧率：帧带着抓取时间戳入队，编码器写入真实 PTS
+                    self.frame_queue.put(frame, timestamp=pacer.stamp(capture_time))
+                else:
+                    # 按抓取时刻计算该帧占用的帧位：抓屏跟不上时重复写入，保持恒定帧率
+                    repeat = pacer.commit(capture_time)
+                    if repeat == 0:
+                        self.frame_pool.release(frame)
+                        continue
+                    
+                    # 放入帧队列，由编码线程叠加画图并写入
+                    self.frame_queue.put(frame, repeat)
                 
                 # 更新统计信息
                 self.frame_count += 1
-                self.last_frame_time = current_time
                 
-                # 计算实际FPS
-                if self.frame_count % 30 == 0:  # 每30帧更新一次显示
-                    actual_fps = 30 / (time.time() - (current_time - elapsed * 30))
-                    self.root.after(0, lambda: self.fps_status_var.set(f"FPS: {actual_fps:.1f}"))
-                
-                # 性能优化：控制帧率
-                processing_time = time.time() - current_time
-                sleep_time = max(0, self.target_frame_time - processing_time) * sleep_factor
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                # 每30帧更新一次显示
+                if self.frame_count % 30 == 0:
+                    pacing = pacer.stats()
+                    queue_stats = self.frame_queue.stats()
+                    static_count = detector.frames_static if detector else 0
+                    status = (f"FPS: {pacing['capture_fps']:.1f}/{self.fps} | "
+                              f"偏差: {pacing['mean_error'] * 1000:.1f}ms | "
+                              f"重复: {pacing['duplicated']} | 静止: {static_count} | "
+                              f"队列: {queue_stats['depth']} | 丢帧: {queue_stats['dropped']}")
+                    self.root.after(0, lambda: self.fps_status_var.set(status))
                     
             except Exception as e:
                 print(f"❌ 录制错误: {e}")
@@ -2484,16 +2830,43 @@ class ScreenRecorder:
                     time.sleep(0.1)
                 else:
                     break
+        
+        # 可变帧率下静止画面不写帧：结束时按当前会话时刻补写最后一帧，
+        # 以静止画面结尾的录制时长仍与会话时钟（和实时混流的音频）一致
+        if vfr and pacer.frames_captured:
+            self.frame_queue.put(None, timestamp=pacer.stamp(pacer.clock()))
+    
+    def frame_changed_regions(self):
+        """返回捕获后端报告的变化区域；跟随鼠标和虚拟桌面的帧经过裁剪/合成，无法直接使用"""
+        if self.recording_area in ("follow", "desktop"):
+            return None
+        return self.capture_backend.changed_regions
+    
+    def overlay_token(self):
+        """画图图层的状态标记，图层变化时静止画面也需要重新编码"""
+        token = self.drawing_tool.token() if hasattr(self, 'drawing_tool') else 0
+        if self.show_key_presses:
+            return token, self.key_overlay.token()
+        return token
+    
+    def apply_overlays(self, frame):
+        """在编码线程中叠加画图内容和按键显示"""
+        if hasattr(self, 'drawing_tool') and self.drawing_tool.has_drawings():
+            frame = self.drawing_tool.apply_drawings(frame)
+        if self.show_key_presses and self.key_overlay.has_keys():
+            frame = self.key_overlay.apply(frame)
+        return frame
     
     def capture_screen_frame(self):
         """捕获屏幕帧"""
         try:
             # 获取录制区域
             if self.recording_area == "follow":
-                # 跟随鼠标模式
-                area = self.mouse_tracker.get_tracking_area_around_cursor(
-                    self.area_size[0], self.area_size[1]
-                )
+                # 跟随鼠标模式，由虚拟镜头平滑跟随并从缓存的大窗口中裁剪
+                return self.capture_follow_frame()
+            elif self.recording_area == "desktop":
+                # 虚拟桌面模式，所有显示器直接抓取到同一帧缓冲区
+                return self.capture_desktop_frame()
             elif self.recording_area:
                 # 固定区域模式
                 area = self.recording_area
@@ -2501,73 +2874,191 @@ class ScreenRecorder:
                 # 全屏模式
                 area = None
             
-            # 捕获屏幕
-            if area:
-                screenshot = ImageGrab.grab(bbox=area)
-            else:
-                screenshot = ImageGrab.grab()
+            # 从缓冲池借出缓冲区，后端直接写入，不再逐帧分配
+            buffer = self.frame_pool.acquire(self.capture_backend.frame_shape(area, self.pixel_format))
+            if buffer is None:
+                return None
             
-            # 转换为OpenCV格式
-            frame = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            try:
+                frame = self.capture_backend.grab(area, out=buffer, pixel_format=self.pixel_format)
+            except Exception:
+                self.frame_pool.release(buffer)
+                raise
             
+            if frame is not buffer:
+                # 尺寸与缓冲池不一致时后端会分配新帧，缓冲区直接归还
+                self.frame_pool.release(buffer)
             return frame
             
         except Exception as e:
             print(f"❌ 捕获屏幕帧错误: {e}")
             return None
     
+    def capture_follow_frame(self):
+        """跟随鼠标模式下通过虚拟镜头捕获一帧"""
+        camera = self.follow_camera
+        buffer = self.frame_pool.acquire(camera.frame_shape(self.pixel_format))
+        if buffer is None:
+            return None
+        
+        try:
+            frame = camera.capture(self.capture_backend,
+                                   self.mouse_tracker.current_x, self.mouse_tracker.current_y,
+                                   out=buffer, pixel_format=self.pixel_format)
+        except Exception:
+            self.frame_pool.release(buffer)
+            raise
+        
+        if frame is not buffer:
+            self.frame_pool.release(buffer)
+        return frame
+    
+    def capture_desktop_frame(self):
+        """虚拟桌面模式下合成所有显示器的一帧"""
+        compositor = self.desktop_compositor
+        buffer = self.frame_pool.acquire(compositor.frame_shape(self.pixel_format))
+        if buffer is None:
+            return None
+        
+        try:
+            frame = compositor.grab(self.capture_backend, out=buffer, pixel_format=self.pixel_format)
+        except Exception:
+            self.frame_pool.release(buffer)
+            raise
+        
+        if frame is not buffer:
+            self.frame_pool.release(buffer)
+        return frame
+    
+    def screenshot_area(self):
+        """截图区域（与录制区域一致），返回 bbox、None（主显示器）或 desktop"""
+        recording_area = getattr(self, 'recording_area', None)
+        if recording_area == "follow":
+            x, y, w, h = self.mouse_tracker.get_tracking_area_around_cursor(
+                int(self.follow_width_var.get()), 
+                int(self.follow_height_var.get())
+            )
+            return (x, y, x + w, y + h)
+        return recording_area
+    
+    def screenshot_overlays(self, frame):
+        """截图叠加画图内容（来自缓存图层，只叠加一次）"""
+        if hasattr(self, 'drawing_tool') and self.drawing_tool.has_drawings():
+            frame = self.drawing_tool.apply_drawings(frame)
+        return frame
+    
     def take_screenshot(self):
-        """截图功能"""
+        """截图功能（只在调用线程抓屏和叠加图层，编码保存在后台完成，热键立即返回）"""
         try:
-            # 获取截图区域（与录制区域一致）
-            if self.recording_area == "follow":
-                area = self.mouse_tracker.get_tracking_area_around_cursor(
-                    int(self.follow_width_var.get()), 
-                    int(self.follow_height_var.get())
-                )
-            elif self.recording_area:
-                area = self.recording_area
-            else:
-                area = None
+            area = self.screenshot_area()
             
-            # 截图
-            if area:
-                screenshot = ImageGrab.grab(bbox=area)
-            else:
-                screenshot = ImageGrab.grab()
+            def grab(backend):
+                if area == "desktop":
+                    return VirtualDesktopCompositor(self.mouse_tracker.geometry).grab(backend)
+                return backend.grab(area)
             
-            # 保存截图
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            screenshot_dir = os.path.join(self.output_dir, "Screenshots")
-            if not os.path.exists(screenshot_dir):
-                os.makedirs(screenshot_dir)
-            
-            screenshot_file = os.path.join(screenshot_dir, f"screenshot_{timestamp}.png")
-            screenshot.save(screenshot_file)
-            
-            # 应用画图（如果有）
-            if hasattr(self, 'drawing_tool') and self.drawing_tool.shapes:
-                # 将PIL图像转换为OpenCV格式进行绘制
-                frame = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-                frame_with_drawings = self.drawing_tool.apply_drawings(frame)
-                # 转换回PIL格式保存
-                screenshot_with_drawings = Image.fromarray(cv2.cvtColor(frame_with_drawings, cv2.COLOR_BGR2RGB))
-                screenshot_with_drawings.save(screenshot_file)
-            
-            # 添加到临时文件列表（用于清理）
-            self.temp_screenshots.append(screenshot_file)
-            
-            # 显示成功消息
-            file_size = os.path.getsize(screenshot_file) / 1024  # KB
-            messagebox.showinfo("截图成功", 
-                              f"截图已保存！\n"
-                              f"文件: {screenshot_file}\n"
-                              f"大小: {file_size:.1f} KB")
-            
-            print(f"📸 截图已保存: {screenshot_file}")
+            self.screenshot_service.output_dir = os.path.join(self.output_dir, "Screenshots")
             
+            # 截图（录制中复用录制的捕获后端，否则临时创建）
+            if self.capture_backend is not None:
+                self.screenshot_service.capture(lambda: grab(self.capture_backend), self.screenshot_overlays,
+                                                self.screenshot_format)
+            else:
+                backend_name = CAPTURE_BACKENDS.get(self.capture_backend_var.get(), "auto")
+                with create_capture_backend(backend_name) as backend:
+                    self.screenshot_service.capture(lambda: grab(backend), self.screenshot_overlays,
+                                                    self.screenshot_format)
+            
+        except Exception as e:
+            print(f"❌ 截图失败: {e}")
+            self.root.after(0, lambda: self.recording_status_var.set("❌ 截图失败"))
+    
+    def on_screenshot_saved(self, path, size_bytes, seconds):
+        """截图保存完成（工作线程回调）"""
+        # 添加到临时文件列表（用于清理）
+        self.temp_screenshots.append(path)
+        print(f"📸 截图已保存: {path} ({size_bytes / 1024:.1f} KB, 编码 {seconds * 1000:.0f} ms)")
+        self.root.after(0, lambda: self.recording_status_var.set(f"📸 截图已保存: {os.path.basename(path)}"))
+    
+    def on_screenshot_error(self, error):
+        """截图保存失败（工作线程回调）"""
+        print(f"❌ 截图保存失败: {error}")
+        self.root.after(0, lambda: self.recording_status_var.set("❌ 截图保存失败"))
+    
+    def toggle_burst(self):
+        """开始连拍；连拍抓屏中再次调用则提前结束"""
+        if self.burst is not None and self.burst.running:
+            self.burst.stop()
+            return
+        try:
+            area = self.screenshot_area()
+            self.burst = BurstCapture(
+                os.path.join(self.output_dir, "Screenshots"), self.temp_dir,
+                interval=BURST_INTERVALS.get(self.burst_interval_var.get(), 0.2),
+                duration=BURST_DURATIONS.get(self.burst_duration_var.get(), 10),
+                bbox=None if area == "desktop" else area,
+                backend=self.capture_backend,
+                backend_name=CAPTURE_BACKENDS.get(self.capture_backend_var.get(), "auto"),
+                compositor=VirtualDesktopCompositor(self.mouse_tracker.geometry) if area == "desktop" else None,
+                process=self.screenshot_overlays,
+                image_format=self.screenshot_format,
+                on_done=self.on_burst_done
+            ).start()
+            print("🎞️ 连拍开始")
+            self.root.after(0, lambda: self.recording_status_var.set("🎞️ 连拍中..."))
         except Exception as e:
-            messagebox.showerror("截图错误", f"截图失败: {str(e)}")
+            print(f"❌ 连拍失败: {e}")
+    
+    def toggle_replay(self):
+        """开启/关闭即时回放缓冲（复用录制会话，只是写入器换成分段环形缓冲）"""
+        if self.recording:
+            if self.replay_mode:
+                self.stop_recording()
+            else:
+                print("⚠️ 正在录制，无法开启即时回放")
+            return
+        if not FFMPEG_AVAILABLE:
+            print("❌ 即时回放需要FFmpeg")
+            self.root.after(0, lambda: self.recording_status_var.set("❌ 即时回放需要FFmpeg"))
+            return
+        self.replay_seconds = REPLAY_DURATIONS.get(self.replay_duration_var.get(), 60)
+        self.replay_mode = True
+        self.start_recording()
+        if not self.recording:
+            self.replay_mode = False
+    
+    def save_replay(self):
+        """保存即时回放缓冲区中最近 N 秒（后台线程重新封装，不重新编码）"""
+        writer = self.video_writer
+        if not (self.recording and self.replay_mode and isinstance(writer, ReplaySegmentEncoder)):
+            print("⚠️ 即时回放缓冲未开启")
+            return
+        
+        def save():
+            if not os.path.exists(self.output_dir):
+                os.makedirs(self.output_dir)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = os.path.join(self.output_dir, f"replay_{timestamp}.mp4")
+            if writer.save(output_file):
+                print(f"⏪ 即时回放已保存: {output_file}")
+                self.root.after(0, lambda: self.recording_status_var.set(
+                    f"⏪ 回放已保存: {os.path.basename(output_file)}"))
+            else:
+                self.root.after(0, lambda: self.recording_status_var.set("❌ 回放保存失败"))
+        
+        threading.Thread(target=save, daemon=True).start()
+    
+    def on_burst_done(self, stats):
+        """连拍完成（连拍线程回调）"""
+        message = f"🎞️ 连拍完成: 抓取 {stats['captured']} 帧，已编码 {stats['encoded']} 帧"
+        if stats['missed']:
+            message += f"，错过 {stats['missed']} 帧"
+        print(f"{message} -> {stats['folder']}")
+        self.root.after(0, lambda: self.recording_status_var.set(message))
+    
+    def on_screenshot_format_change(self, event=None):
+        """截图格式改变"""
+        self.screenshot_format = SCREENSHOT_FORMATS.get(self.screenshot_format_var.get(), "png")
     
     def start_timer(self):
         """启动计时器"""
@@ -2603,7 +3094,7 @@ class ScreenRecorder:
         self.stop_button.config(state=tk.NORMAL, bg="#e74c3c")
         self.screenshot_button.config(state=tk.NORMAL)
         
-        self.recording_status_var.set("🔴 录制中...")
+        self.recording_status_var.set("⏪ 即时回放缓冲中 (F6 保存)" if self.replay_mode else "🔴 录制中...")
         self.recording_time_var.set("00:00:00")
     
     def update_ui_for_stopped(self):
@@ -2618,13 +3109,54 @@ class ScreenRecorder:
     
     def cleanup_recording(self):
         """清理录制资源"""
+        # 等待编码线程写完队列中剩余的帧
+        if self.encoder_thread:
+            self.encoder_thread.stop()
+            stats = self.encoder_thread.stats()
+            print(f"📊 帧队列统计: 入队 {stats['queued']}, 丢弃 {stats['dropped']}, "
+                  f"编码 {stats['encoded']}, 重写上一帧 {stats['repeated']}, 最大深度 {stats['max_depth']}, "
+                  f"最慢写入 {stats['slowest_write'] * 1000:.0f}ms")
+            if self.static_detector:
+                static_stats = self.static_detector.stats()
+                print(f"📊 静止画面统计: 检测 {static_stats['checked']}, 跳过 {static_stats['static']}")
+            if self.follow_camera:
+                camera_stats = self.follow_camera.stats()
+                print(f"📊 跟随镜头统计: 捕获 {camera_stats['captured']}, "
+                      f"抓取窗口重定位 {camera_stats['window_moves']}")
+            if self.frame_pacer:
+                pacing = self.frame_pacer.stats()
+                print(f"📊 帧率调度统计: 抓取 {pacing['captured']} ({pacing['capture_fps']:.1f} FPS), "
+                      f"输出 {pacing['slots']} 帧, 重复 {pacing['duplicated']}, 丢弃 {pacing['dropped']}, "
+                      f"平均偏差 {pacing['mean_error'] * 1000:.1f}ms, "
+                      f"最大偏差 {pacing['max_error'] * 1000:.1f}ms")
+            pool_stats = self.frame_pool.stats()
+            print(f"📊 缓冲池统计: 缓冲区 {pool_stats['buffers']}, 累计分配 {pool_stats['allocated']}, "
+                  f"借用超时 {pool_stats['misses']}")
+            self.encoder_thread = None
+        
+        # 停止音频录制（实时混流时须在关闭写入器之前）
+        self.stop_audio_recording()
+        
         # 关闭视频写入器
+        if isinstance(self.video_writer, ReplaySegmentEncoder):
+            replay_stats = self.video_writer.stats()
+            print(f"📊 即时回放统计: 片段 {replay_stats['added']}, 淘汰 {replay_stats['evicted']}, "
+                  f"缓冲 {replay_stats['segments']} 段 ({replay_stats['bytes'] / 1024 ** 2:.1f} MB)")
+        if self.live_audio_active():
+            audio_seconds = self.video_writer.audio_bytes_written / (2 * self.audio_channels * self.audio_rate)
+            print(f"🎵 实时混流音频: {audio_seconds:.1f}s")
         if self.video_writer:
             self.video_writer.release()
             self.video_writer = None
         
-        # 停止音频录制
-        self.stop_audio_recording()
+        # 关闭捕获后端
+        if self.capture_backend:
+            if hasattr(self.capture_backend, "stats"):
+                capture_stats = self.capture_backend.stats()
+                print(f"📊 增量抓屏统计: 帧 {capture_stats['frames']}, 整屏抓取 {capture_stats['full_grabs']}, "
+                      f"拷贝矩形 {capture_stats['rects']}, 拷贝像素 {capture_stats['pixels']}")
+            self.capture_backend.close()
+            self.capture_backend = None
         
         # 清理临时文件
         self.cleanup_temp_files()
@@ -2634,14 +3166,19 @@ class ScreenRecorder:
     def cleanup_temp_files(self):
         """清理临时文件"""
         try:
+            # 等待合并的音频缓存文件不能删除
+            pending = self.audio_spool.path if self.audio_spool is not None else None
+            
             # 清理临时音频文件
-            if hasattr(self, 'temp_audio_file') and self.temp_audio_file and os.path.exists(self.temp_audio_file):
+            if (hasattr(self, 'temp_audio_file') and self.temp_audio_file and self.temp_audio_file != pending
+                    and os.path.exists(self.temp_audio_file)):
                 os.remove(self.temp_audio_file)
             
-            # 清理临时目录（保留截图）
+            # 清理临时目录（保留截图和等待合并的音频缓存文件）
             for file in os.listdir(self.temp_dir):
-                if file.endswith('.wav') or file.endswith('.tmp'):
-                    os.remove(os.path.join(self.temp_dir, file))
+                path = os.path.join(self.temp_dir, file)
+                if (file.endswith('.wav') or file.endswith('.tmp')) and path != pending:
+                    os.remove(path)
                     
         except Exception as e:
             print(f"❌ 清理临时文件错误: {e}")
@@ -2662,6 +3199,11 @@ class ScreenRecorder:
         if hasattr(self, 'keyboard_listener'):
             self.keyboard_listener.stop()
         
+        # 结束连拍抓屏，等待后台截图保存完成
+        if self.burst is not None:
+            self.burst.stop()
+        self.screenshot_service.close()
+        
         # 关闭画图工具窗口
         if hasattr(self, 'drawing_tool') and self.drawing_tool.drawing_window is not None:
             self.drawing_tool.drawing_window.destroy()
@@ -2758,6 +3300,8 @@ class AreaSelector:
             return
         
         # 更新录制器的区域设置
+        self.recorder.x_var.set(str(x1))
+        self.recorder.y_var.set(str(y1))
         self.recorder.width_var.set(str(width))
         self.recorder.height_var.set(str(height))
         self.recorder.area_mode.set("custom")
@@ -102,6 +102,23 @@ import pyaudio
 import wave
 import shutil
 
+from capture_backends import CAPTURE_BACKENDS, create_capture_backend
+from frame_pipeline import (
+    BACKPRESSURE_POLICIES, DEFAULT_QUEUE_SIZE, FramePool, FrameQueue, FrameEncoderThread, FramePacer,
+    StaticFrameDetector
+)
+from display_geometry import VIRTUAL_DESKTOP, VirtualDesktopCompositor, get_display_geometry, monitor_bbox
+from follow_camera import FOLLOW_CAMERA_MODES, FollowCamera
+from annotation_overlay import AnnotationEditor, new_stroke
+from audio_spool import AudioSpool
+from av_sync import AudioSyncer, SessionClock
+from audio_capture import CallbackAudioCapture
+from screenshot_service import BURST_DURATIONS, BURST_INTERVALS, SCREENSHOT_FORMATS, BurstCapture, ScreenshotService
+from video_encoders import (
+    SUPPORTED_CODECS, QUALITY_PRESETS, FRAME_RATE_MODES, FFmpegPipeEncoder, OpenCVVideoEncoder,
+    ffmpeg_available, negotiate_pixel_format
+)
+
 # ==================== 版本和版权信息 ====================
 __author__ = "QLM Network Entertainment Technology Co., Ltd."
 __copyright__ = "Copyright 2019-2025, QLM Network Entertainment Technology Co., Ltd."
@@ -350,6 +367,19 @@ class LanguageManager:
                 'version': '版本',
                 'copyright': '版权所有',
                 'website': '网站',
+                'monitor': '显示器',
+                'pos_x': 'X',
+                'pos_y': 'Y',
+                'size_separator': '×',
+                'camera': '镜头',
+                'capture_backend': '捕获后端',
+                'queue_full': '队列满时',
+                'frame_rate_mode': '帧率模式',
+                'skip_static': '跳过未变化的帧（重复上一帧）',
+                'screenshot_format': '截图格式',
+                'burst_screenshots': '连拍截图',
+                'burst': '连拍',
+                'stop_burst': '停止连拍',
             },
             'en': {
                 'app_title': 'Super Hi Vision - Advanced HD Screen Recording Tool',
@@ -398,6 +428,19 @@ class LanguageManager:
                 'version': 'Version',
                 'copyright': 'Copyright',
                 'website': 'Website',
+                'monitor': 'Monitor',
+                'pos_x': 'X',
+                'pos_y': 'Y',
+                'size_separator': 'x',
+                'camera': 'Camera',
+                'capture_backend': 'Capture Backend',
+                'queue_full': 'When Queue Full',
+                'frame_rate_mode': 'Frame Rate Mode',
+                'skip_static': 'Skip unchanged frames (repeat previous frame)',
+                'screenshot_format': 'Screenshot Format',
+                'burst_screenshots': 'Burst Screenshots',
+                'burst': 'Burst',
+                'stop_burst': 'Stop Burst',
             }
         }
 
@@ -413,48 +456,74 @@ class LanguageManager:
         return self.translations.get(self.current_language, {}).get(key, key)
 
 # ==================== 音频录制线程 ====================
+# 音频电平信号的发送间隔（秒）
+AUDIO_LEVEL_INTERVAL = 0.25
+
 class AudioRecorderThread(QThread):
-    """音频录制线程"""
-    audio_data_signal = pyqtSignal(bytes)
+    """音频录制线程
+
+    音频数据不经过 Qt 信号：每批数据在本线程中直接交给 sink(data, timestamp)
+    （同步校正后写入编码器或音频缓冲区），GUI 事件循环繁忙时也不会积压或乱序。
+    信号只用于低频的电平更新和错误通知。
+    """
+    level_signal = pyqtSignal(float)  # 最近一段时间的峰值电平（0~1）
     error_signal = pyqtSignal(str)
 
-    def __init__(self, device_index, sample_rate=44100, channels=2, chunk_size=1024):
+    def __init__(self, device_index, sample_rate=44100, channels=2, chunk_size=1024,
+                 clock=time.perf_counter, sink=None):
         super().__init__()
         self.device_index = device_index
         self.sample_rate = sample_rate
         self.channels = channels
         self.chunk_size = chunk_size
+        self.clock = clock
+        self.sink = sink
         self.running = False
-        self.audio = None
 
     def run(self):
         """开始录制"""
         self.running = True
+        # 回调模式采集：PortAudio 回调把数据拷贝进环形缓冲区，这里每批取出一次
+        capture = CallbackAudioCapture(self.device_index, self.sample_rate, self.channels,
+                                       self.chunk_size, clock=self.clock)
         try:
-            self.audio = pyaudio.PyAudio()
-            stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=self.channels,
-                rate=self.sample_rate,
-                input=True,
-                input_device_index=self.device_index,
-                frames_per_buffer=self.chunk_size
-            )
+            capture.start()
+        except Exception as e:
+            self.error_signal.emit(str(e))
+            return
 
+        peak = 0.0
+        next_level = time.monotonic()
+        try:
             while self.running:
-                try:
-                    data = stream.read(self.chunk_size, exception_on_overflow=False)
-                    self.audio_data_signal.emit(data)
-                except Exception as e:
-                    if self.running:
-                        self.error_signal.emit(str(e))
-                    break
-
-            stream.stop_stream()
-            stream.close()
-            self.audio.terminate()
+                data, timestamp = capture.read()
+                if not data:
+                    continue
+                self.deliver(data, timestamp)
+                peak = max(peak, np.abs(np.frombuffer(data, dtype=np.int16)).max() / 32768.0)
+                if time.monotonic() >= next_level:
+                    self.level_signal.emit(peak)
+                    peak = 0.0
+                    next_level = time.monotonic() + AUDIO_LEVEL_INTERVAL
         except Exception as e:
-            self.error_signal.emit(str(e))
+            if self.running:
+                self.error_signal.emit(str(e))
+        finally:
+            capture.stop()
+            # 取出音频流关闭前剩余的数据
+            data, timestamp = capture.read(timeout=0)
+            if data:
+                self.deliver(data, timestamp)
+            self.level_signal.emit(0.0)
+            stats = capture.stats()
+            if stats['overflows'] or stats['input_overflows']:
+                print(f"[INFO] Audio capture overflows: ring {stats['overflows']}, "
+                      f"device {stats['input_overflows']}")
+
+    def deliver(self, data, timestamp):
+        """把一批音频交给 sink（在录音线程中执行）"""
+        if self.sink:
+            self.sink(data, timestamp)
 
     def stop(self):
         """停止录制"""
@@ -471,6 +540,7 @@ class MouseTracker:
         self.click_detected = False
         self.tracking_area = None
         self.is_tracking = False
+        self.geometry = get_display_geometry()
 
     def update_position(self, x, y):
         """更新鼠标位置"""
@@ -484,39 +554,21 @@ class MouseTracker:
         self.click_detected = True
 
     def get_tracking_area_around_cursor(self, width=800, height=600):
-        """根据当前光标位置获取跟踪区域"""
-        try:
-            from PIL import ImageGrab
-            screen_width, screen_height = ImageGrab.grab().size
-        except:
-            screen_width, screen_height = 1920, 1080
-
-        x1 = max(0, self.current_x - width // 2)
-        y1 = max(0, self.current_y - height // 2)
-
-        if x1 + width > screen_width:
-            x1 = screen_width - width
-        if y1 + height > screen_height:
-            y1 = screen_height - height
-
-        x1 = max(0, x1)
-        y1 = max(0, y1)
-
-        self.tracking_area = (x1, y1, width, height)
+        """根据当前光标位置获取跟踪区域（屏幕尺寸取自缓存的显示器布局，不再逐帧截屏）"""
+        self.tracking_area = self.geometry.clamp_area(self.current_x, self.current_y, width, height)
         return self.tracking_area
 
 # ==================== 画图工具 ====================
-class DrawingTool:
-    """画图工具类"""
+class DrawingTool(AnnotationEditor):
+    """画图工具类（图形存储、撤销重做与渲染见 AnnotationEditor）"""
     def __init__(self):
+        super().__init__()
         self.drawing = False
         self.last_x = None
         self.last_y = None
-        self.shapes = []
         self.current_color = (255, 0, 0)
         self.current_thickness = 3
         self.current_tool = "pen"
-        self.temp_shape = None
 
     def set_tool(self, tool):
         """设置工具"""
@@ -530,13 +582,22 @@ class DrawingTool:
         """设置线条粗细"""
         self.current_thickness = thickness
 
+    def set_ink_lifetime(self, seconds):
+        """设置新墨迹的保留时间（秒，0 为永久保留）"""
+        self.ink_lifetime = seconds
+
     def start_drawing(self, x, y):
         """开始绘制"""
         self.drawing = True
         self.last_x = x
         self.last_y = y
 
-        if self.current_tool in ["rectangle", "circle"]:
+        if self.current_tool == "eraser":
+            self.erase_at(x, y, max(4, self.current_thickness))
+        elif self.current_tool == "pen":
+            self.temp_shape = new_stroke(x, y, self.current_color, self.current_thickness)
+            self.version += 1
+        elif self.current_tool in ["rectangle", "circle"]:
             self.temp_shape = {
                 "type": self.current_tool,
                 "x1": x,
@@ -546,77 +607,34 @@ class DrawingTool:
                 "color": self.current_color,
                 "thickness": self.current_thickness
             }
+            self.version += 1
 
     def draw(self, x, y):
         """绘制中"""
         if not self.drawing:
             return
 
-        if self.current_tool == "pen":
-            self.shapes.append({
-                "type": "line",
-                "x1": self.last_x,
-                "y1": self.last_y,
-                "x2": x,
-                "y2": y,
-                "color": self.current_color,
-                "thickness": self.current_thickness
-            })
+        if self.current_tool == "eraser":
+            self.erase_at(x, y, max(4, self.current_thickness))
+        elif self.current_tool == "pen" and self.temp_shape:
+            if self.temp_shape["points"].append(x, y):
+                self.version += 1
             self.last_x = x
             self.last_y = y
         elif self.current_tool in ["rectangle", "circle"] and self.temp_shape:
             self.temp_shape["x2"] = x
             self.temp_shape["y2"] = y
+            self.version += 1
 
     def stop_drawing(self):
         """停止绘制"""
         self.drawing = False
         if self.temp_shape:
-            self.shapes.append(self.temp_shape)
+            temp_shape = self.temp_shape
+            if temp_shape["type"] != "stroke" or len(temp_shape["points"]) > 1:
+                self.commit_shape(temp_shape)
             self.temp_shape = None
-
-    def clear_all(self):
-        """清除所有绘制"""
-        self.shapes = []
-        self.temp_shape = None
-
-    def apply_drawings(self, frame):
-        """将绘制应用到帧上"""
-        frame_copy = frame.copy()
-
-        for shape in self.shapes:
-            if shape["type"] == "line":
-                cv2.line(frame_copy,
-                        (shape["x1"], shape["y1"]),
-                        (shape["x2"], shape["y2"]),
-                        shape["color"],
-                        shape["thickness"])
-            elif shape["type"] == "rectangle":
-                cv2.rectangle(frame_copy,
-                             (shape["x1"], shape["y1"]),
-                             (shape["x2"], shape["y2"]),
-                             shape["color"],
-                             shape["thickness"])
-            elif shape["type"] == "circle":
-                center = (shape["x1"], shape["y1"])
-                radius = int(math.sqrt((shape["x2"] - shape["x1"])**2 +
-                                      (shape["y2"] - shape["y1"])**2))
-                cv2.circle(frame_copy, center, radius, shape["color"], shape["thickness"])
-
-        if self.temp_shape:
-            if self.temp_shape["type"] == "rectangle":
-                cv2.rectangle(frame_copy,
-                             (self.temp_shape["x1"], self.temp_shape["y1"]),
-                             (self.temp_shape["x2"], self.temp_shape["y2"]),
-                             self.temp_shape["color"],
-                             self.temp_shape["thickness"])
-            elif self.temp_shape["type"] == "circle":
-                center = (self.temp_shape["x1"], self.temp_shape["y1"])
-                radius = int(math.sqrt((self.temp_shape["x2"] - self.temp_shape["x1"])**2 +
-                                      (self.temp_shape["y2"] - self.temp_shape["y1"])**2))
-                cv2.circle(frame_copy, center, radius, self.temp_shape["color"], self.temp_shape["thickness"])
-
-        return frame_copy
+            self.version += 1
 
 # ==================== 主应用类 ====================
 class ScreenRecorderApp(QMainWindow):
@@ -625,6 +643,8 @@ class ScreenRecorderApp(QMainWindow):
     recording_stopped = pyqtSignal()
     recording_paused = pyqtSignal()
     recording_resumed = pyqtSignal()
+    screenshot_saved = pyqtSignal(str)
+    burst_finished = pyqtSignal(str)
 
     def __init__(self):
         super().__init__()
@@ -634,7 +654,10 @@ class ScreenRecorderApp(QMainWindow):
         self.mouse_tracker = MouseTracker()
         self.drawing_tool = DrawingTool()
         self.audio_recorder = None
-        self.audio_frames = []
+        self.audio_spool = None  # 未实时混流时音频流式写入 WAV
+        self.audio_level = 0.0  # 录音线程定期上报的峰值电平
+        self.session_clock = None  # 录制会话时钟（扣除暂停时长），视频帧和音频块共用
+        self.audio_syncer = None
         self.audio_enabled = False
         self.recording_thread = None
         self.temp_dir = tempfile.mkdtemp(prefix="screen_recorder_")
@@ -646,6 +669,25 @@ class ScreenRecorderApp(QMainWindow):
         self.output_dir = os.path.expanduser("~/Videos")
         self.output_file = None
         self.temp_audio_file = None
+        self.capture_backend = None
+        self.pixel_format = "bgr"
+        self.frame_pool = None
+        self.frame_queue = None
+        self.encoder_thread = None
+        self.frame_pacer = None
+        self.frame_rate_mode = "cfr"
+        self.static_detector = None
+        self.follow_camera = None
+        self.desktop_compositor = None
+        self.monitor_bbox = None  # 全屏录制非主显示器时的区域
+        # 截图编码和写盘在后台线程完成，结果通过 screenshot_saved 信号回到界面线程
+        self.screenshot_service = ScreenshotService(
+            self.output_dir,
+            on_saved=lambda path, size, seconds: self.screenshot_saved.emit(path),
+            on_error=lambda e: print(f"[ERROR] Failed to save screenshot: {e}"))
+        self.screenshot_saved.connect(self.on_screenshot_saved)
+        self.burst = None  # 进行中的连拍
+        self.burst_finished.connect(self.on_burst_finished)
 
         self.frame_count = 0
         self.recording_start_time = None
@@ -653,10 +695,13 @@ class ScreenRecorderApp(QMainWindow):
 
         self.theme_manager = ThemeManager()
         self.language_manager = LanguageManager()
+        self.text_widgets = []  # 切换语言时刷新文本的控件 (控件, 文本键, 后缀)
 
         self.audio_devices = []
         self.audio_device_index = None
         self.record_audio = True
+        self.audio_rate = 44100
+        self.audio_channels = 2
 
         # 热键配置
         self.hotkeys = {
@@ -670,6 +715,30 @@ class ScreenRecorderApp(QMainWindow):
         self.init_audio_devices()
         self.init_ui()
         self.apply_theme()
+        self.watch_display_changes()
+
+    def watch_display_changes(self):
+        """显示器增减或分辨率变化时刷新缓存的显示器布局（后台轮询之外的即时更新）"""
+        app = QApplication.instance()
+        app.screenAdded.connect(self.on_screen_added)
+        app.screenRemoved.connect(lambda screen: self.on_display_changed())
+        for screen in app.screens():
+            self.watch_screen(screen)
+
+    def watch_screen(self, screen):
+        """显示器分辨率或位置变化时刷新布局"""
+        screen.geometryChanged.connect(lambda rect: self.on_display_changed())
+
+    def on_screen_added(self, screen):
+        """新接入的显示器：之后的分辨率或位置变化也要触发刷新"""
+        self.watch_screen(screen)
+        self.on_display_changed()
+
+    def on_display_changed(self):
+        """显示器变化：刷新布局缓存和显示器选项"""
+        get_display_geometry().refresh()
+        if not self.recording:
+            self.refresh_monitor_choices()
 
     def load_hotkeys(self):
         """加载热键配置"""
@@ -805,8 +874,31 @@ class ScreenRecorderApp(QMainWindow):
         mode_layout.addStretch()
         area_layout.addLayout(mode_layout)
 
+        self.monitor_frame = QFrame()
+        monitor_layout = QHBoxLayout(self.monitor_frame)
+        monitor_layout.addWidget(self.translated(QLabel(), 'monitor', ":"))
+        self.monitor_combo = QComboBox()
+        self.refresh_monitor_choices()
+        monitor_layout.addWidget(self.monitor_combo)
+        monitor_layout.addStretch()
+        area_layout.addWidget(self.monitor_frame)
+
         self.custom_frame = QFrame()
         custom_layout = QHBoxLayout(self.custom_frame)
+        custom_layout.addWidget(self.translated(QLabel(), 'pos_x', ":"))
+
+        self.x_spin = QSpinBox()
+        self.x_spin.setRange(-99999, 99999)
+        self.x_spin.setValue(0)
+        custom_layout.addWidget(self.x_spin)
+
+        custom_layout.addWidget(self.translated(QLabel(), 'pos_y', ":"))
+
+        self.y_spin = QSpinBox()
+        self.y_spin.setRange(-99999, 99999)
+        self.y_spin.setValue(0)
+        custom_layout.addWidget(self.y_spin)
+
         custom_layout.addWidget(QLabel(self.language_manager.get_text('width') + ":"))
 
         self.width_spin = QSpinBox()
@@ -838,7 +930,7 @@ class ScreenRecorderApp(QMainWindow):
         self.follow_width_spin.setValue(800)
         follow_layout.addWidget(self.follow_width_spin)
 
-        follow_layout.addWidget(QLabel("x"))
+        follow_layout.addWidget(self.translated(QLabel(), 'size_separator'))
 
         self.follow_height_spin = QSpinBox()
         self.follow_height_spin.setRange(100, 9999)
@@ -846,6 +938,12 @@ class ScreenRecorderApp(QMainWindow):
         follow_layout.addWidget(self.follow_height_spin)
 
         follow_layout.addWidget(QLabel(self.language_manager.get_text('height') + ":"))
+
+        follow_layout.addWidget(self.translated(QLabel(), 'camera', ":"))
+        self.follow_camera_combo = QComboBox()
+        for label, mode in FOLLOW_CAMERA_MODES.items():
+            self.follow_camera_combo.addItem(label, mode)
+        follow_layout.addWidget(self.follow_camera_combo)
         follow_layout.addStretch()
 
         area_layout.addWidget(self.follow_frame)
@@ -904,7 +1002,7 @@ class ScreenRecorderApp(QMainWindow):
 
         video_layout.addWidget(QLabel(self.language_manager.get_text('encoder') + ":"), 1, 0)
         self.codec_combo = QComboBox()
-        self.codec_combo.addItems(["H.264 (libx264)", "H.265/HEVC (libx265)", "MPEG-4 (mpeg4)", "VP8 (libvpx)", "VP9 (libvpx-vp9)"])
+        self.codec_combo.addItems(list(SUPPORTED_CODECS.keys()))
         video_layout.addWidget(self.codec_combo, 1, 1)
 
         video_layout.addWidget(QLabel(self.language_manager.get_text('fps') + ":"), 2, 0)
@@ -919,6 +1017,48 @@ class ScreenRecorderApp(QMainWindow):
         self.quality_combo.setCurrentText("High")
         video_layout.addWidget(self.quality_combo, 3, 1)
 
+        video_layout.addWidget(self.translated(QLabel(), 'capture_backend', ":"), 4, 0)
+        self.capture_backend_combo = QComboBox()
+        for label, backend_name in CAPTURE_BACKENDS.items():
+            self.capture_backend_combo.addItem(label, backend_name)
+        video_layout.addWidget(self.capture_backend_combo, 4, 1)
+
+        video_layout.addWidget(self.translated(QLabel(), 'queue_full', ":"), 5, 0)
+        self.backpressure_combo = QComboBox()
+        for label, policy in BACKPRESSURE_POLICIES.items():
+            self.backpressure_combo.addItem(label, policy)
+        video_layout.addWidget(self.backpressure_combo, 5, 1)
+
+        video_layout.addWidget(self.translated(QLabel(), 'frame_rate_mode', ":"), 6, 0)
+        self.frame_rate_mode_combo = QComboBox()
+        for label, mode in FRAME_RATE_MODES.items():
+            self.frame_rate_mode_combo.addItem(label, mode)
+        video_layout.addWidget(self.frame_rate_mode_combo, 6, 1)
+
+        self.skip_static_check = self.translated(QCheckBox(), 'skip_static')
+        self.skip_static_check.setChecked(True)
+        video_layout.addWidget(self.skip_static_check, 7, 0, 1, 2)
+
+        video_layout.addWidget(self.translated(QLabel(), 'screenshot_format', ":"), 8, 0)
+        self.screenshot_format_combo = QComboBox()
+        for label, image_format in SCREENSHOT_FORMATS.items():
+            self.screenshot_format_combo.addItem(label, image_format)
+        video_layout.addWidget(self.screenshot_format_combo, 8, 1)
+
+        video_layout.addWidget(self.translated(QLabel(), 'burst_screenshots', ":"), 9, 0)
+        burst_layout = QHBoxLayout()
+        self.burst_interval_combo = QComboBox()
+        for label, interval in BURST_INTERVALS.items():
+            self.burst_interval_combo.addItem(label, interval)
+        self.burst_interval_combo.setCurrentIndex(1)
+        burst_layout.addWidget(self.burst_interval_combo)
+        self.burst_duration_combo = QComboBox()
+        for label, duration in BURST_DURATIONS.items():
+            self.burst_duration_combo.addItem(label, duration)
+        self.burst_duration_combo.setCurrentIndex(1)
+        burst_layout.addWidget(self.burst_duration_combo)
+        video_layout.addLayout(burst_layout, 9, 1)
+
         video_group.setLayout(video_layout)
         layout.addWidget(video_group)
 
@@ -1016,6 +1156,10 @@ class ScreenRecorderApp(QMainWindow):
         self.screenshot_btn.clicked.connect(self.take_screenshot)
         control_layout.addWidget(self.screenshot_btn)
 
+        self.burst_btn = QPushButton(self.language_manager.get_text('burst'))
+        self.burst_btn.clicked.connect(self.toggle_burst)
+        control_layout.addWidget(self.burst_btn)
+
         parent_layout.addWidget(control_frame)
 
     def create_status_bar(self, parent_layout):
@@ -1036,15 +1180,27 @@ class ScreenRecorderApp(QMainWindow):
         """设置录制区域模式"""
         self.area_mode = mode
         if mode == 'fullscreen':
+            self.monitor_frame.show()
             self.custom_frame.hide()
             self.follow_frame.hide()
         elif mode == 'custom':
+            self.monitor_frame.hide()
             self.custom_frame.show()
             self.follow_frame.hide()
         elif mode == 'follow_mouse':
+            self.monitor_frame.hide()
             self.custom_frame.hide()
             self.follow_frame.show()
 
+    def refresh_monitor_choices(self, monitors=None):
+        """按最新的显示器布局刷新显示器选项，尽量保持原来的选择"""
+        selected = self.monitor_combo.currentData()
+        self.monitor_combo.clear()
+        for label, monitor in get_display_geometry().monitor_choices().items():
+            self.monitor_combo.addItem(label, monitor)
+        index = self.monitor_combo.findData(selected)
+        self.monitor_combo.setCurrentIndex(max(0, index))
+
     def select_area(self):
         """选择录制区域"""
         QMessageBox.information(self, "Select Area", "Click and drag to select recording area")
@@ -1109,6 +1265,16 @@ class ScreenRecorderApp(QMainWindow):
         """刷新界面文本"""
         self.setWindowTitle(f"Super Hi Vision - {self.language_manager.get_text('app_title')} v{__version__}")
         self.status_label.setText(self.language_manager.get_text('ready'))
+        for widget, key, suffix in self.text_widgets:
+            widget.setText(self.language_manager.get_text(key) + suffix)
+        bursting = self.burst is not None and self.burst.running
+        self.burst_btn.setText(self.language_manager.get_text('stop_burst' if bursting else 'burst'))
+
+    def translated(self, widget, key, suffix=""):
+        """设置控件文本并登记，切换语言时随 refresh_ui_texts 刷新"""
+        widget.setText(self.language_manager.get_text(key) + suffix)
+        self.text_widgets.append((widget, key, suffix))
+        return widget
 
     def toggle_recording(self):
         """切换录制状态"""
@@ -1128,7 +1294,7 @@ class ScreenRecorderApp(QMainWindow):
         self.recording = True
         self.paused = False
         self.frame_count = 0
-        self.audio_frames = []
+        self.audio_spool = None
         self.recording_start_time = time.time()
 
         output_filename = self.filename_edit.text()
@@ -1138,13 +1304,13 @@ class ScreenRecorderApp(QMainWindow):
         self.output_file = os.path.join(self.output_dir, f"{output_filename}.{self.format.lower()}")
 
         fourcc_map = {
-            'MP4': cv2.VideoWriter_fourcc(*'mp4v'),
-            'AVI': cv2.VideoWriter_fourcc(*'XVID'),
-            'MKV': cv2.VideoWriter_fourcc(*'X264'),
-            'FLV': cv2.VideoWriter_fourcc(*'FLV1'),
-            'MOV': cv2.VideoWriter_fourcc(*'avc1')
+            'MP4': 'mp4v',
+            'AVI': 'XVID',
+            'MKV': 'X264',
+            'FLV': 'FLV1',
+            'MOV': 'avc1'
         }
-        fourcc = fourcc_map.get(self.format, cv2.VideoWriter_fourcc(*'mp4v'))
+        fourcc = fourcc_map.get(self.format, 'mp4v')
 
         fps_map = {
             '10 FPS': 10, '15 FPS': 15, '24 FPS': 24, '30 FPS': 30,
@@ -1152,11 +1318,23 @@ class ScreenRecorderApp(QMainWindow):
         }
         self.fps = fps_map.get(self.fps_combo.currentText(), 30)
 
-        if self.area_mode == 'fullscreen':
+        self.capture_backend = create_capture_backend(self.capture_backend_combo.currentData())
+
+        self.monitor_bbox = None
+        self.desktop_compositor = None
+        geometry = get_display_geometry()
+        monitor = self.monitor_combo.currentData()
+        if self.area_mode == 'fullscreen' and monitor == VIRTUAL_DESKTOP:
+            # 所有显示器合成到一帧
+            self.desktop_compositor = VirtualDesktopCompositor(geometry)
+            height, width = self.desktop_compositor.frame_shape()[:2]
+        elif self.area_mode == 'fullscreen' and monitor and monitor < len(geometry.monitors()):
+            self.monitor_bbox = monitor_bbox(geometry.monitors()[monitor])
+            width = self.monitor_bbox[2] - self.monitor_bbox[0]
+            height = self.monitor_bbox[3] - self.monitor_bbox[1]
+        elif self.area_mode == 'fullscreen':
             try:
-                from PIL import ImageGrab
-                screen = ImageGrab.grab()
-                width, height = screen.size
+                width, height = self.capture_backend.screen_size()
             except:
                 width, height = 1920, 1080
         elif self.area_mode == 'custom':
@@ -1166,14 +1344,61 @@ class ScreenRecorderApp(QMainWindow):
             width = self.follow_width_spin.value()
             height = self.follow_height_spin.value()
 
-        self.video_writer = cv2.VideoWriter(self.output_file, fourcc, self.fps, (width, height))
-
-        if self.record_audio and self.enable_audio_check.isChecked():
-            device_index = self.audio_device_combo.currentData()
-            if device_index >= 0:
-                self.audio_recorder = AudioRecorderThread(device_index)
-                self.audio_recorder.audio_data_signal.connect(self.on_audio_data)
-                self.audio_recorder.start()
+        self.frame_rate_mode = self.frame_rate_mode_combo.currentData()
+        if ffmpeg_available():
+            # FFmpeg管道直接接收捕获后端的原生帧格式，省去颜色转换
+            self.pixel_format = negotiate_pixel_format(
+                self.capture_backend.native_format, FFmpegPipeEncoder.accepted_formats
+            )
+            # 按所选编码器和质量预设一次编码出最终文件
+            self.codec = SUPPORTED_CODECS.get(self.codec_combo.currentText(), "libx264")
+            self.quality = self.quality_combo.currentText().lower()
+            preset = QUALITY_PRESETS.get(self.quality, QUALITY_PRESETS["medium"])
+            # 音频作为 FFmpeg 的第二路输入实时混流，停止录制即得到带声音的成品
+            audio_format = None
+            if self.audio_recording_enabled():
+                audio_format = {"rate": self.audio_rate, "channels": self.audio_channels}
+            self.video_writer = FFmpegPipeEncoder(self.output_file, (width, height), self.fps,
+                                                  pixel_format=self.pixel_format,
+                                                  codec=self.codec,
+                                                  crf=preset["crf"],
+                                                  bitrate=preset["bitrate"],
+                                                  audio_format=audio_format,
+                                                  vfr=self.frame_rate_mode == "vfr")
+        else:
+            self.pixel_format = "bgr"
+            if self.frame_rate_mode == "vfr":
+                print("[INFO] Variable frame rate requires FFmpeg, using constant frame rate")
+                self.frame_rate_mode = "cfr"
+            self.video_writer = OpenCVVideoEncoder(self.output_file, fourcc, self.fps, (width, height))
+
+        # 缓冲池大小 = 队列长度 + 正在抓取的一帧 + 正在编码的一帧 + 编码线程保留的上一帧
+        self.frame_pool = FramePool(DEFAULT_QUEUE_SIZE + 3)
+        self.frame_queue = FrameQueue(DEFAULT_QUEUE_SIZE, self.backpressure_combo.currentData(),
+                                      on_drop=self.frame_pool.release)
+        self.encoder_thread = FrameEncoderThread(self.frame_queue, self.video_writer.write,
+                                                 process=self.drawing_tool.apply_drawings,
+                                                 release=self.frame_pool.release)
+        self.encoder_thread.start()
+        self.session_clock = SessionClock()
+        self.frame_pacer = FramePacer(self.fps, clock=self.session_clock.now)
+        self.static_detector = StaticFrameDetector() if self.skip_static_check.isChecked() else None
+        if self.area_mode == 'follow_mouse':
+            self.follow_camera = FollowCamera(width, height, self.follow_camera_combo.currentData(),
+                                              self.mouse_tracker.geometry)
+        else:
+            self.follow_camera = None
+
+        # 会话时间轴从这里开始，视频第一帧和音频第一个采样都对应会话时刻 0
+        self.session_clock.start()
+        self.audio_syncer = None
+        if self.audio_recording_enabled():
+            if not getattr(self.video_writer, 'live_audio', False):
+                self.audio_spool = AudioSpool(os.path.join(self.temp_dir, "temp_audio.wav"),
+                                              self.audio_rate, self.audio_channels)
+            # 音视频偏差控制在半帧以内
+            self.audio_syncer = AudioSyncer(self.audio_rate, self.audio_channels, tolerance=0.5 / self.fps)
+            self.start_audio_recorder()
 
         self.recording_thread = QThread()
         self.recording_thread.run = self.recording_loop
@@ -1192,51 +1417,107 @@ class ScreenRecorderApp(QMainWindow):
 
     def recording_loop(self):
         """录制循环"""
+        pacer = self.frame_pacer
+        # 与音频共用会话时间轴的起点
+        pacer.start(0.0)
+        vfr = self.frame_rate_mode == "vfr"
+        detector = self.static_detector
         while self.recording:
-            if not self.paused:
-                try:
-                    if self.area_mode == 'fullscreen':
-                        from PIL import ImageGrab
-                        img = ImageGrab.grab()
-                        frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-                    elif self.area_mode == 'custom':
-                        from PIL import ImageGrab
-                        x, y = 0, 0
-                        w = self.width_spin.value()
-                        h = self.height_spin.value()
-                        img = ImageGrab.grab(bbox=(x, y, w, h))
-                        frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-                    elif self.area_mode == 'follow_mouse':
-                        from PIL import ImageGrab
-                        area = self.mouse_tracker.get_tracking_area_around_cursor(
-                            self.follow_width_spin.value(),
-                            self.follow_height_spin.value()
-                        )
-                        if area:
-                            x, y, w, h = area
-                            img = ImageGrab.grab(bbox=(x, y, x+w, y+h))
-                            frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-                        else:
-                            continue
-                    else:
-                        continue
-
-                    if frame is not None and frame.size > 0:
-                        frame = self.drawing_tool.apply_drawings(frame)
-                        self.video_writer.write(frame)
-                        self.frame_count += 1
+            if self.paused:
+                pacer.pause()
+                if detector:
+                    detector.reset()
+                QThread.msleep(100)
+                continue
+            pacer.resume()
+
+            # 按截止时间抓屏，抓屏耗时已计入帧间隔
+            capture_time = pacer.wait()
+            buffer = None
+            try:
+                if self.area_mode == 'fullscreen':
+                    bbox = self.monitor_bbox
+                elif self.area_mode == 'custom':
+                    x = self.x_spin.value()
+                    y = self.y_spin.value()
+                    w = self.width_spin.value()
+                    h = self.height_spin.value()
+                    bbox = (x, y, x + w, y + h)
+                elif self.area_mode == 'follow_mouse':
+                    bbox = None
+                else:
+                    continue
 
-                except Exception as e:
-                    print(f"Recording error: {e}")
+                # 从缓冲池借出缓冲区，后端直接写入
+                if self.follow_camera:
+                    shape = self.follow_camera.frame_shape(self.pixel_format)
+                elif self.desktop_compositor:
+                    shape = self.desktop_compositor.frame_shape(self.pixel_format)
+                else:
+                    shape = self.capture_backend.frame_shape(bbox, self.pixel_format)
+                buffer = self.frame_pool.acquire(shape)
+                if buffer is None:
                     continue
+                if self.follow_camera:
+                    # 跟随鼠标: 虚拟镜头平滑跟随光标，从缓存的大窗口中裁剪
+                    cursor = QCursor.pos()
+                    self.mouse_tracker.update_position(cursor.x(), cursor.y())
+                    frame = self.follow_camera.capture(self.capture_backend,
+                                                       self.mouse_tracker.current_x,
+                                                       self.mouse_tracker.current_y,
+                                                       out=buffer, pixel_format=self.pixel_format)
+                elif self.desktop_compositor:
+                    # 虚拟桌面: 各显示器直接抓取到同一帧缓冲区
+                    frame = self.desktop_compositor.grab(self.capture_backend, out=buffer,
+                                                         pixel_format=self.pixel_format)
+                else:
+                    frame = self.capture_backend.grab(bbox, out=buffer, pixel_format=self.pixel_format)
+                if frame is not buffer:
+                    self.frame_pool.release(buffer)
+                buffer = None
+
+                if frame is not None and frame.size > 0:
+                    # 跟随鼠标和虚拟桌面的帧经过裁剪/合成，后端报告的变化区域不适用
+                    changed = None if self.follow_camera or self.desktop_compositor \
+                        else self.capture_backend.changed_regions
+                    if detector and detector.is_static(frame, self.drawing_tool.token(), changed):
+                        # 静止画面：CFR 下由编码线程重写上一帧，VFR 下直接不写
+                        self.frame_pool.release(frame)
+                        if not vfr:
+                            repeat = pacer.commit(capture_time)
+                            if repeat:
+                                self.frame_queue.put(None, repeat)
+                    elif vfr:
+                        # 可变帧率：帧带着抓取时间戳入队
+                        self.frame_queue.put(frame, timestamp=pacer.stamp(capture_time))
+                    else:
+                        # 抓屏跟不上时重复写入，保持恒定帧率
+                        repeat = pacer.commit(capture_time)
+                        if repeat == 0:
+                            self.frame_pool.release(frame)
+                            continue
+                        self.frame_queue.put(frame, repeat)
+                    self.frame_count += 1
 
-            QThread.msleep(int(1000 / self.fps))
+            except Exception as e:
+                print(f"Recording error: {e}")
+                self.frame_pool.release(buffer)
+                continue
+
+        # 可变帧率下静止画面不写帧：结束时按当前会话时刻补写最后一帧，
+        # 以静止画面结尾的录制时长仍与会话时钟（和实时混流的音频）一致
+        if vfr and pacer.frames_captured:
+            self.frame_queue.put(None, timestamp=pacer.stamp(pacer.clock()))
 
     def pause_recording(self):
         """暂停录制"""
         self.paused = True
+        # 冻结会话时间轴，暂停期间既不产生帧位也不接收音频
+        self.session_clock.pause()
         if self.audio_recorder:
+            # 等录音线程退出，恢复录制时新旧两个线程不会同时写入
             self.audio_recorder.stop()
+            self.audio_recorder.wait(1000)
 
         self.start_btn.setText(self.language_manager.get_text('resume_recording'))
         self.status_label.setText(self.language_manager.get_text('paused'))
@@ -1246,13 +1527,11 @@ class ScreenRecorderApp(QMainWindow):
     def resume_recording(self):
         """恢复录制"""
         self.paused = False
+        self.session_clock.resume()
 
-        if self.record_audio and self.enable_audio_check.isChecked():
-            device_index = self.audio_device_combo.currentData()
-            if device_index >= 0:
-                self.audio_recorder = AudioRecorderThread(device_index)
-                self.audio_recorder.audio_data_signal.connect(self.on_audio_data)
-                self.audio_recorder.start()
+        # 新音频流的第一块按会话时刻对齐，启动延迟用静音补齐
+        if self.audio_recording_enabled():
+            self.start_audio_recorder()
 
         self.start_btn.setText(self.language_manager.get_text('pause_recording'))
         self.status_label.setText(self.language_manager.get_text('recording'))
@@ -1266,18 +1545,65 @@ class ScreenRecorderApp(QMainWindow):
 
         self.recording = False
         self.paused = False
+        if self.session_clock:
+            # 暂停中停止时让调度器的等待结束
+            self.session_clock.resume()
 
         if self.timer:
             self.timer.stop()
 
         if self.audio_recorder:
+            # 录音线程取完剩余数据并写入后才关闭编码器和音频缓冲区
             self.audio_recorder.stop()
+            self.audio_recorder.wait(1000)
+            self.audio_recorder = None
+        if self.audio_syncer:
+            sync_stats = self.audio_syncer.stats()
+            print(f"[INFO] A/V sync: padded {sync_stats['padded']:.2f}s, dropped {sync_stats['dropped']:.2f}s, "
+                  f"resampled {sync_stats['stretched'] * 1000:.0f}ms, max drift {sync_stats['max_drift'] * 1000:.0f}ms")
+
+        if self.recording_thread:
+            self.recording_thread.wait(2000)
+
+        if self.encoder_thread:
+            self.encoder_thread.stop()
+            stats = self.encoder_thread.stats()
+            print(f"[INFO] Frame queue: queued {stats['queued']}, dropped {stats['dropped']}, "
+                  f"encoded {stats['encoded']}, repeated {stats['repeated']}, max depth {stats['max_depth']}")
+            if self.static_detector:
+                static_stats = self.static_detector.stats()
+                print(f"[INFO] Static frames: checked {static_stats['checked']}, "
+                      f"skipped {static_stats['static']}")
+            if self.follow_camera:
+                camera_stats = self.follow_camera.stats()
+                print(f"[INFO] Follow camera: captured {camera_stats['captured']}, "
+                      f"grab window moves {camera_stats['window_moves']}")
+            pacing = self.frame_pacer.stats()
+            print(f"[INFO] Frame pacing: captured {pacing['captured']} ({pacing['capture_fps']:.1f} FPS), "
+                  f"output {pacing['slots']}, duplicated {pacing['duplicated']}, dropped {pacing['dropped']}, "
+                  f"mean error {pacing['mean_error'] * 1000:.1f}ms, max error {pacing['max_error'] * 1000:.1f}ms")
+            self.encoder_thread = None
 
         if self.video_writer:
+            if getattr(self.video_writer, 'live_audio', False):
+                audio_seconds = self.video_writer.audio_bytes_written / (2 * self.audio_channels * self.audio_rate)
+                print(f"[INFO] Live-muxed audio: {audio_seconds:.1f}s")
             self.video_writer.release()
 
-        if self.audio_frames and self.output_file:
-            self.merge_audio_video()
+        if self.capture_backend:
+            if hasattr(self.capture_backend, "stats"):
+                capture_stats = self.capture_backend.stats()
+                print(f"[INFO] Damage capture: frames {capture_stats['frames']}, "
+                      f"full grabs {capture_stats['full_grabs']}, rects {capture_stats['rects']}, "
+                      f"pixels {capture_stats['pixels']}")
+            self.capture_backend.close()
+            self.capture_backend = None
+
+        if self.audio_spool is not None:
+            self.audio_spool.close()
+            if self.audio_spool.bytes_written and self.output_file:
+                self.merge_audio_video()
+            self.audio_spool = None
 
         self.start_btn.setText(self.language_manager.get_text('start_recording'))
         self.stop_btn.setEnabled(False)
@@ -1288,27 +1614,145 @@ class ScreenRecorderApp(QMainWindow):
 
         QMessageBox.information(self, "Recording Complete", f"Video saved to:\n{self.output_file}")
 
-    def on_audio_data(self, data):
-        """处理音频数据"""
-        if self.recording and not self.paused:
-            self.audio_frames.append(data)
+    def audio_recording_enabled(self):
+        """是否录制音频（已启用且选择了有效设备）"""
+        return (self.record_audio and self.enable_audio_check.isChecked()
+                and self.audio_device_combo.currentData() >= 0)
+
+    def start_audio_recorder(self):
+        """启动音频录制线程"""
+        self.audio_recorder = AudioRecorderThread(self.audio_device_combo.currentData(),
+                                                  self.audio_rate, self.audio_channels,
+                                                  clock=self.session_clock.now, sink=self.write_audio_block)
+        if self.audio_syncer:
+            self.audio_syncer.begin()
+        self.audio_recorder.level_signal.connect(self.on_audio_level)
+        self.audio_recorder.error_signal.connect(self.on_audio_error)
+        self.audio_recorder.start()
+
+    def write_audio_block(self, data, timestamp):
+        """写入一批音频（在录音线程中调用，不经过 GUI 事件循环）
+
+        停止录制时录音线程先取完剩余数据再退出，之后才关闭编码器和音频缓冲区，因此这里不检查 recording。
+        """
+        if self.paused:
+            return
+        if self.audio_syncer:
+            # 按会话时刻补齐空缺、丢弃暂停期间的数据、修正声卡时钟漂移
+            data = self.audio_syncer.process(data, timestamp)
+            if not data:
+                return
+        writer = self.video_writer
+        if getattr(writer, 'live_audio', False):
+            # 实时混流：直接写入编码器
+            writer.write_audio(data)
+        elif self.audio_spool is not None:
+            # 写入音频缓冲区，由写盘线程落盘
+            self.audio_spool.write(data)
+
+    def on_audio_level(self, level):
+        """更新音频电平（每 AUDIO_LEVEL_INTERVAL 秒一次）"""
+        self.audio_level = level
+
+    def on_audio_error(self, message):
+        """音频录制出错"""
+        print(f"[ERROR] Audio recording failed: {message}")
+        # 结束实时混流的音频输入，FFmpeg 继续只编码视频
+        if getattr(self.video_writer, 'live_audio', False):
+            self.video_writer.close_audio()
 
     def merge_audio_video(self):
         """合并音频和视频"""
-        pass
+        # 有 FFmpeg 时音频已在录制过程中实时混流；OpenCV 回退路径没有 FFmpeg，无法合并，
+        # 流式写入的音频文件保存在视频旁边
+        audio_file = os.path.splitext(self.output_file)[0] + ".wav"
+        try:
+            shutil.move(self.audio_spool.path, audio_file)
+            print(f"[INFO] FFmpeg not available, audio track saved separately: {audio_file}")
+        except OSError as e:
+            print(f"[ERROR] Failed to save audio track: {e}")
+
+    def screenshot_area(self):
+        """截图区域（与录制区域一致），返回 bbox、None（主显示器）或 VIRTUAL_DESKTOP"""
+        if self.area_mode == 'fullscreen':
+            geometry = get_display_geometry()
+            monitor = self.monitor_combo.currentData()
+            if monitor == VIRTUAL_DESKTOP:
+                return VIRTUAL_DESKTOP
+            if monitor and monitor < len(geometry.monitors()):
+                return monitor_bbox(geometry.monitors()[monitor])
+            return None
+        if self.area_mode == 'custom':
+            x = self.x_spin.value()
+            y = self.y_spin.value()
+            return (x, y, x + self.width_spin.value(), y + self.height_spin.value())
+        # 跟随鼠标: 以当前光标为中心
+        cursor = QCursor.pos()
+        self.mouse_tracker.update_position(cursor.x(), cursor.y())
+        x, y, w, h = self.mouse_tracker.get_tracking_area_around_cursor(
+            self.follow_width_spin.value(), self.follow_height_spin.value())
+        return (x, y, x + w, y + h)
 
     def take_screenshot(self):
-        """截图"""
+        """截图（抓屏后立即返回，编码保存在后台完成）"""
         try:
-            from PIL import ImageGrab
-            screenshot = ImageGrab.grab()
-            filename = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            filepath = os.path.join(self.output_dir, filename)
-            screenshot.save(filepath)
-            QMessageBox.information(self, "Screenshot", f"Screenshot saved to:\n{filepath}")
+            self.screenshot_service.output_dir = self.output_dir
+            image_format = self.screenshot_format_combo.currentData()
+            area = self.screenshot_area()
+
+            def grab(backend):
+                if area == VIRTUAL_DESKTOP:
+                    return VirtualDesktopCompositor(get_display_geometry()).grab(backend)
+                return backend.grab(area)
+
+            # 录制中复用录制的捕获后端，否则临时创建
+            if self.capture_backend is not None:
+                self.screenshot_service.capture(lambda: grab(self.capture_backend),
+                                                self.drawing_tool.apply_drawings, image_format)
+            else:
+                with create_capture_backend(self.capture_backend_combo.currentData()) as backend:
+                    self.screenshot_service.capture(lambda: grab(backend),
+                                                    self.drawing_tool.apply_drawings, image_format)
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to take screenshot:\n{str(e)}")
 
+    def toggle_burst(self):
+        """开始连拍；连拍抓屏中再次调用则提前结束"""
+        if self.burst is not None and self.burst.running:
+            self.burst.stop()
+            return
+        try:
+            area = self.screenshot_area()
+            self.burst = BurstCapture(
+                self.output_dir, self.temp_dir,
+                interval=self.burst_interval_combo.currentData(),
+                duration=self.burst_duration_combo.currentData(),
+                bbox=None if area == VIRTUAL_DESKTOP else area,
+                backend=self.capture_backend,
+                backend_name=self.capture_backend_combo.currentData(),
+                compositor=VirtualDesktopCompositor(get_display_geometry()) if area == VIRTUAL_DESKTOP else None,
+                process=self.drawing_tool.apply_drawings,
+                image_format=self.screenshot_format_combo.currentData(),
+                on_done=lambda stats: self.burst_finished.emit(
+                    f"Burst finished: {stats['captured']} captured, {stats['encoded']} encoded, "
+                    f"{stats['missed']} missed -> {stats['folder']}")
+            ).start()
+            self.burst_btn.setText(self.language_manager.get_text('stop_burst'))
+            print("[INFO] Burst screenshots started")
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to start burst:\n{str(e)}")
+
+    def on_burst_finished(self, message):
+        """连拍完成（界面线程）"""
+        print(f"[OK] {message}")
+        self.burst_btn.setText(self.language_manager.get_text('burst'))
+        self.status_bar.showMessage(message, 10000)
+
+    def on_screenshot_saved(self, filepath):
+        """截图保存完成（界面线程）"""
+        print(f"[OK] Screenshot saved: {filepath}")
+        self.status_bar.showMessage(f"Screenshot saved to: {filepath}", 5000)
+
     def update_recording_status(self):
         """更新录制状态"""
         if self.recording and self.recording_start_time:
@@ -1322,6 +1766,23 @@ class ScreenRecorderApp(QMainWindow):
                 size_mb = os.path.getsize(self.output_file) / (1024 * 1024)
                 self.file_size_label.setText(f"File Size: {size_mb:.1f} MB")
 
+            if self.frame_queue and not self.paused:
+                queue_stats = self.frame_queue.stats()
+                pacing = self.frame_pacer.stats()
+                self.status_label.setText(
+                    f"{self.language_manager.get_text('recording')} | "
+                    f"FPS: {pacing['capture_fps']:.1f}/{self.fps} | "
+                    f"Static: {self.static_detector.frames_static if self.static_detector else 0} | "
+                    f"Queue: {queue_stats['depth']} | Dropped: {queue_stats['dropped']}"
+                    + (f" | Audio: {self.audio_level_text()}" if self.audio_recorder else "")
+                )
+
+    def audio_level_text(self):
+        """峰值电平显示为 dBFS"""
+        if self.audio_level <= 0:
+            return "-inf dB"
+        return f"{20 * math.log10(self.audio_level):.0f} dB"
+
     def closeEvent(self, event):
         """关闭事件"""
         if self.recording:
@@ -1337,6 +1798,10 @@ class ScreenRecorderApp(QMainWindow):
 
             self.stop_recording()
 
+        # 结束连拍抓屏，等待后台截图保存完成
+        if self.burst is not None:
+            self.burst.stop()
+        self.screenshot_service.close()
         shutil.rmtree(self.temp_dir, ignore_errors=True)
         event.accept()
 
@@ -0,0 +1,1046 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 画图标注图层
+Tk 版与 PyQt5 版的 DrawingTool 共用的渲染部分:
+已提交的图形只在变化时渲染一次到缓存的预乘 BGRA 图层，每帧只把图层的外接矩形
+混合到画面上；正在拖拽的临时图形（temp_shape）仍在每帧上直接绘制。
+画笔的一笔保存为一个 stroke 图形，点序列存放在可增长的 NumPy 数组中，
+渲染时每笔只调用一次 cv2.polylines，开销与笔画数而不是鼠标事件数成正比。
+ShapeIndex 是按图形外接矩形建立的均匀网格索引，用于橡皮擦命中测试；
+擦除、撤销、重做后只重新渲染受影响的图层瓦片（瓦片与网格单元大小相同）。
+FadingOverlay 管理限时消退的墨迹：按到期时间分桶，每桶只渲染一次，
+淡出时只在透明度档位变化时重新计算该桶的混合平面，到期后整桶移除。
+文字不再逐次调用 cv2.putText，而是按 (文字, 大小, 颜色) 栅格化一次为缓存的精灵图再贴到画面上；
+KeyPressOverlay（屏幕按键显示）也复用同一个精灵缓存，每帧只做几次小块混合。
+"""
+
+import math
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+TEXT_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# 文字笔画粗细（文字图形没有线宽属性）
+TEXT_THICKNESS = 2
+
+# 文字精灵缓存的最大条目数（超出后淘汰最久未用的）
+TEXT_SPRITE_CAPACITY = 256
+
+# 空间索引网格单元 / 图层瓦片的边长（像素）
+GRID_CELL = 128
+
+# 重绘瓦片时暂存区在相关图形外接矩形之外多留的边距（覆盖抗锯齿和线帽的外溢）
+TILE_MARGIN = 32
+
+# 墨迹保留时间（界面显示名称 -> 秒，0 表示永久保留）
+INK_LIFETIMES = {
+    "永久保留": 0,
+    "3 秒后消退": 3,
+    "5 秒后消退": 5,
+    "10 秒后消退": 10,
+    "30 秒后消退": 30
+}
+
+# 到期前的淡出时长（秒）
+FADE_DURATION = 1.0
+
+# 到期时间分桶粒度（秒）：同一桶内的图形同时淡出、同时移除
+FADE_BUCKET_SECONDS = 0.25
+
+# 透明度档位数：档位不变时直接复用上一帧的混合平面
+FADE_LEVELS = 32
+
+# 屏幕按键显示: 每个按键的显示时长（秒）、最多同时显示的按键数、文字大小
+KEY_OVERLAY_SECONDS = 2.0
+KEY_OVERLAY_HISTORY = 6
+KEY_OVERLAY_SIZE = 9
+
+# 按键键帽样式: 文字颜色、背景颜色 (BGR)、背景不透明度、内边距、键帽间距、离画面左下角的边距
+KEY_CAP_COLOR = (255, 255, 255)
+KEY_CAP_BACKGROUND = (48, 48, 48)
+KEY_CAP_OPACITY = 200
+KEY_CAP_PADDING = 10
+KEY_CAP_GAP = 8
+KEY_CAP_MARGIN = 24
+
+# 与其他按键组合显示的修饰键（Shift 只与非字符键组合，避免打字时满屏 Shift+A）
+KEY_MODIFIERS = ("Ctrl", "Alt", "Win", "Shift")
+
+
+class StrokePoints:
+    """一笔的点序列（容量不足时倍增的 int32 数组）
+
+    append() 只在末尾写入新点后再增加计数，渲染线程读取 array() 得到的视图始终完整。
+    """
+    __slots__ = ("_data", "count", "bbox")
+
+    def __init__(self, capacity=64):
+        self._data = np.empty((max(2, int(capacity)), 2), dtype=np.int32)
+        self.count = 0
+        self.bbox = None
+
+    def append(self, x, y):
+        """追加一个点，与上一个点相同时忽略"""
+        x, y = int(x), int(y)
+        if self.count and self._data[self.count - 1, 0] == x and self._data[self.count - 1, 1] == y:
+            return False
+        if self.count == len(self._data):
+            grown = np.empty((len(self._data) * 2, 2), dtype=np.int32)
+            grown[:self.count] = self._data[:self.count]
+            self._data = grown
+        self._data[self.count] = (x, y)
+        self.count += 1
+        if self.bbox is None:
+            self.bbox = (x, y, x, y)
+        else:
+            left, top, right, bottom = self.bbox
+            self.bbox = (min(left, x), min(top, y), max(right, x), max(bottom, y))
+        return True
+
+    def array(self):
+        """返回已有点的 (N, 2) 视图"""
+        return self._data[:self.count]
+
+    def __len__(self):
+        return self.count
+
+
+def new_stroke(x, y, color, thickness):
+    """以 (x, y) 为起点创建一笔画笔图形"""
+    points = StrokePoints()
+    points.append(x, y)
+    return {
+        "type": "stroke",
+        "points": points,
+        "color": color,
+        "thickness": thickness
+    }
+
+
+def new_text(x, y, text, color, size):
+    """在基线起点 (x, y) 创建文字图形"""
+    return {
+        "type": "text",
+        "x": x,
+        "y": y,
+        "text": text,
+        "color": color,
+        "size": size,
+        "thickness": TEXT_THICKNESS
+    }
+
+
+class TextSpriteCache:
+    """文字精灵缓存
+
+    每个 (文字, 大小, 颜色, 粗细, 背景) 只栅格化一次为预乘 BGRA 精灵，
+    按画面通道数缓存混合平面，之后每次绘制只是一块小区域的乘加。
+    """
+
+    def __init__(self, capacity=TEXT_SPRITE_CAPACITY):
+        self.capacity = capacity
+        self._sprites = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, size, color, thickness=TEXT_THICKNESS, background=None, padding=0):
+        """返回文字精灵；background 为 (BGR 颜色, 不透明度) 时带半透明背景框"""
+        key = (text, size, tuple(int(c) for c in color[:3]), thickness, background, padding)
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+                return sprite
+        sprite = self._render(text, size, key[2], thickness, background, padding)
+        with self._lock:
+            self._sprites[key] = sprite
+            self.misses += 1
+            while len(self._sprites) > self.capacity:
+                self._sprites.popitem(last=False)
+        return sprite
+
+    def _render(self, text, size, color, thickness, background, padding):
+        """栅格化文字，返回 {"offset": 精灵左上角相对基线起点的偏移, "layer": 预乘 BGRA, "planes": {}}"""
+        scale = size / 10
+        (width, height), baseline = cv2.getTextSize(text, TEXT_FONT, scale, thickness)
+        pad = thickness + 2 + padding
+        mask = np.zeros((height + baseline + 2 * pad + 1, width + 2 * pad + 1), dtype=np.uint8)
+        cv2.putText(mask, text, (pad, pad + height), TEXT_FONT, scale, 255, thickness, cv2.LINE_AA)
+
+        # 文字覆盖在背景之上: 颜色 = 文字 * m + 背景 * b * (1 - m)，不透明度 = m + b * (1 - m)
+        coverage = mask.astype(np.float32) / 255
+        alpha = coverage.copy()
+        premultiplied = coverage[:, :, None] * np.array(color, dtype=np.float32)
+        if background is not None:
+            background_color, opacity = background
+            under = (1 - coverage) * (opacity / 255)
+            premultiplied += under[:, :, None] * np.array(background_color[:3], dtype=np.float32)
+            alpha += under
+        layer = np.empty(mask.shape + (4,), dtype=np.uint8)
+        layer[:, :, :3] = np.clip(premultiplied + 0.5, 0, 255)
+        layer[:, :, 3] = np.clip(alpha * 255 + 0.5, 0, 255)
+        return {"offset": (-pad, -pad - height), "layer": layer, "planes": {}}
+
+    def __len__(self):
+        return len(self._sprites)
+
+    def stats(self):
+        """返回精灵缓存统计信息"""
+        return {"sprites": len(self._sprites), "hits": self.hits, "misses": self.misses}
+
+
+def sprite_size(sprite):
+    """精灵的 (宽, 高)"""
+    height, width = sprite["layer"].shape[:2]
+    return width, height
+
+
+def blit_sprite(canvas, sprite, x, y):
+    """把精灵混合到 canvas 上，(x, y) 为精灵左上角在 canvas 中的坐标，越界部分裁掉"""
+    layer = sprite["layer"]
+    height, width = layer.shape[:2]
+    left, top = max(0, x), max(0, y)
+    right, bottom = min(canvas.shape[1], x + width), min(canvas.shape[0], y + height)
+    if right <= left or bottom <= top:
+        return
+    channels = canvas.shape[2]
+    planes = sprite["planes"].get(channels)
+    if planes is None:
+        color = layer if channels == 4 else cv2.cvtColor(layer, cv2.COLOR_BGRA2BGR)
+        planes = (color, cv2.merge([cv2.bitwise_not(layer[:, :, 3])] * channels))
+        sprite["planes"][channels] = planes
+    color, inverse = planes
+    rows = slice(top - y, bottom - y)
+    cols = slice(left - x, right - x)
+    roi = canvas[top:bottom, left:right]
+    cv2.multiply(roi, inverse[rows, cols], dst=roi, scale=1.0 / 255)
+    cv2.add(roi, color[rows, cols], dst=roi)
+
+
+def shape_color(color, channels):
+    """把 BGR 颜色扩展为与画面通道数一致的颜色"""
+    color = tuple(int(c) for c in color[:3])
+    return color + (255,) if channels == 4 else color
+
+
+def circle_radius(shape):
+    """圆形图形的半径（起点为圆心，终点在圆周上）"""
+    return int(math.sqrt((shape["x2"] - shape["x1"]) ** 2 + (shape["y2"] - shape["y1"]) ** 2))
+
+
+def shape_bbox(shape):
+    """返回图形覆盖范围 (left, top, right, bottom)，已包含线宽"""
+    kind = shape["type"]
+    pad = shape.get("thickness", 1) + 2
+    if kind == "stroke":
+        if shape["points"].bbox is None:
+            return None
+        left, top, right, bottom = shape["points"].bbox
+    elif kind in ("line", "rectangle"):
+        left, right = sorted((shape["x1"], shape["x2"]))
+        top, bottom = sorted((shape["y1"], shape["y2"]))
+    elif kind == "circle":
+        radius = circle_radius(shape)
+        left, right = shape["x1"] - radius, shape["x1"] + radius
+        top, bottom = shape["y1"] - radius, shape["y1"] + radius
+    elif kind == "text":
+        scale = shape["size"] / 10
+        (width, height), baseline = cv2.getTextSize(shape["text"], TEXT_FONT, scale,
+                                                    shape.get("thickness", TEXT_THICKNESS))
+        left, right = shape["x"], shape["x"] + width
+        top, bottom = shape["y"] - height, shape["y"] + baseline
+    else:
+        return None
+    return left - pad, top - pad, right + pad + 1, bottom + pad + 1
+
+
+def draw_shape(canvas, shape, offset=(0, 0)):
+    """在 canvas（BGR 或 BGRA）上绘制一个图形，offset 为 canvas 左上角在画面中的坐标"""
+    color = shape_color(shape["color"], canvas.shape[2])
+    kind = shape["type"]
+    dx, dy = offset
+    if kind == "stroke":
+        points = shape["points"].array()
+        if len(points) > 1:
+            if dx or dy:
+                points = points - np.array((dx, dy), dtype=np.int32)
+            cv2.polylines(canvas, [points.reshape(-1, 1, 2)], False, color, shape["thickness"])
+    elif kind == "line":
+        cv2.line(canvas, (shape["x1"] - dx, shape["y1"] - dy), (shape["x2"] - dx, shape["y2"] - dy),
+                 color, shape["thickness"])
+    elif kind == "rectangle":
+        cv2.rectangle(canvas, (shape["x1"] - dx, shape["y1"] - dy), (shape["x2"] - dx, shape["y2"] - dy),
+                      color, shape["thickness"])
+    elif kind == "circle":
+        cv2.circle(canvas, (shape["x1"] - dx, shape["y1"] - dy), circle_radius(shape),
+                   color, shape["thickness"])
+    elif kind == "text":
+        sprite = get_text_sprites().get(shape["text"], shape["size"], shape["color"],
+                                        shape.get("thickness", TEXT_THICKNESS))
+        offset_x, offset_y = sprite["offset"]
+        blit_sprite(canvas, sprite, shape["x"] - dx + offset_x, shape["y"] - dy + offset_y)
+
+
+def _polyline_distance(points, x, y):
+    """点 (x, y) 到折线的最短距离"""
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) == 1:
+        return math.hypot(points[0, 0] - x, points[0, 1] - y)
+    start, end = points[:-1], points[1:]
+    segment = end - start
+    offset = np.array((x, y), dtype=np.float64) - start
+    length = np.maximum((segment * segment).sum(axis=1), 1e-9)
+    t = np.clip((offset * segment).sum(axis=1) / length, 0.0, 1.0)
+    nearest = start + segment * t[:, np.newaxis]
+    return float(np.hypot(nearest[:, 0] - x, nearest[:, 1] - y).min())
+
+
+def shape_hit(shape, x, y, tolerance=4):
+    """判断点 (x, y) 是否命中图形（描边图形按线条命中，填充图形按内部命中）"""
+    kind = shape["type"]
+    thickness = shape.get("thickness", 1)
+    reach = tolerance + max(thickness, 1) / 2.0
+    if kind == "stroke":
+        return _polyline_distance(shape["points"].array(), x, y) <= reach
+    if kind == "line":
+        return _polyline_distance(((shape["x1"], shape["y1"]), (shape["x2"], shape["y2"])), x, y) <= reach
+    if kind == "rectangle":
+        left, right = sorted((shape["x1"], shape["x2"]))
+        top, bottom = sorted((shape["y1"], shape["y2"]))
+        if thickness < 0:
+            return left - tolerance <= x <= right + tolerance and top - tolerance <= y <= bottom + tolerance
+        outline = ((left, top), (right, top), (right, bottom), (left, bottom), (left, top))
+        return _polyline_distance(outline, x, y) <= reach
+    if kind == "circle":
+        distance = math.hypot(x - shape["x1"], y - shape["y1"])
+        if thickness < 0:
+            return distance <= circle_radius(shape) + tolerance
+        return abs(distance - circle_radius(shape)) <= reach
+    bbox = shape_bbox(shape)
+    return bbox is not None and bbox[0] <= x < bbox[2] and bbox[1] <= y < bbox[3]
+
+
+def union_bbox(a, b):
+    """两个 bbox 的外接矩形（任一为 None 时返回另一个）"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+class ShapeIndex:
+    """图形外接矩形的均匀网格索引
+
+    每个图形登记到它的外接矩形覆盖的所有网格单元中；查询只检查相关单元内的图形，
+    上千个图形时命中测试的开销也与画面局部的图形数量相关。
+    插入时为图形分配递增的 id，id 顺序即绘制（层叠）顺序。
+    """
+
+    def __init__(self, cell=GRID_CELL):
+        self.cell = int(cell)
+        self._cells = {}
+        self._entries = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _cell_range(self, bbox):
+        """bbox 覆盖的网格单元坐标"""
+        left, top, right, bottom = bbox
+        for cy in range(top // self.cell, (bottom - 1) // self.cell + 1):
+            for cx in range(left // self.cell, (right - 1) // self.cell + 1):
+                yield cx, cy
+
+    def insert(self, shape):
+        """登记图形（撤销擦除时重新登记会沿用原来的 id）"""
+        with self._lock:
+            if "id" not in shape:
+                shape["id"] = self._next_id
+                self._next_id += 1
+            bbox = shape_bbox(shape)
+            if bbox is None:
+                return
+            self._entries[shape["id"]] = (bbox, shape)
+            for key in self._cell_range(bbox):
+                self._cells.setdefault(key, {})[shape["id"]] = shape
+
+    def remove(self, shape):
+        """移除图形"""
+        with self._lock:
+            entry = self._entries.pop(shape.get("id"), None)
+            if entry is None:
+                return
+            for key in self._cell_range(entry[0]):
+                bucket = self._cells.get(key)
+                if bucket is not None:
+                    bucket.pop(shape["id"], None)
+                    if not bucket:
+                        del self._cells[key]
+
+    def clear(self):
+        """移除所有图形（id 继续递增）"""
+        with self._lock:
+            self._cells = {}
+            self._entries = {}
+
+    def query(self, bbox):
+        """返回外接矩形与 bbox 相交的图形，按绘制顺序排列"""
+        left, top, right, bottom = bbox
+        found = {}
+        with self._lock:
+            for key in self._cell_range(bbox):
+                for shape_id, shape in self._cells.get(key, {}).items():
+                    s_left, s_top, s_right, s_bottom = self._entries[shape_id][0]
+                    if s_left < right and left < s_right and s_top < bottom and top < s_bottom:
+                        found[shape_id] = shape
+        return [found[shape_id] for shape_id in sorted(found)]
+
+    def hit_test(self, x, y, tolerance=4):
+        """返回 (x, y) 处最上层的图形，没有命中时返回 None"""
+        candidates = self.query((x - tolerance, y - tolerance, x + tolerance + 1, y + tolerance + 1))
+        for shape in reversed(candidates):
+            if shape_hit(shape, x, y, tolerance):
+                return shape
+        return None
+
+    def bbox(self, shape):
+        """返回已登记图形的外接矩形"""
+        with self._lock:
+            entry = self._entries.get(shape.get("id"))
+        return entry[0] if entry else shape_bbox(shape)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class AnnotationOverlay:
+    """已提交图形的缓存图层
+
+    图层为与画面同尺寸的预乘 BGRA 图像（抗锯齿边缘的颜色已乘以覆盖率）。
+    图形按 ShapeIndex 分配的 id 追加时只渲染新增的部分；擦除、撤销等编辑通过
+    invalidate() 标记受影响的瓦片，下一帧只清空并重绘这些瓦片内的图形；
+    generation 变化（清除等）或画面尺寸变化时整层重建。
+    每帧混合: 画面 = 画面 * (255 - A) / 255 + 图层颜色，只处理图层的外接矩形。
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.tile = index.cell
+        self._layer = None
+        self._bbox = None
+        self._generation = None
+        self._last_id = 0
+        self._dirty_tiles = set()
+        self._dirty_bbox = None
+        self._blend_cache = {}
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.full_renders = 0
+        self.shapes_rendered = 0
+        self.tiles_rendered = 0
+
+    def invalidate(self, bbox):
+        """标记 bbox 覆盖的瓦片需要重绘（图形被移除或插回原来的层叠位置后调用）"""
+        if bbox is None:
+            return
+        with self._lock:
+            self._dirty_tiles.update(self.index._cell_range(bbox))
+            self._dirty_bbox = union_bbox(self._dirty_bbox, bbox)
+
+    def _render_tiles(self, keys):
+        """清空脏瓦片并按层叠顺序重绘与它们相交的图形
+
+        图形在覆盖其完整外接矩形的暂存区上绘制，只拷回瓦片本身：OpenCV 在画布边缘裁剪折线后的
+        光栅化与完整绘制不同，图形只在图层边缘被裁剪时结果才与整层重建逐像素一致。
+        """
+        height, width = self._layer.shape[:2]
+        rects = []
+        for key in keys:
+            left, top = max(0, key[0] * self.tile), max(0, key[1] * self.tile)
+            right, bottom = min(width, (key[0] + 1) * self.tile), min(height, (key[1] + 1) * self.tile)
+            if left < right and top < bottom:
+                rects.append((left, top, right, bottom))
+        if not rects:
+            return
+        shapes = {}
+        for rect in rects:
+            for shape in self.index.query(rect):
+                if shape["id"] <= self._last_id:
+                    shapes[shape["id"]] = shape
+        region = None
+        for rect in rects:
+            region = union_bbox(region, rect)
+        for shape in shapes.values():
+            region = union_bbox(region, self.index.bbox(shape))
+        pad_left, pad_top = max(0, region[0] - TILE_MARGIN), max(0, region[1] - TILE_MARGIN)
+        pad_right, pad_bottom = min(width, region[2] + TILE_MARGIN), min(height, region[3] + TILE_MARGIN)
+        scratch = np.zeros((pad_bottom - pad_top, pad_right - pad_left, 4), dtype=np.uint8)
+        for shape_id in sorted(shapes):
+            draw_shape(scratch, shapes[shape_id], (pad_left, pad_top))
+        for left, top, right, bottom in rects:
+            self._layer[top:bottom, left:right] = \
+                scratch[top - pad_top:bottom - pad_top, left - pad_left:right - pad_left]
+        self.tiles_rendered += len(rects)
+
+    def _sync(self, shapes, generation, height, width):
+        """按需把图形渲染到图层，返回图层是否有内容"""
+        rebuilt = False
+        old_bbox = self._bbox
+        updated = []
+        if (self._layer is None or self._layer.shape[:2] != (height, width)
+                or generation != self._generation):
+            if self._layer is None or self._layer.shape[:2] != (height, width):
+                self._layer = np.zeros((height, width, 4), dtype=np.uint8)
+            else:
+                self._layer.fill(0)
+            self._bbox = None
+            self._last_id = 0
+            self._dirty_tiles.clear()
+            self._dirty_bbox = None
+            self._generation = generation
+            self.full_renders += 1
+            rebuilt = True
+
+        # 新追加的图形 id 大于已渲染的最大 id，从列表末尾向前找
+        added = []
+        for shape in reversed(shapes):
+            if shape.get("id", 0) <= self._last_id:
+                break
+            added.append(shape)
+        for shape in reversed(added):
+            draw_shape(self._layer, shape)
+            bbox = shape_bbox(shape)
+            self._bbox = union_bbox(self._bbox, bbox)
+            updated.append(bbox)
+            self._last_id = shape["id"]
+        self.shapes_rendered += len(added)
+
+        if self._dirty_tiles:
+            self._render_tiles(self._dirty_tiles)
+            for key in self._dirty_tiles:
+                updated.append((key[0] * self.tile, key[1] * self.tile,
+                                (key[0] + 1) * self.tile, (key[1] + 1) * self.tile))
+            self._dirty_tiles.clear()
+            # 插回的图形可能在当前外接矩形之外（被移除的图形本来就在其中）
+            self._bbox = union_bbox(self._bbox, self._dirty_bbox)
+            self._dirty_bbox = None
+
+        if rebuilt or self._bbox != old_bbox:
+            self._blend_cache = {}
+        else:
+            # 外接矩形不变时只更新混合平面中变化的部分
+            for rect in updated:
+                self._patch_planes(rect)
+        return self._bbox is not None
+
+    def _patch_planes(self, rect):
+        """把图层 rect 范围内的变化同步到已缓存的混合平面"""
+        for channels, ((left, top, right, bottom), color, inverse) in self._blend_cache.items():
+            p_left, p_top = max(left, rect[0]), max(top, rect[1])
+            p_right, p_bottom = min(right, rect[2]), min(bottom, rect[3])
+            if p_right <= p_left or p_bottom <= p_top:
+                continue
+            region = self._layer[p_top:p_bottom, p_left:p_right]
+            target = (slice(p_top - top, p_bottom - top), slice(p_left - left, p_right - left))
+            color[target] = region[:, :, :channels]
+            inverse[target] = 255 - region[:, :, 3:4]
+
+    def _blend_planes(self, channels):
+        """返回外接矩形内的 (预乘颜色, 255 - A)，按画面通道数缓存"""
+        planes = self._blend_cache.get(channels)
+        if planes is None:
+            height, width = self._layer.shape[:2]
+            left, top, right, bottom = self._bbox
+            left, top = max(0, left), max(0, top)
+            right, bottom = min(width, right), min(height, bottom)
+            region = self._layer[top:bottom, left:right]
+            inverse = cv2.bitwise_not(region[:, :, 3])
+            color = cv2.cvtColor(region, cv2.COLOR_BGRA2BGR) if channels == 3 else region.copy()
+            planes = ((left, top, right, bottom), color, cv2.merge([inverse] * channels))
+            self._blend_cache[channels] = planes
+        return planes
+
+    def apply(self, frame, shapes, generation=0):
+        """把已提交的图形混合到 frame 上（原地修改）"""
+        height, width, channels = frame.shape
+        with self._lock:
+            if not self._sync(shapes, generation, height, width):
+                return frame
+            (left, top, right, bottom), color, inverse = self._blend_planes(channels)
+            if right <= left or bottom <= top:
+                return frame
+            roi = frame[top:bottom, left:right]
+            cv2.multiply(roi, inverse, dst=roi, scale=1.0 / 255)
+            cv2.add(roi, color, dst=roi)
+        return frame
+
+    def stats(self):
+        """返回图层统计信息"""
+        return {
+            "full_renders": self.full_renders,
+            "shapes_rendered": self.shapes_rendered,
+            "tiles_rendered": self.tiles_rendered
+        }
+
+
+class FadingOverlay:
+    """限时消退墨迹的分桶合成器
+
+    图形按到期时间向上取整到 FADE_BUCKET_SECONDS 分桶，每桶在自己的外接矩形内缓存一块
+    完全不透明的预乘 BGRA 图层，只在桶内新增图形时重新渲染。
+    每帧按 alpha = 剩余时间 / FADE_DURATION 混合: 画面 = 画面 * (1 - alpha*A/255) + alpha * 图层颜色，
+    alpha 量化为 FADE_LEVELS 档，档位变化时才重新计算该桶的混合平面；到期的桶连同图形一起移除。
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.buckets_rendered = 0
+        self.planes_computed = 0
+        self.shapes_evicted = 0
+
+    def add(self, shape, lifetime, now=None):
+        """加入一个图形，lifetime 秒后消失（最后 FADE_DURATION 秒淡出）"""
+        now = self.clock() if now is None else now
+        key = math.ceil((now + lifetime) / FADE_BUCKET_SECONDS)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = {"expires": key * FADE_BUCKET_SECONDS, "shapes": [], "layer": None,
+                          "bbox": None, "planes": {}}
+                self._buckets[key] = bucket
+            bucket["shapes"].append(shape)
+            bucket["layer"] = None
+
+    def clear(self):
+        """移除所有消退中的图形"""
+        with self._lock:
+            self._buckets = {}
+
+    def __len__(self):
+        return sum(len(bucket["shapes"]) for bucket in self._buckets.values())
+
+    def _alpha_level(self, bucket, now):
+        """桶当前的透明度档位（FADE_LEVELS 为完全不透明）"""
+        remaining = bucket["expires"] - now
+        alpha = min(1.0, max(0.0, remaining / FADE_DURATION)) if FADE_DURATION > 0 else 1.0
+        return int(math.ceil(alpha * FADE_LEVELS))
+
+    def evict(self, now=None):
+        """移除已到期的桶，返回移除的图形数"""
+        now = self.clock() if now is None else now
+        evicted = 0
+        with self._lock:
+            for key in [key for key, bucket in self._buckets.items() if bucket["expires"] <= now]:
+                evicted += len(self._buckets.pop(key)["shapes"])
+        self.shapes_evicted += evicted
+        return evicted
+
+    def signature(self, now=None):
+        """各桶的透明度档位，淡出过程中每档变化一次，用作静止画面检测的 token"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            return tuple((key, self._alpha_level(bucket, now)) for key, bucket in self._buckets.items()
+                         if bucket["expires"] > now)
+
+    def _render(self, bucket, height, width):
+        """在桶的外接矩形内渲染桶内所有图形（完全不透明）"""
+        bbox = None
+        for shape in bucket["shapes"]:
+            bbox = union_bbox(bbox, shape_bbox(shape))
+        left, top = max(0, bbox[0]), max(0, bbox[1])
+        right, bottom = min(width, bbox[2]), min(height, bbox[3])
+        bucket["bbox"] = (left, top, right, bottom)
+        bucket["planes"] = {}
+        if right <= left or bottom <= top:
+            bucket["layer"] = np.zeros((0, 0, 4), dtype=np.uint8)
+            return
+        layer = np.zeros((bottom - top, right - left, 4), dtype=np.uint8)
+        for shape in bucket["shapes"]:
+            draw_shape(layer, shape, (left, top))
+        bucket["layer"] = layer
+        self.buckets_rendered += 1
+
+    def _planes(self, bucket, channels, level):
+        """返回桶在指定透明度档位下的 (预乘颜色, 255 - alpha*A)"""
+        cached = bucket["planes"].get(channels)
+        if cached is None or cached[0] != level:
+            layer = bucket["layer"]
+            scale = level / FADE_LEVELS
+            color = layer[:, :, :channels] if channels == 4 else cv2.cvtColor(layer, cv2.COLOR_BGRA2BGR)
+            color = cv2.convertScaleAbs(color, alpha=scale)
+            inverse = cv2.bitwise_not(cv2.convertScaleAbs(layer[:, :, 3], alpha=scale))
+            cached = (level, color, cv2.merge([inverse] * channels))
+            bucket["planes"][channels] = cached
+            self.planes_computed += 1
+        return cached[1], cached[2]
+
+    def apply(self, frame, now=None):
+        """把消退中的图形混合到 frame 上（原地修改），并移除到期的桶"""
+        now = self.clock() if now is None else now
+        self.evict(now)
+        height, width, channels = frame.shape
+        with self._lock:
+            for key in sorted(self._buckets):
+                bucket = self._buckets[key]
+                if bucket["layer"] is None or bucket["bbox"] is None:
+                    self._render(bucket, height, width)
+                level = self._alpha_level(bucket, now)
+                left, top, right, bottom = bucket["bbox"]
+                if level <= 0 or right <= left or bottom <= top:
+                    continue
+                if bottom > height or right > width:
+                    # 画面尺寸变化后按新尺寸重新渲染
+                    self._render(bucket, height, width)
+                    left, top, right, bottom = bucket["bbox"]
+                    if right <= left or bottom <= top:
+                        continue
+                color, inverse = self._planes(bucket, channels, level)
+                roi = frame[top:bottom, left:right]
+                cv2.multiply(roi, inverse, dst=roi, scale=1.0 / 255)
+                cv2.add(roi, color, dst=roi)
+        return frame
+
+    def stats(self):
+        """返回消退墨迹统计信息"""
+        return {
+            "buckets_rendered": self.buckets_rendered,
+            "planes_computed": self.planes_computed,
+            "evicted": self.shapes_evicted
+        }
+
+
+class AnnotationEditor:
+    """画图工具的图形存储与编辑（Tk 版与 PyQt5 版的 DrawingTool 共用）
+
+    shapes 为按层叠顺序排列的已提交图形，temp_shape 为正在拖拽的临时图形；
+    提交、擦除、清除都记录到撤销栈，撤销 / 重做只让受影响的瓦片重绘。
+    ink_lifetime 大于 0 时新提交的图形为限时墨迹，交给 FadingOverlay 管理，
+    不进入 shapes、不参与擦除和撤销，到期后自动移除。
+    version 在任何变化时递增，与消退档位一起组成静止画面检测的 token。
+    """
+
+    # 撤销记录上限
+    HISTORY_LIMIT = 200
+
+    def __init__(self):
+        self.shapes = []
+        self.temp_shape = None
+        self.index = ShapeIndex()
+        self.overlay = AnnotationOverlay(self.index)
+        self.undo_stack = []
+        self.redo_stack = []
+        self.generation = 0  # 图形被整体替换（如清除）时递增，图层随之重建
+        self.version = 0
+        self.fading = FadingOverlay()
+        self.ink_lifetime = 0  # 秒，0 表示永久保留
+
+    def _record(self, action):
+        """记录一次编辑，新的编辑会清空重做栈"""
+        self.undo_stack.append(action)
+        if len(self.undo_stack) > self.HISTORY_LIMIT:
+            del self.undo_stack[0]
+        self.redo_stack = []
+
+    def _position(self, shape):
+        """图形在 shapes 中的位置（按对象而不是内容查找）"""
+        return next((i for i, s in enumerate(self.shapes) if s is shape), None)
+
+    def _insert(self, shape, position=None):
+        """把图形放回 shapes；插回原位置或沿用旧 id 时标记瓦片重绘"""
+        fresh = "id" not in shape
+        self.index.insert(shape)
+        if position is None or position >= len(self.shapes):
+            self.shapes.append(shape)
+        else:
+            self.shapes.insert(position, shape)
+        if not fresh:
+            self.overlay.invalidate(self.index.bbox(shape))
+        self.version += 1
+
+    def _remove(self, shape):
+        """从 shapes 中移除图形，返回原位置"""
+        position = self._position(shape)
+        if position is None:
+            return None
+        bbox = self.index.bbox(shape)
+        del self.shapes[position]
+        self.index.remove(shape)
+        self.overlay.invalidate(bbox)
+        self.version += 1
+        return position
+
+    def _replace_all(self, shapes):
+        """整体替换图形列表（清除及其撤销），图层整层重建"""
+        self.index.clear()
+        for shape in shapes:
+            self.index.insert(shape)
+        self.shapes = list(shapes)
+        self.generation += 1
+        self.version += 1
+
+    def commit_shape(self, shape):
+        """提交一个新图形"""
+        if self.ink_lifetime > 0:
+            self.fading.add(shape, self.ink_lifetime)
+            self.version += 1
+            return
+        self._insert(shape)
+        self._record(("add", shape))
+
+    def erase_at(self, x, y, tolerance=4):
+        """擦除 (x, y) 处最上层的图形，返回是否擦除"""
+        shape = self.index.hit_test(x, y, tolerance)
+        if shape is None:
+            return False
+        position = self._remove(shape)
+        self._record(("erase", shape, position))
+        return True
+
+    def clear_all(self):
+        """清除所有绘制内容（可撤销）"""
+        if self.shapes:
+            self._record(("clear", self.shapes))
+        self._replace_all([])
+        self.fading.clear()
+        self.temp_shape = None
+
+    def undo(self):
+        """撤销上一次编辑，返回是否有可撤销的编辑"""
+        if not self.undo_stack:
+            return False
+        action = self.undo_stack.pop()
+        if action[0] == "add":
+            # 记下原位置，重做时插回同一层叠位置
+            action = ("add", action[1], self._remove(action[1]))
+        elif action[0] == "erase":
+            self._insert(action[1], action[2])
+        elif action[0] == "clear":
+            self._replace_all(action[1])
+        self.redo_stack.append(action)
+        return True
+
+    def redo(self):
+        """重做上一次撤销的编辑，返回是否有可重做的编辑"""
+        if not self.redo_stack:
+            return False
+        action = self.redo_stack.pop()
+        if action[0] == "add":
+            self._insert(action[1], action[2])
+        elif action[0] == "erase":
+            self._remove(action[1])
+        elif action[0] == "clear":
+            self._replace_all([])
+        self.undo_stack.append(action)
+        return True
+
+    def has_drawings(self):
+        """是否有需要叠加到画面上的内容"""
+        return bool(self.shapes) or self.temp_shape is not None or len(self.fading) > 0
+
+    def token(self):
+        """静止画面检测的 token：绘制变化或消退档位变化时改变"""
+        if len(self.fading):
+            return self.version, self.fading.signature()
+        return self.version
+
+    def apply_drawings(self, frame):
+        """将绘制的图形应用到帧上（已提交图形来自缓存图层，只有临时图形逐帧绘制）"""
+        self.overlay.apply(frame, self.shapes, self.generation)
+        self.fading.apply(frame)
+
+        temp_shape = self.temp_shape
+        if temp_shape:
+            draw_shape(frame, temp_shape)
+
+        return frame
+
+
+class KeyPressOverlay:
+    """屏幕按键显示（screencast keys）
+
+    键盘监听线程调用 press() / release()，编码线程调用 apply() 把最近的按键以键帽形式
+    画在画面左下角；每个键帽是缓存的文字精灵，连续重复的按键合并显示为 "A x3"。
+    """
+
+    def __init__(self, sprites=None, clock=time.monotonic):
+        self.sprites = sprites or get_text_sprites()
+        self.clock = clock
+        self._entries = []  # [显示文字, 次数, 最后按下时间]
+        self._modifiers = set()
+        self._lock = threading.Lock()
+        self.version = 0
+
+        # 统计信息
+        self.keys_shown = 0
+
+    def press(self, label, kind="key", now=None):
+        """记录一次按键；kind 为 "modifier"（修饰键）、"char"（字符键）或 "key"（功能键）"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            if kind == "modifier":
+                self._modifiers.add(label)
+                return
+            held = [m for m in KEY_MODIFIERS if m in self._modifiers and not (m == "Shift" and kind == "char")]
+            text = "+".join(held + [label])
+            if self._entries and self._entries[-1][0] == text:
+                self._entries[-1][1] += 1
+                self._entries[-1][2] = now
+            else:
+                self._entries.append([text, 1, now])
+                del self._entries[:-KEY_OVERLAY_HISTORY]
+            self.keys_shown += 1
+            self.version += 1
+
+    def release(self, label):
+        """修饰键松开"""
+        with self._lock:
+            self._modifiers.discard(label)
+
+    def clear(self):
+        """清除显示中的按键"""
+        with self._lock:
+            self._entries = []
+            self._modifiers.clear()
+            self.version += 1
+
+    def _expire(self, now):
+        """移除显示超时的按键（调用方持有锁）"""
+        alive = [entry for entry in self._entries if now - entry[2] < KEY_OVERLAY_SECONDS]
+        if len(alive) != len(self._entries):
+            self._entries = alive
+            self.version += 1
+
+    def token(self, now=None):
+        """静止画面检测的 token：按键出现或消失时改变"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            self._expire(now)
+            return self.version
+
+    def has_keys(self):
+        """是否有正在显示的按键"""
+        return bool(self._entries)
+
+    def apply(self, frame, now=None):
+        """把正在显示的按键画到 frame 左下角（原地修改）"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            self._expire(now)
+            labels = [text if count == 1 else f"{text} x{count}" for text, count, _ in self._entries]
+        x = KEY_CAP_MARGIN
+        for label in labels:
+            sprite = self.sprites.get(label, KEY_OVERLAY_SIZE, KEY_CAP_COLOR,
+                                      background=(KEY_CAP_BACKGROUND, KEY_CAP_OPACITY),
+                                      padding=KEY_CAP_PADDING)
+            width, height = sprite_size(sprite)
+            if x + width > frame.shape[1]:
+                break
+            blit_sprite(frame, sprite, x, frame.shape[0] - KEY_CAP_MARGIN - height)
+            x += width + KEY_CAP_GAP
+        return frame
+
+
+_shared_sprites = None
+_shared_lock = threading.Lock()
+
+
+def get_text_sprites():
+    """返回进程内共享的 TextSpriteCache"""
+    global _shared_sprites
+    with _shared_lock:
+        if _shared_sprites is None:
+            _shared_sprites = TextSpriteCache()
+        return _shared_sprites
+
+
+def check_incremental_render(shapes=60, edits=40, size=(1280, 720), seed=0):
+    """随机绘制、擦除、撤销、重做，逐步比较增量渲染与整层重建的结果，返回不一致的最大像素数"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    editor = AnnotationEditor()
+    base = np.full((height, width, 3), 96, dtype=np.uint8)
+    colors = ((0, 0, 255), (0, 255, 0), (255, 0, 0), (0, 255, 255), (255, 255, 255))
+    worst = 0
+
+    def random_shape():
+        color = colors[rng.integers(len(colors))]
+        thickness = int(rng.integers(1, 12))
+        kind = rng.choice(("stroke", "stroke", "stroke", "line", "rectangle", "circle", "text"))
+        x, y = int(rng.integers(-40, width + 40)), int(rng.integers(-40, height + 40))
+        if kind == "stroke":
+            shape = new_stroke(x, y, color, thickness)
+            for _ in range(int(rng.integers(2, 80))):
+                x += int(rng.integers(-60, 61))
+                y += int(rng.integers(-60, 61))
+                shape["points"].append(x, y)
+            return shape
+        if kind == "text":
+            return new_text(x, y, "Hi", color, int(rng.integers(10, 40)))
+        return {"type": kind, "x1": x, "y1": y, "x2": x + int(rng.integers(-200, 201)),
+                "y2": y + int(rng.integers(-200, 201)), "color": color, "thickness": thickness}
+
+    def compare():
+        incremental = editor.overlay.apply(base.copy(), editor.shapes, editor.generation)
+        rebuilt = AnnotationOverlay(editor.index).apply(base.copy(), editor.shapes, editor.generation)
+        return int(np.count_nonzero(np.any(incremental != rebuilt, axis=2)))
+
+    for _ in range(shapes):
+        editor.commit_shape(random_shape())
+    worst = max(worst, compare())
+    for _ in range(edits):
+        action = rng.integers(4)
+        if action == 0 and editor.shapes:
+            target = editor.shapes[rng.integers(len(editor.shapes))]
+            bbox = editor.index.bbox(target)
+            if target["type"] == "stroke":
+                x, y = (int(v) for v in target["points"].array()[rng.integers(len(target["points"]))])
+            else:
+                x, y = (bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2
+            editor.erase_at(x, y, tolerance=max(4, target.get("thickness", 1)))
+        elif action == 1:
+            editor.undo()
+        elif action == 2:
+            editor.redo()
+        else:
+            editor.commit_shape(random_shape())
+        worst = max(worst, compare())
+    return worst
+
+
+def main(argv=None):
+    """命令行自检入口：增量渲染必须与整层重建逐像素一致"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Super Hi Vision 标注图层增量渲染自检")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--shapes", type=int, default=60)
+    parser.add_argument("--edits", type=int, default=40)
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for seed in range(args.rounds):
+        mismatched = check_incremental_render(args.shapes, args.edits, seed=seed)
+        if mismatched:
+            failed += 1
+            print(f"种子 {seed}: 增量渲染与整层重建有 {mismatched} 个像素不一致")
+    print(f"增量渲染自检: {args.rounds - failed}/{args.rounds} 通过")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
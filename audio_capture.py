@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 回调模式音频采集
+阻塞式 stream.read() 依赖录音线程按时被调度: 视频循环占用 GIL 时录音线程来不及读取，
+PortAudio 的输入缓冲溢出，exception_on_overflow=False 又会把丢失的数据悄悄吞掉。
+这里改用 PyAudio 的回调模式: PortAudio 每采集到一块音频就调用回调，回调只把数据拷贝进
+预分配的 NumPy 环形缓冲区并登记时间戳（单生产者单消费者，不加锁），
+消费者按 AUDIO_CAPTURE_BATCH_SECONDS 成批取出，后续的同步校正、编码和写盘都不在回调中进行。
+"""
+
+import time
+
+import numpy as np
+
+# 环形缓冲区可容纳的音频时长（秒）：消费者短暂卡顿时的余量
+AUDIO_CAPTURE_RING_SECONDS = 2.0
+
+# 消费者每批取出的音频时长（秒）
+AUDIO_CAPTURE_BATCH_SECONDS = 0.1
+
+
+class CallbackAudioCapture:
+    """回调模式的 16 位 PCM 音频采集
+
+    start() 打开设备，read() 等待并取出一批数据，返回 (bytes, 最后一个采样的时刻)，
+    时刻由 clock 给出（录制会话传入 SessionClock.now），已扣除输入延迟。
+    环形缓冲区满时丢弃新到的音频块并计入 overflows；设备报告的输入溢出计入 input_overflows。
+    """
+
+    def __init__(self, device_index=None, rate=44100, channels=2, chunk=1024,
+                 ring_seconds=AUDIO_CAPTURE_RING_SECONDS, batch_seconds=AUDIO_CAPTURE_BATCH_SECONDS,
+                 clock=time.perf_counter):
+        self.device_index = device_index
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.clock = clock
+        self.frame_bytes = channels * 2
+        self.capacity = int(rate * ring_seconds) * self.frame_bytes
+        self.batch_seconds = batch_seconds
+        self._ring = np.zeros(self.capacity, dtype=np.uint8)
+        # 回调线程只写 _published，消费者只写 _tail；_published 是 (已写入总字节数, 最后一个采样的时刻)，
+        # 整体赋值一次完成，消费者读到的字节数和时刻总是配对的
+        self._published = (0, 0.0)
+        self._tail = 0
+        self._audio = None
+        self._stream = None
+        self._continue = None
+        self._input_overflow_flag = 0
+
+        # 统计信息
+        self.callbacks = 0
+        self.overflows = 0
+        self.input_overflows = 0
+        self.bytes_dropped = 0
+        self.max_fill = 0
+
+    def start(self):
+        """打开音频设备并开始采集"""
+        import pyaudio
+
+        self._continue = pyaudio.paContinue
+        self._input_overflow_flag = pyaudio.paInputOverflow
+        self._audio = pyaudio.PyAudio()
+        try:
+            self._stream = self._audio.open(
+                format=pyaudio.paInt16,
+                channels=self.channels,
+                rate=self.rate,
+                input=True,
+                input_device_index=self.device_index,
+                frames_per_buffer=self.chunk,
+                stream_callback=self._callback
+            )
+            self._stream.start_stream()
+        except Exception:
+            self._audio.terminate()
+            self._audio = None
+            self._stream = None
+            raise
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        """PortAudio 回调：拷贝数据、登记时间戳，不做其他工作"""
+        now = self.clock()
+        self.callbacks += 1
+        if status & self._input_overflow_flag:
+            self.input_overflows += 1
+
+        head, _ = self._published
+        block = np.frombuffer(in_data, dtype=np.uint8)
+        size = len(block) - len(block) % self.frame_bytes
+        if size > self.capacity - (head - self._tail):
+            # 消费者跟不上：丢弃这一块，不覆盖尚未取出的数据
+            self.overflows += 1
+            self.bytes_dropped += size
+            return (None, self._continue)
+        start = head % self.capacity
+        first = min(size, self.capacity - start)
+        self._ring[start:start + first] = block[:first]
+        if first < size:
+            self._ring[:size - first] = block[first:size]
+
+        # 最后一个采样的采集时刻：回调时刻减去它在输入缓冲中等待的时长（宿主 API 不提供时为 0）
+        age = 0.0
+        if time_info:
+            age = (time_info.get('current_time', 0.0) - time_info.get('input_buffer_adc_time', 0.0)
+                   - frame_count / self.rate)
+            if not 0.0 < age < 1.0:
+                age = 0.0
+        head += size
+        self._published = (head, now - age)
+        self.max_fill = max(self.max_fill, head - self._tail)
+        return (None, self._continue)
+
+    @property
+    def active(self):
+        return self._stream is not None
+
+    def available(self):
+        """环形缓冲区中尚未取出的字节数"""
+        return self._published[0] - self._tail
+
+    def read(self, timeout=None):
+        """等待攒够一批（或超时）后取出缓冲区中的全部数据，返回 (bytes, 时刻)；没有数据时返回 (b"", None)"""
+        batch = int(self.rate * self.batch_seconds) * self.frame_bytes
+        # 超时按实际时间计算（会话时钟在暂停期间不走）
+        deadline = time.monotonic() + (self.batch_seconds * 2 if timeout is None else timeout)
+        while self.available() < batch and self._stream is not None:
+            # 轮询间隔为半批，回调线程和消费者之间没有锁和条件变量
+            time.sleep(self.batch_seconds / 2)
+            if time.monotonic() >= deadline:
+                break
+        head, timestamp = self._published
+        size = head - self._tail
+        if size <= 0:
+            return b"", None
+        start = self._tail % self.capacity
+        end = start + size
+        if end <= self.capacity:
+            data = self._ring[start:end].tobytes()
+        else:
+            data = self._ring[start:].tobytes() + self._ring[:end - self.capacity].tobytes()
+        self._tail = head
+        return data, timestamp
+
+    def stop(self):
+        """停止采集并关闭设备；缓冲区中剩余的数据仍可用 read() 取出"""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.stop_stream()
+                stream.close()
+            finally:
+                self._audio.terminate()
+                self._audio = None
+
+    def stats(self):
+        """返回音频采集统计信息"""
+        return {
+            "callbacks": self.callbacks,
+            "overflows": self.overflows,
+            "input_overflows": self.input_overflows,
+            "dropped": self.bytes_dropped,
+            "max_fill": self.max_fill / self.capacity
+        }
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 音频流式落盘
+录音线程不再把每个音频块追加到一个无限增长的列表，而是写入预分配的 NumPy 环形缓冲区，
+由后台写盘线程持续把缓冲区内容追加到 WAV 文件；录制结束时只需补写 WAV 头部。
+音频占用的内存只与缓冲窗口长度有关，与录制时长无关，合并音视频时也不再需要 b''.join。
+（WAV 文件上限 4 GB，44.1kHz 立体声 16 位约可录制 6.7 小时。）
+"""
+
+import threading
+import wave
+
+import numpy as np
+
+# 环形缓冲区可容纳的音频时长（秒）：写盘短暂卡顿时的余量
+AUDIO_RING_SECONDS = 4.0
+
+# 缓冲区积累到该时长（秒）时唤醒写盘线程
+AUDIO_FLUSH_SECONDS = 0.25
+
+
+class AudioSpool:
+    """流式 WAV 写入器
+
+    write() 只把数据拷贝进环形缓冲区（不做磁盘 IO），可在录音线程或音频回调中调用；
+    缓冲区满时丢弃新数据并计入 overflows。close() 等待缓冲区写完并关闭文件，返回文件路径。
+    """
+
+    def __init__(self, path, rate=44100, channels=2, sample_width=2,
+                 ring_seconds=AUDIO_RING_SECONDS, flush_seconds=AUDIO_FLUSH_SECONDS):
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frame_bytes = channels * sample_width
+        self.capacity = int(rate * ring_seconds) * self.frame_bytes
+        self.flush_bytes = max(self.frame_bytes, int(rate * flush_seconds) * self.frame_bytes)
+        self._ring = np.zeros(self.capacity, dtype=np.uint8)
+        self._head = 0  # 已写入的总字节数
+        self._tail = 0  # 已落盘的总字节数
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._wave = wave.open(path, 'wb')
+        self._wave.setnchannels(channels)
+        self._wave.setsampwidth(sample_width)
+        self._wave.setframerate(rate)
+
+        # 统计信息
+        self.bytes_written = 0
+        self.overflows = 0
+        self.bytes_dropped = 0
+        self.max_fill = 0
+
+        self._writer = threading.Thread(target=self._drain, daemon=True)
+        self._writer.start()
+
+    def write(self, data):
+        """写入一块 PCM 数据（bytes 或 NumPy 数组），返回是否完整写入"""
+        block = np.frombuffer(data, dtype=np.uint8)
+        size = len(block) - len(block) % self.frame_bytes
+        with self._cond:
+            if self._closed:
+                return False
+            if size > self.capacity - (self._head - self._tail):
+                # 写盘跟不上：丢弃这一块，不覆盖尚未落盘的数据
+                self.overflows += 1
+                self.bytes_dropped += size
+                return False
+            start = self._head % self.capacity
+            first = min(size, self.capacity - start)
+            self._ring[start:start + first] = block[:first]
+            if first < size:
+                self._ring[:size - first] = block[first:size]
+            self._head += size
+            fill = self._head - self._tail
+            self.max_fill = max(self.max_fill, fill)
+            if fill >= self.flush_bytes:
+                self._cond.notify()
+        return True
+
+    def _drain(self):
+        """写盘线程：把缓冲区中未落盘的数据追加到 WAV 文件"""
+        while True:
+            with self._cond:
+                while self._head - self._tail < self.flush_bytes and not self._closed:
+                    self._cond.wait(timeout=AUDIO_FLUSH_SECONDS * 4)
+                    if self._head > self._tail:
+                        break
+                head, tail, closed = self._head, self._tail, self._closed
+            if head > tail:
+                # 已写入而未落盘的区域不会被 write() 覆盖，可以在锁外写盘
+                start = tail % self.capacity
+                end = start + (head - tail)
+                if end <= self.capacity:
+                    self._wave.writeframesraw(self._ring[start:end].data)
+                else:
+                    self._wave.writeframesraw(self._ring[start:].data)
+                    self._wave.writeframesraw(self._ring[:end - self.capacity].data)
+                with self._cond:
+                    self._tail = head
+                    self.bytes_written += head - tail
+            elif closed:
+                break
+
+    @property
+    def seconds(self):
+        """已写入的音频时长（秒）"""
+        return self._head / (self.frame_bytes * self.rate)
+
+    def close(self):
+        """写完缓冲区中剩余的数据并关闭文件（补写 WAV 头部），返回文件路径"""
+        with self._cond:
+            if self._closed:
+                return self.path
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
+        self._wave.close()
+        return self.path
+
+    def stats(self):
+        """返回音频落盘统计信息"""
+        with self._cond:
+            return {
+                "seconds": self.seconds,
+                "bytes": self.bytes_written,
+                "overflows": self.overflows,
+                "dropped": self.bytes_dropped,
+                "max_fill": self.max_fill / self.capacity
+            }
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 音视频同步
+录制会话只有一个时间轴: SessionClock 基于单调时钟计时，暂停期间时间冻结，并记录每次暂停/恢复的区间。
+视频帧调度器（FramePacer）以它为时钟分配帧位，音频块也以它打时间戳，两者天然对齐。
+AudioSyncer 按时间戳校正音频流: 首块和恢复录制后的空缺用静音补齐，暂停期间读到的音频丢弃，
+声卡时钟与系统时钟的缓慢漂移用不超过 AUDIO_MAX_STRETCH 的线性重采样逐块修正，
+长时间录制中音频与视频的偏差保持在 AUDIO_SYNC_TOLERANCE 以内（默认半帧）。
+合并音视频时因此不再依赖 FFmpeg 的 -async 去猜测漂移。
+"""
+
+import threading
+import time
+
+import numpy as np
+
+# 允许的音视频偏差（秒），超过后开始重采样修正；按帧率创建时取半帧
+AUDIO_SYNC_TOLERANCE = 1.0 / 60
+
+# 单块音频最大伸缩比例（0.5% 约合 8 音分，听感上无法察觉）
+AUDIO_MAX_STRETCH = 0.005
+
+# 偏差超过该时长（秒）视为空缺或多余数据，直接补静音或丢弃，不再逐步修正
+AUDIO_GAP_SECONDS = 0.1
+
+# 偏差测量窗口（秒）：音频块的到达时间受线程调度影响有抖动，每个窗口测量一次偏差
+AUDIO_SYNC_WINDOW = 1.0
+
+
+class SessionClock:
+    """录制会话时钟
+
+    now() 返回从 start() 起扣除暂停时长后的秒数，暂停期间保持不变；可直接作为 FramePacer 的时钟。
+    timeline 记录每次暂停的 (会话时刻, 暂停开始, 暂停结束)，后两者为单调时钟的原始读数。
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._origin = None
+        self._paused_at = None
+        self.timeline = []
+
+    def start(self):
+        """以当前时刻作为会话起点"""
+        with self._lock:
+            self._origin = self.clock()
+            self._paused_at = None
+            self.timeline = []
+
+    def now(self):
+        """当前会话时刻（秒，不含暂停时长）"""
+        with self._lock:
+            if self._origin is None:
+                return 0.0
+            current = self._paused_at if self._paused_at is not None else self.clock()
+            return current - self._origin
+
+    def pause(self):
+        """冻结会话时间"""
+        with self._lock:
+            if self._origin is not None and self._paused_at is None:
+                self._paused_at = self.clock()
+
+    def resume(self):
+        """恢复计时，会话起点后移暂停的时长"""
+        with self._lock:
+            if self._paused_at is not None:
+                resumed_at = self.clock()
+                self.timeline.append((self._paused_at - self._origin, self._paused_at, resumed_at))
+                self._origin += resumed_at - self._paused_at
+                self._paused_at = None
+
+    @property
+    def paused(self):
+        return self._paused_at is not None
+
+    def stats(self):
+        """返回会话时间统计信息"""
+        with self._lock:
+            paused = sum(end - start for _, start, end in self.timeline)
+            if self._paused_at is not None:
+                paused += self.clock() - self._paused_at
+            return {
+                "pauses": len(self.timeline) + (1 if self._paused_at is not None else 0),
+                "paused_seconds": paused
+            }
+
+
+class AudioSyncer:
+    """按会话时间戳校正 16 位 PCM 音频流
+
+    每个音频流开始时调用 begin()，之后 process() 接收一块音频和读到该块时的会话时刻，
+    返回校正后应写入的数据，输出的第 N 个采样对应会话时刻 N / rate。
+    latency 为音频输入延迟（秒），从时间戳中扣除。
+    """
+
+    def __init__(self, rate=44100, channels=2, tolerance=AUDIO_SYNC_TOLERANCE, latency=0.0):
+        self.rate = rate
+        self.channels = channels
+        self.frame_bytes = channels * 2
+        self.tolerance = max(1, int(rate * tolerance))
+        self.gap = max(self.tolerance, int(rate * AUDIO_GAP_SECONDS))
+        self.window = int(rate * AUDIO_SYNC_WINDOW)
+        self.latency = latency
+        self.samples_out = 0
+        self._aligned = False
+        self._window_max = None  # 当前窗口内的最大偏差（采样数，正数表示音频超前）
+        self._window_samples = 0
+        self._pending = 0  # 尚待通过重采样修正的采样数（正数为补，负数为删）
+
+        # 统计信息
+        self.samples_padded = 0
+        self.samples_dropped = 0
+        self.samples_stretched = 0
+        self.blocks_resampled = 0
+        self.max_drift = 0
+
+    def begin(self, latency=None):
+        """新的音频流开始（开始录制或恢复录制），下一块按时间戳直接对齐"""
+        if latency is not None:
+            self.latency = latency
+        self._aligned = False
+        self._window_max = None
+        self._window_samples = 0
+        self._pending = 0
+
+    def process(self, data, timestamp):
+        """校正一块音频，返回应写入的 bytes（可能为空）"""
+        block = np.frombuffer(data, dtype=np.int16)
+        block = block[:len(block) - len(block) % self.channels].reshape(-1, self.channels)
+        count = len(block)
+        if count == 0:
+            return b""
+        expected = int(round((timestamp - self.latency) * self.rate)) - count
+        offset = self.samples_out - expected
+
+        pad = 0
+        if not self._aligned:
+            # 音频流的第一块：空缺补静音，超前部分丢弃
+            pad = max(0, -offset)
+            drop = min(count, max(0, offset))
+            block = block[drop:]
+            self.samples_dropped += drop
+            self._aligned = True
+        elif offset > self.gap:
+            # 暂停期间读到的音频：时间戳不再前进，超前的部分丢弃
+            drop = min(count, offset)
+            block = block[drop:]
+            self.samples_dropped += drop
+        else:
+            # 线程调度只会让时间戳偏晚（偏差偏小），取一个窗口内的最大偏差作为真实偏差，
+            # 偶发的卡顿不会触发补静音或重采样
+            if self._window_max is None or offset > self._window_max:
+                self._window_max = offset
+            self._window_samples += count
+            if self._window_samples >= self.window:
+                drift = self._window_max
+                self._window_max = None
+                self._window_samples = 0
+                self.max_drift = max(self.max_drift, abs(drift))
+                if drift < -self.gap:
+                    # 整个窗口都落后（输入端溢出丢失了数据）：补静音
+                    pad = -drift
+                    self._pending = 0
+                else:
+                    self._pending = -drift if abs(drift) > self.tolerance else 0
+            if self._pending:
+                # 声卡时钟漂移：小幅重采样
+                limit = max(1, int(count * AUDIO_MAX_STRETCH))
+                adjust = max(-limit, min(limit, self._pending))
+                block = self._resample(block, count + adjust)
+                self._pending -= adjust
+                self.samples_stretched += abs(adjust)
+                self.blocks_resampled += 1
+
+        self.samples_out += pad + len(block)
+        if pad:
+            self.samples_padded += pad
+            return bytes(pad * self.frame_bytes) + block.tobytes()
+        return block.tobytes()
+
+    @staticmethod
+    def _resample(block, length):
+        """线性插值把 block 伸缩到 length 个采样"""
+        source = np.arange(len(block))
+        target = np.linspace(0, len(block) - 1, length)
+        out = np.empty((length, block.shape[1]), dtype=np.int16)
+        for channel in range(block.shape[1]):
+            out[:, channel] = np.round(np.interp(target, source, block[:, channel]))
+        return out
+
+    def stats(self):
+        """返回音频校正统计信息（秒）"""
+        return {
+            "seconds": self.samples_out / self.rate,
+            "padded": self.samples_padded / self.rate,
+            "dropped": self.samples_dropped / self.rate,
+            "stretched": self.samples_stretched / self.rate,
+            "resampled_blocks": self.blocks_resampled,
+            "max_drift": self.max_drift / self.rate
+        }
@@ -0,0 +1,786 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 屏幕捕获后端
+为 Tk 版与 PyQt5 版提供统一的 CaptureBackend 接口:
+- mss: 常驻连接、复用缓冲区的快速抓屏后端
+- pil: PIL.ImageGrab 兼容后端（每帧重新建立连接，仅作回退）
+- xdamage: X11 XDamage 增量抓屏，只拷贝发生变化的矩形（Linux / X11）
+- synthetic: 确定性合成画面，可在没有桌面的环境下做基准测试
+
+无界面基准测试:
+    python capture_backends.py --backend synthetic --frames 300
+
+XDamage 后端自检（需要 X 服务器，可在 Xvfb 下运行）:
+    xvfb-run -a python capture_backends.py --check-xdamage
+"""
+
+import sys
+import time
+import ctypes
+import ctypes.util
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# mss 为可选依赖，不可用时自动回退到 PIL
+try:
+    import mss
+    MSS_AVAILABLE = True
+except ImportError:
+    MSS_AVAILABLE = False
+
+try:
+    from PIL import ImageGrab
+    PIL_GRAB_AVAILABLE = True
+except ImportError:
+    PIL_GRAB_AVAILABLE = False
+
+# XDamage 通过 ctypes 调用 libX11 / libXdamage，无需额外的 Python 依赖
+XDAMAGE_AVAILABLE = (sys.platform.startswith("linux")
+                     and ctypes.util.find_library("X11") is not None
+                     and ctypes.util.find_library("Xdamage") is not None)
+
+# 帧像素格式（格式名称 -> 通道数）
+PIXEL_FORMATS = {
+    "bgr": 3,
+    "bgra": 4
+}
+
+# 可选的捕获后端（界面显示名称 -> 后端名称）
+CAPTURE_BACKENDS = {
+    "自动 (auto)": "auto",
+    "MSS 快速抓屏 (mss)": "mss",
+    "PIL ImageGrab (pil)": "pil",
+    "X11 XDamage 增量抓屏 (xdamage)": "xdamage",
+    "合成画面 (synthetic)": "synthetic"
+}
+
+
+class CaptureBackend:
+    """屏幕捕获后端基类
+
+    grab() 的 bbox 与 PIL.ImageGrab 一致，为 (left, top, right, bottom)，
+    默认返回 BGR 格式的 numpy 数组，可直接写入 cv2.VideoWriter；
+    pixel_format 为后端原生格式 native_format 时跳过颜色转换。
+    传入形状匹配的 out 缓冲区时直接写入该缓冲区，不再分配新帧。
+    changed_regions 为上一次 grab() 相对再上一次发生变化的区域列表（帧内坐标的 bbox），
+    为 None 表示后端无法得知变化区域。
+    """
+    name = "base"
+    native_format = "bgr"
+
+    def __init__(self):
+        self.frames_grabbed = 0
+        self.changed_regions = None
+
+    def open(self):
+        """打开后端（建立连接、分配缓冲区）"""
+        return self
+
+    def close(self):
+        """关闭后端并释放资源"""
+        pass
+
+    def screen_size(self):
+        """返回主屏幕尺寸 (宽, 高)"""
+        raise NotImplementedError
+
+    def grab(self, bbox=None, out=None, pixel_format="bgr"):
+        """抓取一帧"""
+        raise NotImplementedError
+
+    def frame_shape(self, bbox=None, pixel_format="bgr"):
+        """返回 grab(bbox) 得到的帧形状 (高, 宽, 通道数)"""
+        if bbox is None:
+            width, height = self.screen_size()
+        else:
+            left, top, right, bottom = bbox
+            width, height = right - left, bottom - top
+        return int(height), int(width), PIXEL_FORMATS[pixel_format]
+
+    def _check_format(self, pixel_format):
+        """后端只支持 BGR 和自身的原生格式"""
+        if pixel_format not in ("bgr", self.native_format):
+            raise ValueError(f"{self.name} 后端不支持像素格式: {pixel_format}")
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MSSBackend(CaptureBackend):
+    """基于 mss 的快速抓屏后端
+
+    每个线程只建立一次 mss 会话（X11 连接 / Windows DC），之后每帧复用，
+    避免 ImageGrab.grab() 每帧重新建立连接和图像对象的开销。
+    """
+    name = "mss"
+    native_format = "bgra"
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        """获取当前线程的 mss 会话（mss 句柄不能跨线程使用）"""
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.sct = sct
+            with self._lock:
+                self._sessions.append(sct)
+        return sct
+
+    def close(self):
+        """关闭所有线程的 mss 会话"""
+        with self._lock:
+            for sct in self._sessions:
+                try:
+                    sct.close()
+                except Exception:
+                    pass
+            self._sessions = []
+        self._local = threading.local()
+
+    def screen_size(self):
+        """返回主屏幕尺寸"""
+        monitor = self._session().monitors[1]
+        return monitor["width"], monitor["height"]
+
+    def grab(self, bbox=None, out=None, pixel_format="bgr"):
+        """抓取一帧"""
+        self._check_format(pixel_format)
+        sct = self._session()
+        if bbox is None:
+            monitor = sct.monitors[1]
+            region = {
+                "left": monitor["left"],
+                "top": monitor["top"],
+                "width": monitor["width"],
+                "height": monitor["height"]
+            }
+        else:
+            left, top, right, bottom = bbox
+            region = {
+                "left": int(left),
+                "top": int(top),
+                "width": int(right - left),
+                "height": int(bottom - top)
+            }
+
+        shot = sct.grab(region)
+        # mss 原生输出为 BGRA，直接在原始缓冲区上建立视图，不额外拷贝
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        self.frames_grabbed += 1
+
+        if pixel_format == "bgra":
+            # 原生格式：不做颜色转换
+            dst = _matching_buffer(out, bgra.shape)
+            if dst is None:
+                return bgra
+            np.copyto(dst, bgra)
+            return dst
+
+        dst = _matching_buffer(out, (shot.height, shot.width, 3))
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=dst)
+
+
+class PILBackend(CaptureBackend):
+    """PIL.ImageGrab 后端（兼容旧版行为）"""
+    name = "pil"
+
+    def __init__(self):
+        super().__init__()
+        self._screen_size = None
+
+    def screen_size(self):
+        """返回主屏幕尺寸（只探测一次）"""
+        if self._screen_size is None:
+            self._screen_size = ImageGrab.grab().size
+        return self._screen_size
+
+    def grab(self, bbox=None, out=None, pixel_format="bgr"):
+        """抓取一帧"""
+        self._check_format(pixel_format)
+        if bbox:
+            bbox = tuple(int(v) for v in bbox)
+            width, height = self.screen_size()
+            if bbox[0] < 0 or bbox[1] < 0 or bbox[2] > width or bbox[3] > height:
+                # 区域超出主显示器（其他显示器）时需要抓取整个虚拟桌面
+                screenshot = ImageGrab.grab(bbox=bbox, all_screens=True)
+            else:
+                screenshot = ImageGrab.grab(bbox=bbox)
+        else:
+            screenshot = ImageGrab.grab()
+        self.frames_grabbed += 1
+        rgb = np.asarray(screenshot)
+        dst = _matching_buffer(out, rgb.shape)
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=dst)
+
+
+class SyntheticBackend(CaptureBackend):
+    """确定性合成画面后端
+
+    第 N 帧的内容只取决于 N，便于在无桌面环境下做基准测试和回归对比。
+    """
+    name = "synthetic"
+
+    def __init__(self, width=1920, height=1080):
+        super().__init__()
+        self.width = int(width)
+        self.height = int(height)
+        self._background = None
+        self._canvas = None
+
+    def open(self):
+        """预先生成背景渐变和绘制画布"""
+        if self._background is None:
+            x = np.linspace(0, 255, self.width, dtype=np.float32)
+            y = np.linspace(0, 255, self.height, dtype=np.float32)
+            background = np.empty((self.height, self.width, 3), dtype=np.uint8)
+            background[:, :, 0] = x[np.newaxis, :].astype(np.uint8)
+            background[:, :, 1] = y[:, np.newaxis].astype(np.uint8)
+            background[:, :, 2] = 96
+            self._background = background
+            self._canvas = np.empty_like(background)
+        return self
+
+    def close(self):
+        """释放背景缓冲区"""
+        self._background = None
+        self._canvas = None
+
+    def screen_size(self):
+        """返回合成画面尺寸"""
+        return self.width, self.height
+
+    def render(self, index, out=None):
+        """生成第 index 帧（全屏），未指定 out 时绘制到内部画布"""
+        if self._background is None:
+            self.open()
+        frame = self._canvas if out is None else out
+        np.copyto(frame, self._background)
+
+        # 匀速移动的方块，用于观察帧率和丢帧
+        block = max(16, min(self.width, self.height) // 8)
+        span_x = max(1, self.width - block)
+        span_y = max(1, self.height - block)
+        x = (index * 7) % span_x
+        y = (index * 5) % span_y
+        frame[y:y + block, x:x + block] = (255, 255, 255)
+
+        cv2.putText(frame, f"#{index}", (20, 60), cv2.FONT_HERSHEY_SIMPLEX,
+                    1.5, (0, 0, 0), 3, cv2.LINE_AA)
+        return frame
+
+    def grab(self, bbox=None, out=None, pixel_format="bgr"):
+        """抓取一帧"""
+        self._check_format(pixel_format)
+        index = self.frames_grabbed
+        self.frames_grabbed += 1
+        shape = self.frame_shape(bbox)
+        dst = _matching_buffer(out, shape)
+        if bbox is None:
+            if dst is not None:
+                return self.render(index, dst)
+            return self.render(index).copy()
+
+        frame = self.render(index)
+        left, top, right, bottom = (int(v) for v in bbox)
+        crop = dst if dst is not None else np.empty(shape, dtype=np.uint8)
+        if left < 0 or top < 0 or right > self.width or bottom > self.height:
+            crop.fill(0)
+        src_left, src_top = max(0, left), max(0, top)
+        src_right, src_bottom = min(self.width, right), min(self.height, bottom)
+        if src_right > src_left and src_bottom > src_top:
+            crop[src_top - top:src_bottom - top, src_left - left:src_right - left] = \
+                frame[src_top:src_bottom, src_left:src_right]
+        return crop
+
+
+# X11 常量
+_ZPIXMAP = 2
+_ALL_PLANES = 0xFFFFFFFF
+_XDAMAGE_REPORT_RAW_RECTANGLES = 0
+_XDAMAGE_NOTIFY = 0
+
+
+class _XImage(ctypes.Structure):
+    """XImage 结构体（只声明用到的前几个字段）"""
+    _fields_ = [
+        ("width", ctypes.c_int), ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int), ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p), ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int), ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int), ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int), ("bits_per_pixel", ctypes.c_int)
+    ]
+
+
+class _XRectangle(ctypes.Structure):
+    _fields_ = [
+        ("x", ctypes.c_short), ("y", ctypes.c_short),
+        ("width", ctypes.c_ushort), ("height", ctypes.c_ushort)
+    ]
+
+
+class _XDamageNotifyEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int), ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int), ("display", ctypes.c_void_p),
+        ("drawable", ctypes.c_ulong), ("damage", ctypes.c_ulong),
+        ("level", ctypes.c_int), ("more", ctypes.c_int),
+        ("timestamp", ctypes.c_ulong),
+        ("area", _XRectangle), ("geometry", _XRectangle)
+    ]
+
+
+# XEvent 联合体大小为 24 个 long
+_XEvent = ctypes.c_long * 24
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+
+def _load_xlib():
+    """加载 libX11 / libXdamage 并声明函数签名"""
+    xlib = ctypes.cdll.LoadLibrary(ctypes.util.find_library("X11"))
+    xdamage = ctypes.cdll.LoadLibrary(ctypes.util.find_library("Xdamage"))
+    display_p = ctypes.c_void_p
+    signatures = [
+        (xlib, "XOpenDisplay", [ctypes.c_char_p], display_p),
+        (xlib, "XCloseDisplay", [display_p], ctypes.c_int),
+        (xlib, "XDefaultScreen", [display_p], ctypes.c_int),
+        (xlib, "XDefaultRootWindow", [display_p], ctypes.c_ulong),
+        (xlib, "XDisplayWidth", [display_p, ctypes.c_int], ctypes.c_int),
+        (xlib, "XDisplayHeight", [display_p, ctypes.c_int], ctypes.c_int),
+        (xlib, "XGetImage", [display_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+                             ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_int],
+         ctypes.POINTER(_XImage)),
+        (xlib, "XDestroyImage", [ctypes.POINTER(_XImage)], ctypes.c_int),
+        (xlib, "XPending", [display_p], ctypes.c_int),
+        (xlib, "XNextEvent", [display_p, ctypes.POINTER(_XEvent)], ctypes.c_int),
+        (xlib, "XSync", [display_p, ctypes.c_int], ctypes.c_int),
+        (xlib, "XSetErrorHandler", [_XErrorHandler], ctypes.c_void_p),
+        (xlib, "XCreateGC", [display_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_void_p], ctypes.c_void_p),
+        (xlib, "XFreeGC", [display_p, ctypes.c_void_p], ctypes.c_int),
+        (xlib, "XSetForeground", [display_p, ctypes.c_void_p, ctypes.c_ulong], ctypes.c_int),
+        (xlib, "XFillRectangle", [display_p, ctypes.c_ulong, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                                  ctypes.c_uint, ctypes.c_uint], ctypes.c_int),
+        (xdamage, "XDamageQueryExtension", [display_p, ctypes.POINTER(ctypes.c_int),
+                                            ctypes.POINTER(ctypes.c_int)], ctypes.c_int),
+        (xdamage, "XDamageCreate", [display_p, ctypes.c_ulong, ctypes.c_int], ctypes.c_ulong),
+        (xdamage, "XDamageDestroy", [display_p, ctypes.c_ulong], None),
+    ]
+    for library, name, argtypes, restype in signatures:
+        function = getattr(library, name)
+        function.argtypes = argtypes
+        function.restype = restype
+    return xlib, xdamage
+
+
+@_XErrorHandler
+def _x_error_handler(display, event):
+    """X 错误只打印，不让 Xlib 默认处理函数直接退出进程"""
+    print("⚠️ X11 请求出错（已忽略）")
+    return 0
+
+
+class XDamageBackend(CaptureBackend):
+    """基于 X11 XDamage 事件的增量抓屏后端
+
+    常驻一块整屏 BGRA 缓冲区，只有第一帧整屏抓取；之后每帧读取 XDamage 事件，
+    仅对发生变化的矩形调用 XGetImage 并写入常驻缓冲区，抓屏开销随画面活动量而不是分辨率增长。
+    变化区域通过 changed_regions 报告给下游（如静止画面检测），无变化时可直接跳过后续处理。
+    后端独占一个 Xlib 连接，所有调用都在锁内进行，因此可以被多个线程共用:
+    变化矩形按 (线程, bbox) 分别累积，changed_regions 也按线程保存，
+    录制与截图、连拍共用后端时各自读到的都是相对自己上一次 grab() 的变化，不会互相吞掉。
+    """
+    name = "xdamage"
+    native_format = "bgra"
+
+    # 变化矩形过多或面积过大时，合并为一个外接矩形抓取
+    MAX_RECTS = 64
+    FULL_GRAB_RATIO = 0.5
+
+    # 同时跟踪变化的 (线程, bbox) 数量，超出时淘汰最久未抓取的（再次抓取时整帧算变化）
+    MAX_CONSUMERS = 8
+
+    def __init__(self, display_name=None):
+        self._local = threading.local()
+        super().__init__()
+        self.display_name = display_name
+        self._xlib = None
+        self._xdamage = None
+        self._display = None
+        self._damage = 0
+        self._event_base = 0
+        self._frame = None
+        self._needs_full = True
+        self._consumers = OrderedDict()  # (线程, bbox) -> 该调用方上次抓取后累积的变化矩形（屏幕坐标）
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.full_grabs = 0
+        self.rects_copied = 0
+        self.pixels_copied = 0
+
+    def open(self):
+        """连接 X 服务器并订阅根窗口的 XDamage 事件"""
+        if self._display is not None:
+            return self
+        self._xlib, self._xdamage = _load_xlib()
+        self._xlib.XSetErrorHandler(_x_error_handler)
+
+        name = self.display_name.encode() if self.display_name else None
+        display = self._xlib.XOpenDisplay(name)
+        if not display:
+            raise RuntimeError("无法连接 X 服务器（DISPLAY 未设置或不可用）")
+
+        event_base, error_base = ctypes.c_int(), ctypes.c_int()
+        if not self._xdamage.XDamageQueryExtension(display, ctypes.byref(event_base), ctypes.byref(error_base)):
+            self._xlib.XCloseDisplay(display)
+            raise RuntimeError("X 服务器不支持 XDamage 扩展")
+
+        self._display = display
+        self._event_base = event_base.value
+        root = self._xlib.XDefaultRootWindow(display)
+        self._damage = self._xdamage.XDamageCreate(display, root, _XDAMAGE_REPORT_RAW_RECTANGLES)
+        self._xlib.XSync(display, 0)
+
+        screen = self._xlib.XDefaultScreen(display)
+        width = self._xlib.XDisplayWidth(display, screen)
+        height = self._xlib.XDisplayHeight(display, screen)
+        self._frame = np.zeros((height, width, 4), dtype=np.uint8)
+        self._needs_full = True
+        self._consumers.clear()
+        return self
+
+    @property
+    def changed_regions(self):
+        """当前线程上一次 grab() 的变化区域"""
+        return getattr(self._local, "changed_regions", None)
+
+    @changed_regions.setter
+    def changed_regions(self, regions):
+        self._local.changed_regions = regions
+
+    def close(self):
+        """取消订阅并断开 X 连接"""
+        with self._lock:
+            if self._display is not None:
+                if self._damage:
+                    self._xdamage.XDamageDestroy(self._display, self._damage)
+                self._xlib.XCloseDisplay(self._display)
+            self._display = None
+            self._damage = 0
+            self._frame = None
+
+    def screen_size(self):
+        """返回根窗口尺寸（打开时查询一次）"""
+        if self._frame is None:
+            self.open()
+        height, width = self._frame.shape[:2]
+        return width, height
+
+    def _pending_damage(self):
+        """读取所有待处理的 XDamage 事件，返回变化矩形 [(left, top, right, bottom), ...]"""
+        rects = []
+        event = _XEvent()
+        notify_type = self._event_base + _XDAMAGE_NOTIFY
+        while self._xlib.XPending(self._display):
+            self._xlib.XNextEvent(self._display, ctypes.byref(event))
+            notify = ctypes.cast(ctypes.byref(event), ctypes.POINTER(_XDamageNotifyEvent)).contents
+            if notify.type == notify_type:
+                area = notify.area
+                rects.append((area.x, area.y, area.x + area.width, area.y + area.height))
+        return rects
+
+    def _copy_rect(self, left, top, right, bottom):
+        """用 XGetImage 抓取一个矩形并写入常驻缓冲区，失败时返回 False"""
+        height, width = self._frame.shape[:2]
+        left, top = max(0, left), max(0, top)
+        right, bottom = min(width, right), min(height, bottom)
+        if right <= left or bottom <= top:
+            return True
+
+        root = self._xlib.XDefaultRootWindow(self._display)
+        image = self._xlib.XGetImage(self._display, root, left, top, right - left, bottom - top,
+                                     _ALL_PLANES, _ZPIXMAP)
+        if not image:
+            return False
+        try:
+            ximage = image.contents
+            if ximage.bits_per_pixel != 32:
+                raise RuntimeError(f"不支持的 X 像素格式: {ximage.bits_per_pixel} bpp")
+            size = ximage.bytes_per_line * ximage.height
+            raw = np.ctypeslib.as_array((ctypes.c_ubyte * size).from_address(ximage.data))
+            rows = raw.reshape(ximage.height, ximage.bytes_per_line)
+            self._frame[top:bottom, left:right] = \
+                rows[:, :ximage.width * 4].reshape(ximage.height, ximage.width, 4)
+        finally:
+            self._xlib.XDestroyImage(image)
+
+        self.rects_copied += 1
+        self.pixels_copied += (right - left) * (bottom - top)
+        return True
+
+    def _update(self):
+        """把自上次以来的变化写入常驻缓冲区，返回变化矩形（屏幕坐标）"""
+        height, width = self._frame.shape[:2]
+        rects = self._pending_damage()
+        if self._needs_full:
+            rects = [(0, 0, width, height)]
+        elif len(rects) > self.MAX_RECTS:
+            rects = [(min(r[0] for r in rects), min(r[1] for r in rects),
+                      max(r[2] for r in rects), max(r[3] for r in rects))]
+
+        area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in rects)
+        if area > width * height * self.FULL_GRAB_RATIO:
+            rects = [(0, 0, width, height)]
+            self.full_grabs += 1
+
+        ok = all([self._copy_rect(*rect) for rect in rects])
+        # 抓取失败（如窗口在请求期间改变了尺寸）时下一帧整屏重新抓取
+        self._needs_full = not ok
+
+        # 变化累积到每个调用方，矩形过多时合并为外接矩形
+        for key, pending in self._consumers.items():
+            pending.extend(rects)
+            if len(pending) > self.MAX_RECTS:
+                self._consumers[key] = [(min(r[0] for r in pending), min(r[1] for r in pending),
+                                         max(r[2] for r in pending), max(r[3] for r in pending))]
+        return rects
+
+    def grab(self, bbox=None, out=None, pixel_format="bgr"):
+        """抓取一帧：只拷贝变化的矩形，再从常驻缓冲区裁剪出 bbox"""
+        self._check_format(pixel_format)
+        with self._lock:
+            if self._display is None:
+                self.open()
+            self._update()
+            height, width = self._frame.shape[:2]
+            if bbox is None:
+                left, top, right, bottom = 0, 0, width, height
+            else:
+                left, top, right, bottom = (int(v) for v in bbox)
+
+            # 取出该调用方上次抓取后累积的变化；首次抓取（或已被淘汰）时整帧都算变化
+            key = (threading.get_ident(), (left, top, right, bottom))
+            pending = self._consumers.pop(key, None)
+            self._consumers[key] = []
+            while len(self._consumers) > self.MAX_CONSUMERS:
+                self._consumers.popitem(last=False)
+
+            # 变化区域转换到帧内坐标
+            if pending is None:
+                changed = [(0, 0, right - left, bottom - top)]
+            else:
+                changed = []
+                for r_left, r_top, r_right, r_bottom in pending:
+                    c_left, c_top = max(left, r_left), max(top, r_top)
+                    c_right, c_bottom = min(right, r_right), min(bottom, r_bottom)
+                    if c_right > c_left and c_bottom > c_top:
+                        changed.append((c_left - left, c_top - top, c_right - left, c_bottom - top))
+            self.changed_regions = changed
+            self.frames_grabbed += 1
+
+            shape = (bottom - top, right - left, 4)
+            source = np.zeros(shape, dtype=np.uint8) \
+                if left < 0 or top < 0 or right > width or bottom > height else None
+            if source is not None:
+                # 区域超出屏幕的部分填黑
+                s_left, s_top = max(0, left), max(0, top)
+                s_right, s_bottom = min(width, right), min(height, bottom)
+                if s_right > s_left and s_bottom > s_top:
+                    source[s_top - top:s_bottom - top, s_left - left:s_right - left] = \
+                        self._frame[s_top:s_bottom, s_left:s_right]
+            else:
+                source = self._frame[top:bottom, left:right]
+
+            if pixel_format == "bgra":
+                dst = _matching_buffer(out, shape)
+                if dst is None:
+                    return source.copy()
+                np.copyto(dst, source)
+                return dst
+
+            dst = _matching_buffer(out, (shape[0], shape[1], 3))
+            return cv2.cvtColor(source, cv2.COLOR_BGRA2BGR, dst=dst)
+
+    def stats(self):
+        """返回增量抓屏统计信息"""
+        return {
+            "frames": self.frames_grabbed,
+            "full_grabs": self.full_grabs,
+            "rects": self.rects_copied,
+            "pixels": self.pixels_copied
+        }
+
+
+def _matching_buffer(out, shape):
+    """out 形状匹配时返回 out，否则返回 None（由调用方分配新帧）"""
+    if out is not None and out.shape == tuple(shape):
+        return out
+    return None
+
+
+def create_capture_backend(name="auto", size=None):
+    """按名称创建并打开捕获后端
+
+    auto 优先使用 mss，不可用时回退到 PIL；size 仅用于合成画面后端。
+    """
+    if name == "auto":
+        name = "mss" if MSS_AVAILABLE else "pil"
+
+    if name == "xdamage":
+        if XDAMAGE_AVAILABLE:
+            try:
+                return XDamageBackend().open()
+            except Exception as e:
+                print(f"⚠️ XDamage 增量抓屏不可用: {e}")
+        else:
+            print("⚠️ 未找到 libXdamage，捕获后端回退")
+        name = "mss" if MSS_AVAILABLE else "pil"
+
+    if name == "mss" and not MSS_AVAILABLE:
+        print("⚠️ mss 未安装，捕获后端回退到 PIL ImageGrab")
+        name = "pil"
+
+    if name == "mss":
+        backend = MSSBackend()
+    elif name == "pil":
+        backend = PILBackend()
+    elif name == "synthetic":
+        width, height = size if size else (1920, 1080)
+        backend = SyntheticBackend(width, height)
+    else:
+        raise ValueError(f"未知的捕获后端: {name}")
+
+    return backend.open()
+
+
+def benchmark_capture(backend, frames=300, bbox=None):
+    """测量后端的抓屏速度"""
+    backend.grab(bbox)  # 预热，建立连接
+    start = time.perf_counter()
+    for _ in range(frames):
+        backend.grab(bbox)
+    elapsed = time.perf_counter() - start
+    return {
+        "backend": backend.name,
+        "frames": frames,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def check_xdamage(display_name=None):
+    """在 X 服务器（如 Xvfb）上自检 XDamage 后端，返回失败项列表
+
+    另开一个 X 连接在根窗口上画矩形，检查: 变化区域只报告画过的位置；
+    另一个线程抓取同一区域不会吞掉本线程的变化；增量维护的画面与整屏抓取逐像素一致。
+    """
+    failures = []
+    backend = XDamageBackend(display_name).open()
+    xlib = backend._xlib
+    painter = xlib.XOpenDisplay(display_name.encode() if display_name else None)
+    if not painter:
+        backend.close()
+        raise RuntimeError("无法连接 X 服务器（DISPLAY 未设置或不可用）")
+    root = xlib.XDefaultRootWindow(painter)
+    gc = xlib.XCreateGC(painter, root, 0, None)
+
+    def paint(color, x, y, width, height):
+        xlib.XSetForeground(painter, gc, color)
+        xlib.XFillRectangle(painter, root, gc, x, y, width, height)
+        xlib.XSync(painter, 0)
+        # 等 XDamage 事件送达后端的连接
+        time.sleep(0.05)
+
+    def other_thread_grab(bbox):
+        worker = threading.Thread(target=backend.grab, args=(bbox,))
+        worker.start()
+        worker.join()
+
+    try:
+        width, height = backend.screen_size()
+        bbox = (0, 0, width, height)
+        backend.grab(bbox)
+        if backend.changed_regions != [(0, 0, width, height)]:
+            failures.append(f"首帧应整帧变化: {backend.changed_regions}")
+
+        backend.grab(bbox)
+        if backend.changed_regions:
+            failures.append(f"画面未变化时不应报告变化: {backend.changed_regions}")
+
+        # 画一个矩形后另一个线程先抓取同一区域，本线程仍应看到这次变化
+        paint(0xFF0000, 10, 20, 30, 40)
+        other_thread_grab(bbox)
+        backend.grab(bbox)
+        changed = backend.changed_regions
+        if not changed or not any(r[0] <= 10 and r[1] <= 20 and r[2] >= 40 and r[3] >= 60 for r in changed):
+            failures.append(f"变化被其他调用方吞掉: {changed}")
+
+        # 裁剪区域内的变化换算到帧内坐标
+        crop = (5, 5, 105, 105)
+        backend.grab(crop)
+        paint(0x00FF00, 50, 50, 10, 10)
+        backend.grab(crop)
+        if not any(r[0] <= 45 and r[1] <= 45 and r[2] >= 55 and r[3] >= 55 for r in backend.changed_regions):
+            failures.append(f"裁剪区域的变化坐标错误: {backend.changed_regions}")
+
+        frame = backend.grab(bbox, pixel_format="bgra")
+        with XDamageBackend(display_name) as reference:
+            expected = reference.grab(bbox, pixel_format="bgra")
+        if not np.array_equal(frame[..., :3], expected[..., :3]):
+            failures.append("增量维护的画面与整屏抓取不一致")
+    finally:
+        xlib.XFreeGC(painter, gc)
+        xlib.XCloseDisplay(painter)
+        backend.close()
+    return failures
+
+
+def main(argv=None):
+    """命令行基准测试入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Super Hi Vision 捕获后端基准测试")
+    parser.add_argument("--backend", default="auto",
+                        choices=sorted(set(CAPTURE_BACKENDS.values())))
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--check-xdamage", action="store_true",
+                        help="在当前 X 服务器（如 Xvfb）上自检 XDamage 后端")
+    args = parser.parse_args(argv)
+
+    if args.check_xdamage:
+        if not XDAMAGE_AVAILABLE:
+            print("❌ 未找到 libX11 / libXdamage")
+            return 1
+        failures = check_xdamage()
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            return 1
+        print("✅ XDamage 后端自检通过")
+        return 0
+
+    with create_capture_backend(args.backend, size=(args.width, args.height)) as backend:
+        result = benchmark_capture(backend, args.frames)
+
+    print(f"后端: {result['backend']}  帧数: {result['frames']}  "
+          f"耗时: {result['seconds']:.2f}s  FPS: {result['fps']:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
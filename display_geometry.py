@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 显示器布局服务
+只在启动时查询一次显示器布局并缓存，之后由后台线程慢速轮询（或由界面的
+屏幕变化事件触发 refresh()）更新，跟随鼠标等逐帧逻辑读取缓存即可，
+不再每帧调用 pyautogui.size() 或为了取屏幕尺寸而整屏截图。
+VirtualDesktopCompositor 把所有显示器拼合为一帧（虚拟桌面），各显示器直接抓取到
+预分配帧缓冲区中的对应位置，不做逐帧分配和二次拷贝。
+"""
+
+import threading
+
+import numpy as np
+
+from capture_backends import MSS_AVAILABLE, PIL_GRAB_AVAILABLE, PIXEL_FORMATS
+
+# 后台轮询间隔（秒）
+DISPLAY_POLL_INTERVAL = 5.0
+
+# 无法查询时使用的默认分辨率
+DEFAULT_SCREEN_SIZE = (1920, 1080)
+
+# 显示器选择中代表“虚拟桌面（全部显示器）”的标记
+VIRTUAL_DESKTOP = "desktop"
+
+
+def query_monitors():
+    """查询显示器布局，返回 ({left, top, width, height, primary}, ...)，主显示器在前"""
+    monitors = []
+    if MSS_AVAILABLE:
+        import mss
+        try:
+            with mss.mss() as sct:
+                # monitors[0] 是所有显示器组成的虚拟桌面，之后才是各个显示器
+                for monitor in sct.monitors[1:]:
+                    monitors.append({
+                        "left": monitor["left"],
+                        "top": monitor["top"],
+                        "width": monitor["width"],
+                        "height": monitor["height"],
+                        "primary": False
+                    })
+        except Exception as e:
+            print(f"⚠️ mss 查询显示器失败: {e}")
+            monitors = []
+
+    if not monitors and PIL_GRAB_AVAILABLE:
+        from PIL import ImageGrab
+        try:
+            width, height = ImageGrab.grab().size
+            monitors.append({"left": 0, "top": 0, "width": width, "height": height, "primary": True})
+        except Exception as e:
+            print(f"⚠️ ImageGrab 查询屏幕尺寸失败: {e}")
+
+    if not monitors:
+        width, height = DEFAULT_SCREEN_SIZE
+        monitors.append({"left": 0, "top": 0, "width": width, "height": height, "primary": True})
+
+    # 原点 (0, 0) 所在的显示器为主显示器
+    primary = next((m for m in monitors if m["left"] == 0 and m["top"] == 0), monitors[0])
+    primary["primary"] = True
+    monitors.remove(primary)
+    return tuple([primary] + monitors)
+
+
+def monitor_bbox(monitor):
+    """返回显示器的 bbox (left, top, right, bottom)"""
+    return (monitor["left"], monitor["top"],
+            monitor["left"] + monitor["width"], monitor["top"] + monitor["height"])
+
+
+class DisplayGeometry:
+    """缓存的显示器布局
+
+    读取方法只访问缓存，不做任何系统调用；布局变化时通知 add_listener() 注册的回调。
+    """
+
+    def __init__(self, poll_interval=DISPLAY_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._monitors = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stop_event = threading.Event()
+        self._poller = None
+
+        # 统计信息
+        self.refresh_count = 0
+
+    def refresh(self):
+        """重新查询显示器布局，返回布局是否变化"""
+        monitors = query_monitors()
+        with self._lock:
+            changed = self._monitors is not None and monitors != self._monitors
+            self._monitors = monitors
+            self.refresh_count += 1
+            listeners = list(self._listeners)
+        if changed:
+            print(f"🖥️ 显示器布局已变化: {len(monitors)} 个显示器")
+            for callback in listeners:
+                try:
+                    callback(monitors)
+                except Exception as e:
+                    print(f"❌ 显示器布局回调错误: {e}")
+        return changed
+
+    def add_listener(self, callback):
+        """注册布局变化回调 callback(monitors)"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def start_polling(self):
+        """启动后台慢速轮询"""
+        if self._poller is not None and self._poller.is_alive():
+            return
+        self._stop_event.clear()
+        self._poller = threading.Thread(target=self._poll, daemon=True)
+        self._poller.start()
+
+    def stop_polling(self):
+        """停止后台轮询"""
+        self._stop_event.set()
+
+    def _poll(self):
+        """轮询线程"""
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"❌ 显示器布局轮询错误: {e}")
+
+    def monitors(self):
+        """返回缓存的显示器列表（主显示器在前）"""
+        monitors = self._monitors
+        if monitors is None:
+            self.refresh()
+            self.start_polling()
+            monitors = self._monitors
+        return monitors
+
+    def primary(self):
+        """返回主显示器"""
+        return self.monitors()[0]
+
+    def screen_size(self):
+        """返回主显示器尺寸 (宽, 高)"""
+        primary = self.primary()
+        return primary["width"], primary["height"]
+
+    def virtual_bounds(self):
+        """返回所有显示器组成的虚拟桌面 (left, top, right, bottom)"""
+        monitors = self.monitors()
+        return (
+            min(m["left"] for m in monitors),
+            min(m["top"] for m in monitors),
+            max(m["left"] + m["width"] for m in monitors),
+            max(m["top"] + m["height"] for m in monitors)
+        )
+
+    def monitor_choices(self):
+        """返回显示器选项（界面显示名称 -> 显示器序号或 VIRTUAL_DESKTOP）"""
+        choices = {}
+        for index, monitor in enumerate(self.monitors()):
+            label = f"显示器 {index + 1}{' (主)' if monitor['primary'] else ''} " \
+                    f"{monitor['width']}x{monitor['height']} @ ({monitor['left']}, {monitor['top']})"
+            choices[label] = index
+        left, top, right, bottom = self.virtual_bounds()
+        choices[f"虚拟桌面 (全部显示器) {right - left}x{bottom - top}"] = VIRTUAL_DESKTOP
+        return choices
+
+    def monitor_at(self, x, y):
+        """返回 (x, y) 所在的显示器；不在任何显示器上（如显示器之间的空隙）时返回最近的显示器"""
+        def distance(monitor):
+            dx = max(monitor["left"] - x, 0, x - (monitor["left"] + monitor["width"] - 1))
+            dy = max(monitor["top"] - y, 0, y - (monitor["top"] + monitor["height"] - 1))
+            return dx * dx + dy * dy
+        return min(self.monitors(), key=distance)
+
+    def clamp_area(self, center_x, center_y, width, height):
+        """以 (center_x, center_y) 为中心取 width x height 区域，并限制在中心所在的显示器内
+
+        返回 (x, y, width, height)。
+        """
+        left, top, right, bottom = monitor_bbox(self.monitor_at(center_x, center_y))
+
+        x = min(max(left, center_x - width // 2), right - width)
+        y = min(max(top, center_y - height // 2), bottom - height)
+        return max(left, x), max(top, y), width, height
+
+
+class VirtualDesktopCompositor:
+    """虚拟桌面合成器
+
+    帧尺寸为所有显示器的外接矩形，每个显示器直接抓取到帧中对应位置的视图上；
+    显示器之间的空隙（排列不规则时）每帧清零，避免残留上一次使用该缓冲区时的画面。
+    """
+
+    def __init__(self, geometry=None):
+        self.geometry = geometry or get_display_geometry()
+        self._monitors = None
+        self._origin = (0, 0)
+        self._size = (0, 0)
+        self._has_gaps = False
+
+        # 统计信息
+        self.frames_composited = 0
+
+    def _layout(self):
+        """显示器布局变化时重新计算帧尺寸"""
+        monitors = self.geometry.monitors()
+        if monitors is not self._monitors:
+            left, top, right, bottom = self.geometry.virtual_bounds()
+            self._origin = (left, top)
+            self._size = (right - left, bottom - top)
+            covered = sum(m["width"] * m["height"] for m in monitors)
+            self._has_gaps = covered < self._size[0] * self._size[1]
+            self._monitors = monitors
+        return monitors
+
+    def frame_shape(self, pixel_format="bgr"):
+        """返回合成帧形状 (高, 宽, 通道数)"""
+        self._layout()
+        width, height = self._size
+        return height, width, PIXEL_FORMATS[pixel_format]
+
+    def grab(self, backend, out=None, pixel_format="bgr"):
+        """抓取所有显示器并合成为一帧"""
+        monitors = self._layout()
+        shape = self.frame_shape(pixel_format)
+        frame = out if out is not None and out.shape == shape else np.empty(shape, dtype=np.uint8)
+        if self._has_gaps:
+            frame.fill(0)
+
+        origin_x, origin_y = self._origin
+        for monitor in monitors:
+            x = monitor["left"] - origin_x
+            y = monitor["top"] - origin_y
+            view = frame[y:y + monitor["height"], x:x + monitor["width"]]
+            grabbed = backend.grab(monitor_bbox(monitor), out=view, pixel_format=pixel_format)
+            if grabbed is not view:
+                # 后端返回的尺寸与布局不符（如高DPI缩放），按重叠部分拷贝
+                height = min(view.shape[0], grabbed.shape[0])
+                width = min(view.shape[1], grabbed.shape[1])
+                view[:height, :width] = grabbed[:height, :width]
+        self.frames_composited += 1
+        return frame
+
+
+_shared_geometry = None
+_shared_lock = threading.Lock()
+
+
+def get_display_geometry():
+    """返回进程内共享的 DisplayGeometry"""
+    global _shared_geometry
+    with _shared_lock:
+        if _shared_geometry is None:
+            _shared_geometry = DisplayGeometry()
+        return _shared_geometry
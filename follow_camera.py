@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 跟随鼠标虚拟镜头
+跟随鼠标录制时不再逐帧以原始光标为中心截取区域，而是由虚拟镜头平滑跟随:
+- 死区: 光标在画面中部小范围内移动时镜头不动
+- 临界阻尼弹簧: 镜头以无过冲的方式追上目标位置
+- 速度预测: 按光标速度提前移动镜头，减少追赶延迟
+镜头从抓取窗口中裁剪输出帧: 抓取窗口在画面四周只留出速度预测的提前量，镜头静止时与画面重合，
+逐帧抓屏的面积不超过画面本身加上移动方向上的余量；窗口只在镜头移出时才重新定位，
+镜头小幅平移不会改变抓屏区域的几何参数；画面稳定后帧间差异小，编码码率也随之下降。
+镜头限制在光标所在的显示器内，光标移到另一台显示器时镜头直接切换过去。
+"""
+
+import time
+
+import numpy as np
+
+from capture_backends import PIXEL_FORMATS
+from display_geometry import get_display_geometry
+
+# 镜头模式（界面显示名称 -> 模式名称）
+FOLLOW_CAMERA_MODES = {
+    "平滑镜头 (smooth)": "smooth",
+    "灵敏跟随 (responsive)": "responsive",
+    "直接跟随 (direct)": "direct"
+}
+
+# 各模式参数: 死区占画面一半尺寸的比例、弹簧平滑时间（秒）、速度预测时间（秒）
+FOLLOW_CAMERA_PRESETS = {
+    "smooth": {"deadzone": 0.25, "smooth_time": 0.35, "lookahead": 0.12},
+    "responsive": {"deadzone": 0.1, "smooth_time": 0.12, "lookahead": 0.05},
+    "direct": {"deadzone": 0.0, "smooth_time": 0.0, "lookahead": 0.0}
+}
+
+# 光标速度指数平滑系数
+VELOCITY_SMOOTHING = 0.3
+
+# 速度预测的最大偏移（占画面尺寸的比例）
+MAX_LOOKAHEAD = 0.25
+
+
+def smooth_damp(current, target, velocity, smooth_time, dt):
+    """临界阻尼弹簧的一步积分，返回 (新位置, 新速度)"""
+    if smooth_time <= 0 or dt <= 0:
+        return target, 0.0
+    omega = 2.0 / smooth_time
+    x = omega * dt
+    decay = 1.0 / (1.0 + x + 0.48 * x * x + 0.235 * x * x * x)
+    change = current - target
+    temp = (velocity + omega * change) * dt
+    velocity = (velocity - omega * temp) * decay
+    position = target + (change + temp) * decay
+    # 越过目标时直接停在目标处，保证不过冲
+    if (target - current > 0) == (position > target):
+        return target, 0.0
+    return position, velocity
+
+
+class FollowCamera:
+    """跟随鼠标的虚拟镜头
+
+    update() 根据光标位置推进镜头，返回整像素的画面区域 (x, y, 宽, 高)；
+    capture() 抓取缓存的抓取窗口并把画面区域裁剪到 out 缓冲区。
+    """
+
+    def __init__(self, width=800, height=600, mode="smooth", geometry=None, clock=time.perf_counter):
+        if mode not in FOLLOW_CAMERA_PRESETS:
+            raise ValueError(f"未知的镜头模式: {mode}")
+        self.width = int(width)
+        self.height = int(height)
+        self.mode = mode
+        self.geometry = geometry or get_display_geometry()
+        self.clock = clock
+        self._scratch = None
+        self.reset()
+
+        # 统计信息
+        self.frames_captured = 0
+        self.window_moves = 0
+
+    def reset(self):
+        """重置镜头状态，下一次 update() 直接对准光标"""
+        self._center = None
+        self._target = None
+        self._velocity = [0.0, 0.0]
+        self._cursor = None
+        self._cursor_velocity = [0.0, 0.0]
+        self._last_time = None
+        self._lead = (0, 0)
+        self._monitor = None
+        self.view = None
+        self.window = None
+
+    def _bounds(self, cursor_x, cursor_y):
+        """镜头可移动的范围 (left, top, right, bottom)，即光标所在的显示器"""
+        monitor = self.geometry.monitor_at(cursor_x, cursor_y)
+        if monitor is not self._monitor:
+            if self._monitor is not None:
+                # 光标换到另一台显示器：镜头直接对准光标，不从原显示器滑过去
+                self._center = None
+            self._monitor = monitor
+        return (monitor["left"], monitor["top"],
+                monitor["left"] + monitor["width"], monitor["top"] + monitor["height"])
+
+    def _clamp_center(self, center, size, low, high):
+        """把中心限制在画面不越出屏幕的范围内"""
+        half = size / 2.0
+        if high - low <= size:
+            return low + half
+        return min(max(center, low + half), high - half)
+
+    def update(self, cursor_x, cursor_y, now=None):
+        """推进镜头，返回画面区域 (x, y, 宽, 高)"""
+        now = self.clock() if now is None else now
+        preset = FOLLOW_CAMERA_PRESETS[self.mode]
+        left, top, right, bottom = self._bounds(cursor_x, cursor_y)
+        sizes = (self.width, self.height)
+        cursor = (float(cursor_x), float(cursor_y))
+
+        if self._center is None:
+            # 首帧直接对准光标
+            self._center = [self._clamp_center(cursor[0], self.width, left, right),
+                            self._clamp_center(cursor[1], self.height, top, bottom)]
+            self._target = list(self._center)
+            self._cursor = cursor
+            self._cursor_velocity = [0.0, 0.0]
+            self._velocity = [0.0, 0.0]
+            self._lead = (0, 0)
+            self._last_time = now
+            return self._snap(left, top, right, bottom)
+
+        dt = max(0.0, now - self._last_time)
+        self._last_time = now
+
+        # 光标速度（指数平滑），用于预测镜头应提前到达的位置
+        predicted = []
+        leads = []
+        for axis in (0, 1):
+            if dt > 0:
+                velocity = (cursor[axis] - self._cursor[axis]) / dt
+                self._cursor_velocity[axis] += VELOCITY_SMOOTHING * (velocity - self._cursor_velocity[axis])
+            limit = sizes[axis] * MAX_LOOKAHEAD
+            lead = min(max(self._cursor_velocity[axis] * preset["lookahead"], -limit), limit)
+            predicted.append(cursor[axis] + lead)
+            leads.append(int(abs(lead) + 0.5))
+        self._cursor = cursor
+        # 预测提前量即镜头在近期内的移动距离，作为抓取窗口的边距
+        self._lead = tuple(leads)
+
+        # 死区: 预测位置越出目标周围的死区时，目标只移动到刚好把它收回死区边缘
+        for axis, (low, high) in enumerate(((left, right), (top, bottom))):
+            half_zone = sizes[axis] / 2.0 * preset["deadzone"]
+            offset = predicted[axis] - self._target[axis]
+            if offset > half_zone:
+                self._target[axis] = predicted[axis] - half_zone
+            elif offset < -half_zone:
+                self._target[axis] = predicted[axis] + half_zone
+            self._target[axis] = self._clamp_center(self._target[axis], sizes[axis], low, high)
+
+            self._center[axis], self._velocity[axis] = smooth_damp(
+                self._center[axis], self._target[axis], self._velocity[axis], preset["smooth_time"], dt)
+
+        return self._snap(left, top, right, bottom)
+
+    def _snap(self, left, top, right, bottom):
+        """取整得到画面区域并限制在屏幕内"""
+        x = int(round(self._center[0] - self.width / 2.0))
+        y = int(round(self._center[1] - self.height / 2.0))
+        x = max(left, min(x, right - self.width))
+        y = max(top, min(y, bottom - self.height))
+        self.view = (x, y, self.width, self.height)
+        return self.view
+
+    def _place_window(self):
+        """画面区域移出抓取窗口时，以画面为中心重新放置窗口（边距为速度预测的提前量，限制在显示器内）"""
+        x, y, width, height = self.view
+        if self.window is not None:
+            win_left, win_top, win_right, win_bottom = self.window
+            inside = (x >= win_left and y >= win_top and
+                      x + width <= win_right and y + height <= win_bottom)
+            # 镜头停稳（没有提前量）后窗口收缩到画面本身，静止时只抓画面大小
+            if inside and (self._lead != (0, 0) or self.window == (x, y, x + width, y + height)):
+                return False
+
+        monitor = self._monitor
+        left, top = monitor["left"], monitor["top"]
+        right, bottom = left + monitor["width"], top + monitor["height"]
+        margin_x, margin_y = self._lead
+        win_left = max(left, x - margin_x)
+        win_top = max(top, y - margin_y)
+        win_right = max(min(right, x + width + margin_x), x + width)
+        win_bottom = max(min(bottom, y + height + margin_y), y + height)
+        self.window = (win_left, win_top, win_right, win_bottom)
+        self.window_moves += 1
+        return True
+
+    def frame_shape(self, pixel_format="bgr"):
+        """返回输出帧形状 (高, 宽, 通道数)"""
+        return self.height, self.width, PIXEL_FORMATS[pixel_format]
+
+    def capture(self, backend, cursor_x, cursor_y, out=None, pixel_format="bgr", now=None):
+        """推进镜头并抓取一帧，画面从抓取窗口中裁剪"""
+        x, y, width, height = self.update(cursor_x, cursor_y, now)
+        self._place_window()
+        self.frames_captured += 1
+
+        if self.window == (x, y, x + width, y + height):
+            # 窗口与画面重合：直接抓取到输出缓冲区
+            return backend.grab(self.window, out=out, pixel_format=pixel_format)
+
+        # 抓取窗口写入常驻的暂存缓冲区，窗口不变时不再分配
+        shape = backend.frame_shape(self.window, pixel_format)
+        if self._scratch is None or self._scratch.shape != shape:
+            self._scratch = np.empty(shape, dtype=np.uint8)
+        grabbed = backend.grab(self.window, out=self._scratch, pixel_format=pixel_format)
+
+        win_left, win_top = self.window[0], self.window[1]
+        crop = grabbed[y - win_top:y - win_top + height, x - win_left:x - win_left + width]
+        if out is not None and out.shape == crop.shape:
+            np.copyto(out, crop)
+            return out
+        return crop.copy()
+
+    def stats(self):
+        """返回镜头统计信息"""
+        return {
+            "captured": self.frames_captured,
+            "window_moves": self.window_moves
+        }
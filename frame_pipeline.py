@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 帧处理流水线
+捕获线程与编码线程之间通过有界帧队列解耦，编码器卡顿时不会拖慢抓屏。
+帧缓冲区来自预分配的 FramePool，捕获写入、编码后归还，录制期间不再逐帧分配整帧内存。
+FramePacer 按单调时钟截止时间调度抓屏，并用重复帧 / 丢帧保持输出文件的恒定帧率。
+StaticFrameDetector 识别与上一帧完全相同的画面，静止画面不再重新叠加和编码。
+"""
+
+import time
+import threading
+import zlib
+from collections import deque
+
+import numpy as np
+
+# 队列满时的背压策略（界面显示名称 -> 策略名称）
+BACKPRESSURE_POLICIES = {
+    "阻塞等待 (block)": "block",
+    "丢弃最旧帧 (drop-oldest)": "drop_oldest",
+    "丢弃最新帧 (drop-newest)": "drop_newest"
+}
+
+DEFAULT_QUEUE_SIZE = 8
+
+
+class FramePool:
+    """预分配的帧缓冲池
+
+    捕获线程 acquire() 借出缓冲区并直接写入，编码线程写完后 release() 归还。
+    缓冲区数量固定，内存占用与分辨率相关、与录制时长无关；帧尺寸变化时整池重建一次。
+    """
+
+    def __init__(self, count, shape=None, dtype=np.uint8):
+        self.count = max(1, int(count))
+        self.dtype = dtype
+        self.shape = None
+        self._free = deque()
+        self._buffers = {}
+        self._in_use = set()
+        self._cond = threading.Condition()
+
+        # 统计信息
+        self.buffers_allocated = 0
+        self.misses = 0
+
+        if shape is not None:
+            self._allocate(shape)
+
+    def _allocate(self, shape):
+        """按新尺寸重建缓冲池（仍被借出的旧缓冲区归还时直接丢弃）"""
+        self.shape = tuple(shape)
+        self._free.clear()
+        self._buffers = {}
+        self._in_use = set()
+        for _ in range(self.count):
+            buffer = np.empty(self.shape, dtype=self.dtype)
+            self._buffers[id(buffer)] = buffer
+            self._free.append(buffer)
+            self.buffers_allocated += 1
+
+    def acquire(self, shape, timeout=1.0):
+        """借出一个指定形状的缓冲区，超时返回 None"""
+        with self._cond:
+            if tuple(shape) != self.shape:
+                self._allocate(shape)
+
+            deadline = time.monotonic() + timeout
+            while not self._free:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.misses += 1
+                    return None
+                self._cond.wait(remaining)
+
+            buffer = self._free.popleft()
+            self._in_use.add(id(buffer))
+            return buffer
+
+    def release(self, buffer):
+        """归还缓冲区；非本池的数组会被忽略"""
+        if buffer is None:
+            return
+        with self._cond:
+            key = id(buffer)
+            if key in self._in_use and self._buffers.get(key) is buffer:
+                self._in_use.discard(key)
+                self._free.append(buffer)
+                self._cond.notify()
+
+    def stats(self):
+        """返回缓冲池统计信息"""
+        with self._cond:
+            return {
+                "buffers": len(self._buffers),
+                "in_use": len(self._in_use),
+                "allocated": self.buffers_allocated,
+                "misses": self.misses
+            }
+
+
+class FrameQueue:
+    """有界帧队列
+
+    队列满时按 policy 处理:
+    - block: 捕获线程等待编码线程腾出空间
+    - drop_oldest: 丢弃队首最旧的帧，保证新帧入队（先合并队列中的重复标记，不够时才丢真实帧）
+    - drop_newest: 丢弃当前要入队的新帧
+    被丢弃（或因队列已关闭而未入队）的帧会交给 on_drop，用于归还缓冲池。
+    每帧带有重复次数 repeat（占用的输出帧位数）；丢帧时其帧位并入相邻的帧，
+    保证写入的总帧数不变，恒定帧率文件的时间轴不会因丢帧而缩短。
+    可变帧率模式下帧带有抓取时间戳 timestamp，丢帧只是少写一帧，时间轴由时间戳决定。
+    frame 为 None 表示“重复上一帧”（静止画面），由编码线程重写它保留的上一帧。
+    """
+
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE, policy="block", on_drop=None):
+        if policy not in BACKPRESSURE_POLICIES.values():
+            raise ValueError(f"未知的背压策略: {policy}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.on_drop = on_drop
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # 统计信息
+        self.frames_queued = 0
+        self.frames_dropped = 0
+        self.repeats_merged = 0
+        self.max_depth = 0
+
+    def _merge_repeat(self):
+        """腾出一个位置：把最早的重复标记并入它前面的帧，返回是否成功
+
+        标记在队首时其前一帧已被编码线程取走，无法合并，返回 False。
+        带时间戳的标记（可变帧率结束帧）决定时间轴，不合并。
+        """
+        for index in range(1, len(self._items)):
+            frame, repeat, timestamp = self._items[index]
+            if frame is None and timestamp is None:
+                self._items[index - 1][1] += repeat
+                del self._items[index]
+                self.repeats_merged += 1
+                return True
+        return False
+
+    def put(self, frame, repeat=1, timestamp=None):
+        """放入一帧（重复写入 repeat 次），返回该帧是否入队"""
+        dropped = None
+        accepted = False
+        with self._cond:
+            if self._closed:
+                dropped = frame
+            elif len(self._items) >= self.maxsize and self.policy == "drop_newest":
+                # 新帧的帧位交给队尾的帧重复填充
+                self.frames_dropped += 1
+                self._items[-1][1] += repeat
+                dropped = frame
+            else:
+                if len(self._items) >= self.maxsize:
+                    if self.policy == "drop_oldest" and not self._merge_repeat():
+                        # 最旧帧的帧位由新帧补上；队首是重复标记时不算丢帧
+                        dropped, dropped_repeat, _ = self._items.popleft()
+                        repeat += dropped_repeat
+                        if dropped is not None:
+                            self.frames_dropped += 1
+                    else:
+                        while len(self._items) >= self.maxsize and not self._closed:
+                            self._cond.wait()
+
+                if self._closed:
+                    dropped = frame
+                else:
+                    self._items.append([frame, repeat, timestamp])
+                    self.frames_queued += 1
+                    self.max_depth = max(self.max_depth, len(self._items))
+                    self._cond.notify_all()
+                    accepted = True
+
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+        return accepted
+
+    def get(self, timeout=None):
+        """取出 (帧, 重复次数, 时间戳)；队列关闭且已取空时返回 None"""
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._items and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+            if not self._items:
+                return None
+
+            frame, repeat, timestamp = self._items.popleft()
+            self._cond.notify_all()
+            return frame, repeat, timestamp
+
+    def close(self):
+        """关闭队列，唤醒所有等待的线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def stats(self):
+        """返回队列统计信息"""
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "queued": self.frames_queued,
+                "dropped": self.frames_dropped,
+                "merged": self.repeats_merged,
+                "max_depth": self.max_depth
+            }
+
+
+class FrameEncoderThread(threading.Thread):
+    """编码线程：从帧队列取帧，处理后交给写入函数
+
+    process 用于在编码线程中叠加画图等后处理，write 通常为 video_writer.write，
+    以 write(frame, timestamp) 调用；release 在帧写完后调用，用于把缓冲区归还给 FramePool。
+    编码线程保留最近写入的一帧（处理后的结果），收到 None 帧时直接重写它，
+    因此缓冲池需要比队列多留出抓取中、编码中和保留的三个缓冲区。
+    队列关闭后会先把剩余的帧全部写完再退出。
+    """
+
+    def __init__(self, frame_queue, write, process=None, release=None):
+        super().__init__(daemon=True)
+        self.frame_queue = frame_queue
+        self.write = write
+        self.process = process
+        self.release = release
+
+        # 最近写入的一帧（原始缓冲区, 处理后的帧）
+        self._last_captured = None
+        self._last_frame = None
+
+        # 统计信息
+        self.frames_encoded = 0
+        self.frames_repeated = 0
+        self.errors = 0
+        self.slowest_write = 0.0
+
+    def run(self):
+        """编码主循环"""
+        while True:
+            item = self.frame_queue.get()
+            if item is None:
+                break
+
+            captured, repeat, timestamp = item
+            if timestamp is not None:
+                # 带时间戳的帧（可变帧率）只写一次，时间轴由时间戳决定
+                repeat = 1
+            try:
+                if captured is None:
+                    # 静止画面：重写上一帧，不再叠加画图
+                    frame = self._last_frame
+                    if frame is None:
+                        continue
+                    self.frames_repeated += repeat
+                else:
+                    frame = captured
+                    if self.process:
+                        frame = self.process(frame)
+                    self._keep_last(captured, frame)
+
+                # 重复帧只叠加一次画图，多次写入同一帧
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    self.write(frame, timestamp)
+                    self.slowest_write = max(self.slowest_write, time.perf_counter() - start)
+                    self.frames_encoded += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ 编码错误: {e}")
+
+        self._keep_last(None, None)
+
+    def _keep_last(self, captured, frame):
+        """保留最近写入的帧，归还之前保留的缓冲区"""
+        if self.release and self._last_captured is not None and self._last_captured is not captured:
+            self.release(self._last_captured)
+        self._last_captured = captured
+        self._last_frame = frame
+
+    def stop(self, timeout=10.0):
+        """关闭队列并等待剩余帧写完"""
+        self.frame_queue.close()
+        if self.is_alive():
+            self.join(timeout=timeout)
+
+    def stats(self):
+        """返回编码统计信息（包含队列统计）"""
+        stats = self.frame_queue.stats()
+        stats.update({
+            "encoded": self.frames_encoded,
+            "repeated": self.frames_repeated,
+            "errors": self.errors,
+            "slowest_write": self.slowest_write
+        })
+        return stats
+
+
+class FramePacer:
+    """恒定帧率调度器
+
+    抓屏时刻由单调时钟截止时间决定，而不是“处理完再睡一个帧间隔”:
+    wait() 睡到下一个抓屏截止时间，commit() 按帧的抓取时刻计算它在输出时间轴上
+    占几个帧位——抓屏跟不上时重复写入（duplicate），同一帧位抓到多帧时丢弃（drop），
+    因此 30 FPS 的文件即使实际只抓到 18 FPS，播放时长也与真实时长一致、不会与音频漂移。
+    capture_ratio < 1 时按比例降低抓屏频率（如 0.5 表示每两帧位抓一次），输出帧率不变。
+    可变帧率模式不分配帧位，用 stamp() 取得扣除暂停时长后的帧时间戳，fps 只作为抓屏上限。
+    时钟默认使用 time.perf_counter（单调时钟，Windows 上精度也在微秒级）；
+    录制会话传入 SessionClock.now，使视频帧与音频块使用同一时间轴。
+    """
+
+    def __init__(self, fps, capture_ratio=1.0, clock=time.perf_counter):
+        self.fps = float(fps)
+        self.interval = 1.0 / self.fps
+        self.capture_interval = self.interval / max(0.01, min(1.0, float(capture_ratio)))
+        self.clock = clock
+        self._origin = None
+        self._paused_at = None
+        self._next_capture = None
+        self.slots_filled = 0
+
+        # 统计信息
+        self._waits = 0
+        self.frames_captured = 0
+        self.frames_duplicated = 0
+        self.frames_dropped = 0
+        self.total_error = 0.0
+        self.max_error = 0.0
+
+    def start(self, origin=None):
+        """以 origin（默认为当前时刻）作为时间轴起点"""
+        self._origin = self.clock() if origin is None else origin
+        self._next_capture = self._origin
+        self._paused_at = None
+        self.slots_filled = 0
+
+    def pause(self):
+        """暂停计时（暂停期间不产生帧位）"""
+        if self._origin is not None and self._paused_at is None:
+            self._paused_at = self.clock()
+
+    def resume(self):
+        """恢复计时，时间轴整体后移暂停的时长"""
+        if self._paused_at is not None:
+            paused = self.clock() - self._paused_at
+            self._origin += paused
+            self._next_capture += paused
+            self._paused_at = None
+
+    @property
+    def paused(self):
+        return self._paused_at is not None
+
+    def wait(self):
+        """等待到下一个抓屏截止时间，返回当前时刻（作为帧的抓取时刻）"""
+        if self._origin is None:
+            self.start()
+        deadline = self._next_capture
+        while True:
+            now = self.clock()
+            remaining = deadline - now
+            if remaining <= 0:
+                break
+            time.sleep(remaining)
+
+        # 截止时间偏差（抓屏开始时刻相对计划时刻的延迟）
+        error = now - deadline
+        self._waits += 1
+        self.total_error += error
+        self.max_error = max(self.max_error, error)
+
+        # 下一个抓屏截止时间：错过的截止时间直接跳过，不追赶
+        missed = int(error / self.capture_interval)
+        self._next_capture = deadline + (missed + 1) * self.capture_interval
+        return now
+
+    def commit(self, capture_time):
+        """登记 wait() 后抓到的一帧，返回它在输出文件中应写入的次数（0 表示丢弃）"""
+        self.frames_captured += 1
+        slot = int((capture_time - self._origin) / self.interval + 1e-6)
+        if slot < self.slots_filled:
+            self.frames_dropped += 1
+            return 0
+        repeat = slot - self.slots_filled + 1
+        self.frames_duplicated += repeat - 1
+        self.slots_filled = slot + 1
+        return repeat
+
+    def stamp(self, capture_time):
+        """登记 wait() 后抓到的一帧，返回它相对录制开始的时间戳（秒，不含暂停时长）"""
+        self.frames_captured += 1
+        return capture_time - self._origin
+
+    def stats(self):
+        """返回调度统计信息"""
+        elapsed = 0.0
+        if self._origin is not None:
+            elapsed = (self._paused_at or self.clock()) - self._origin
+        captured = self.frames_captured
+        waits = self._waits
+        return {
+            "captured": captured,
+            "slots": self.slots_filled,
+            "duplicated": self.frames_duplicated,
+            "dropped": self.frames_dropped,
+            "capture_fps": captured / elapsed if elapsed > 0 else 0.0,
+            "mean_error": self.total_error / waits if waits else 0.0,
+            "max_error": self.max_error
+        }
+
+
+class StaticFrameDetector:
+    """静止画面检测
+
+    对整帧计算 adler32 校验和（1080p BGRA 约 4ms），与上一帧相同即判定为静止。
+    使用整帧而不是降采样，是为了不漏掉终端里单像素宽的字符笔画。
+    token 用于把画面以外的状态（如画图图层）纳入比较：token 变化时即使画面相同也不算静止。
+    捕获后端能报告变化区域（changed_regions 不为 None）时直接据此判断，省去整帧校验和。
+    """
+
+    def __init__(self):
+        self._signature = None
+
+        # 统计信息
+        self.frames_checked = 0
+        self.frames_static = 0
+
+    def reset(self):
+        """清除上一帧记录（暂停恢复后第一帧总是视为有变化）"""
+        self._signature = None
+
+    def is_static(self, frame, token=None, changed_regions=None):
+        """判断 frame 是否与上一帧相同"""
+        self.frames_checked += 1
+        if changed_regions is not None and self._signature is not None:
+            # 后端已报告变化区域：没有变化区域且形状、token 未变即为静止
+            signature = (frame.shape, None, token)
+            static = not changed_regions and signature[0] == self._signature[0] \
+                and token == self._signature[2]
+        else:
+            if not frame.flags['C_CONTIGUOUS']:
+                frame = np.ascontiguousarray(frame)
+            signature = (frame.shape, zlib.adler32(frame.data), token)
+            static = signature == self._signature
+        self._signature = signature
+        if static:
+            self.frames_static += 1
+        return static
+
+    def stats(self):
+        """返回检测统计信息"""
+        return {
+            "checked": self.frames_checked,
+            "static": self.frames_static
+        }
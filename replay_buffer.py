@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 即时回放缓冲
+后台常驻的录制会话不写最终文件，而是由 FFmpeg 分段封装为 MPEG-TS 片段
+（每 REPLAY_SEGMENT_SECONDS 秒强制一个关键帧并切段），写完的片段读入内存环形缓冲区，
+按时长和字节预算淘汰最旧的片段，磁盘上只保留正在写入的一段。
+保存回放时把缓冲区中的片段和正在写入的片段按顺序送入 FFmpeg 以 -c copy 重新封装为 MP4，
+不重新编码，保存耗时只与文件大小有关。
+"""
+
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+
+from video_encoders import FFmpegPipeEncoder
+
+# 回放时长（界面显示名称 -> 秒）
+REPLAY_DURATIONS = {
+    "最近 30 秒": 30,
+    "最近 1 分钟": 60,
+    "最近 2 分钟": 120,
+    "最近 5 分钟": 300
+}
+
+# 每个片段的时长（秒），也是关键帧间隔；回放起点按片段对齐
+REPLAY_SEGMENT_SECONDS = 2
+
+# 环形缓冲区的字节预算，超出时即使未满时长也淘汰最旧的片段
+REPLAY_BYTE_BUDGET = 256 * 1024 * 1024
+
+# 常驻编码使用更快的预设，降低全天运行的 CPU 占用
+REPLAY_PRESET = "superfast"
+
+# MPEG-TS 包长度，读取正在写入的片段时截断到整包
+TS_PACKET_SIZE = 188
+
+
+class ReplayRing:
+    """已编码片段的环形缓冲区
+
+    片段按写入顺序保存，add() 后按时长和字节预算淘汰最旧的片段（至少保留一段）。
+    """
+
+    def __init__(self, seconds=60, byte_budget=REPLAY_BYTE_BUDGET, segment_seconds=REPLAY_SEGMENT_SECONDS):
+        self.seconds = seconds
+        self.byte_budget = byte_budget
+        self.segment_seconds = segment_seconds
+        self._segments = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.segments_added = 0
+        self.segments_evicted = 0
+
+    def add(self, data):
+        """加入一个完整片段"""
+        with self._lock:
+            self._segments.append(data)
+            self._bytes += len(data)
+            self.segments_added += 1
+            # 时长: 已完成片段加上正在写入的一段即可覆盖 seconds
+            keep = max(1, -(-self.seconds // self.segment_seconds))
+            while len(self._segments) > 1 and (len(self._segments) > keep or self._bytes > self.byte_budget):
+                self._bytes -= len(self._segments.popleft())
+                self.segments_evicted += 1
+
+    def snapshot(self):
+        """返回当前所有片段（从旧到新）"""
+        with self._lock:
+            return list(self._segments)
+
+    def clear(self):
+        with self._lock:
+            self._segments.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """返回缓冲区统计信息"""
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "bytes": self._bytes,
+                "seconds": len(self._segments) * self.segment_seconds,
+                "added": self.segments_added,
+                "evicted": self.segments_evicted
+            }
+
+
+class ReplaySegmentEncoder(FFmpegPipeEncoder):
+    """即时回放编码器
+
+    与 FFmpegPipeEncoder 接口相同，可直接替换录制会话的视频写入器；
+    输出为 spool_dir 下按序号命名的 MPEG-TS 片段，写完的片段由 collect() 移入 ReplayRing。
+    只编码 H.264 视频，不混流音频。
+    """
+
+    def __init__(self, spool_dir, size, fps, pixel_format="bgr", crf=None, bitrate=None,
+                 seconds=60, byte_budget=REPLAY_BYTE_BUDGET, vfr=False):
+        self.spool_dir = spool_dir
+        self.prefix = f"replay_{os.getpid()}_{id(self)}_"
+        self.ring = ReplayRing(seconds, byte_budget)
+        self._next_index = 0
+        self._collect_lock = threading.Lock()
+        self._next_collect = time.monotonic() + REPLAY_SEGMENT_SECONDS
+        os.makedirs(spool_dir, exist_ok=True)
+        super().__init__(os.path.join(spool_dir, self.prefix + "%06d.ts"), size, fps,
+                         pixel_format=pixel_format, codec="libx264", crf=crf, bitrate=bitrate,
+                         preset=REPLAY_PRESET, vfr=vfr)
+
+    def output_args(self):
+        """分段输出: 固定间隔强制关键帧，段与段在关键帧处切开，可直接拼接
+
+        zerolatency 去掉编码器的前瞻缓冲，且每个包立即写盘，保存时正在写入的片段也包含最新画面。
+        """
+        return [
+            '-tune', 'zerolatency',
+            '-force_key_frames', f'expr:gte(t,n_forced*{REPLAY_SEGMENT_SECONDS})',
+            '-f', 'segment',
+            '-segment_time', str(REPLAY_SEGMENT_SECONDS),
+            '-segment_format', 'mpegts',
+            '-segment_format_options', 'flush_packets=1',
+            self.output_file
+        ]
+
+    def _segment_path(self, index):
+        return os.path.join(self.spool_dir, f"{self.prefix}{index:06d}.ts")
+
+    def collect(self, final=False):
+        """把已写完的片段读入环形缓冲区并删除文件；FFmpeg 开始写下一段时上一段即已写完"""
+        with self._collect_lock:
+            while True:
+                path = self._segment_path(self._next_index)
+                if not os.path.exists(path):
+                    break
+                if not final and not os.path.exists(self._segment_path(self._next_index + 1)):
+                    break
+                with open(path, 'rb') as f:
+                    self.ring.add(f.read())
+                os.remove(path)
+                self._next_index += 1
+
+    def write(self, frame, timestamp=None):
+        """写入一帧，每隔一个片段时长（按实际经过的时间，不按帧数）检查一次是否有写完的片段"""
+        super().write(frame, timestamp)
+        now = time.monotonic()
+        if now >= self._next_collect:
+            self._next_collect = now + REPLAY_SEGMENT_SECONDS
+            self.collect()
+
+    def _current_segment(self):
+        """正在写入的片段（截断到整包）"""
+        path = self._segment_path(self._next_index)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return b""
+        return data[:len(data) - len(data) % TS_PACKET_SIZE]
+
+    def save(self, output_file):
+        """把缓冲区中的片段加上正在写入的片段重新封装为 output_file（不重新编码），返回是否成功"""
+        self.collect()
+        with self._collect_lock:
+            segments = self.ring.snapshot()
+            current = self._current_segment()
+        if current:
+            segments.append(current)
+        if not segments:
+            print("⚠️ 回放缓冲区为空")
+            return False
+
+        cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'mpegts', '-i', '-',
+               '-c', 'copy', '-movflags', '+faststart', output_file]
+        try:
+            process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE)
+        except OSError as e:
+            print(f"❌ 启动FFmpeg失败: {e}")
+            return False
+        # 逐段写入，不拼接成一整块内存
+        stderr = b""
+        try:
+            for data in segments:
+                process.stdin.write(data)
+            process.stdin.close()
+        except OSError:
+            pass
+        finally:
+            stderr = process.stderr.read()
+            process.wait()
+        if process.returncode != 0:
+            print(f"❌ 保存回放失败 (返回码 {process.returncode}): "
+                  f"{stderr.decode('utf-8', errors='replace').strip()}")
+            return False
+        return True
+
+    def release(self):
+        """停止编码，清空缓冲区并删除磁盘上的片段"""
+        super().release()
+        with self._collect_lock:
+            self.ring.clear()
+            for name in os.listdir(self.spool_dir):
+                if name.startswith(self.prefix):
+                    try:
+                        os.remove(os.path.join(self.spool_dir, name))
+                    except OSError as e:
+                        print(f"⚠️ 删除回放片段失败: {e}")
+
+    def stats(self):
+        """返回回放缓冲统计信息"""
+        return self.ring.stats()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 异步截图服务
+热键 / 界面线程只负责抓屏并叠加缓存的画图图层（各一次），
+图片编码和写盘交给后台工作线程池（cv2.imencode 编码时释放 GIL），
+截图热键在 4K 屏幕上也能在毫秒级返回；保存结果通过回调通知界面。
+每张截图只编码一次，不再经过 PIL 保存 -> 读回 -> 再保存。
+BurstCapture（连拍）按固定间隔把原始帧直接抓取到内存映射的缓存文件中，
+连拍期间不做任何编码；结束后由后台线程池逐帧读取缓存文件编码为图片（同样依赖 imencode 释放 GIL，
+不使用进程池：打包后的 exe 和 spawn 方式启动的子进程会重新执行程序入口）。
+"""
+
+import math
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from capture_backends import create_capture_backend
+from frame_pipeline import FramePacer
+
+# 截图格式（界面显示名称 -> 格式名称）
+SCREENSHOT_FORMATS = {
+    "PNG (无损)": "png",
+    "PNG 快速 (无损, 文件较大)": "png-fast",
+    "JPEG (高质量)": "jpeg",
+    "WebP (有损)": "webp",
+    "WebP (无损)": "webp-lossless"
+}
+
+# 各格式的扩展名和 cv2.imencode 参数
+SCREENSHOT_ENCODE_PARAMS = {
+    "png": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 6]),
+    "png-fast": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 1]),
+    "jpeg": (".jpg", [cv2.IMWRITE_JPEG_QUALITY, 95]),
+    "webp": (".webp", [cv2.IMWRITE_WEBP_QUALITY, 90]),
+    # OpenCV 中 WebP 质量大于 100 表示无损
+    "webp-lossless": (".webp", [cv2.IMWRITE_WEBP_QUALITY, 101])
+}
+
+# 编码工作线程数
+SCREENSHOT_WORKERS = 2
+
+# 连拍间隔（界面显示名称 -> 秒）
+BURST_INTERVALS = {
+    "每 100 毫秒": 0.1,
+    "每 200 毫秒": 0.2,
+    "每 500 毫秒": 0.5,
+    "每 1 秒": 1.0
+}
+
+# 连拍时长（界面显示名称 -> 秒）
+BURST_DURATIONS = {
+    "5 秒": 5,
+    "10 秒": 10,
+    "30 秒": 30,
+    "60 秒": 60
+}
+
+# 连拍编码线程数（至少 1 个，保留一个核心给界面和录制）
+BURST_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+
+def encode_image(frame, image_format="png"):
+    """把 BGR / BGRA 帧编码为指定格式，返回 (扩展名, 编码后的字节数组)"""
+    extension, params = SCREENSHOT_ENCODE_PARAMS[image_format]
+    if frame.ndim == 3 and frame.shape[2] == 4:
+        # 屏幕画面的 alpha 通道没有意义，按 BGR 编码
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    ok, data = cv2.imencode(extension, frame, params)
+    if not ok:
+        raise RuntimeError(f"图片编码失败: {image_format}")
+    return extension, data
+
+
+class ScreenshotService:
+    """异步截图服务
+
+    capture() 在调用线程抓屏、叠加图层后立即返回 Future，编码和写盘在工作线程中完成；
+    on_saved(path, size_bytes, seconds) / on_error(exception) 在工作线程中回调，界面需自行切回主线程。
+    """
+
+    def __init__(self, output_dir, image_format="png", workers=SCREENSHOT_WORKERS,
+                 on_saved=None, on_error=None):
+        if image_format not in SCREENSHOT_ENCODE_PARAMS:
+            raise ValueError(f"不支持的截图格式: {image_format}")
+        self.output_dir = output_dir
+        self.image_format = image_format
+        self.on_saved = on_saved
+        self.on_error = on_error
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="screenshot")
+        self._lock = threading.Lock()
+        self._last_name = None
+        self._sequence = 0
+
+        # 统计信息
+        self.submitted = 0
+        self.saved = 0
+        self.failed = 0
+        self.bytes_written = 0
+
+    def _next_path(self, extension):
+        """按时间生成不重复的文件名（同一秒内多次截图追加序号）"""
+        name = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        with self._lock:
+            if name == self._last_name:
+                self._sequence += 1
+                name = f"{name}_{self._sequence}"
+            else:
+                self._last_name = name
+                self._sequence = 0
+        return os.path.join(self.output_dir, name + extension)
+
+    def capture(self, grab, process=None, image_format=None):
+        """抓取一帧并提交编码
+
+        grab() 返回新分配的帧（由本服务持有），process(frame) 原地叠加画图等图层。
+        """
+        frame = grab()
+        if process is not None:
+            frame = process(frame)
+        return self.submit(frame, image_format)
+
+    def submit(self, frame, image_format=None):
+        """提交一帧编码保存，返回 Future（结果为文件路径）；frame 提交后不得再修改"""
+        image_format = image_format or self.image_format
+        path = self._next_path(SCREENSHOT_ENCODE_PARAMS[image_format][0])
+        with self._lock:
+            self.submitted += 1
+        return self._executor.submit(self._save, frame, image_format, path, time.perf_counter())
+
+    def _save(self, frame, image_format, path, submitted_at):
+        """工作线程: 编码并写盘"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _, data = encode_image(frame, image_format)
+            # tofile 支持包含中文的路径
+            data.tofile(path)
+            with self._lock:
+                self.saved += 1
+                self.bytes_written += data.nbytes
+            if self.on_saved is not None:
+                self.on_saved(path, data.nbytes, time.perf_counter() - submitted_at)
+            return path
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            if self.on_error is not None:
+                self.on_error(e)
+            raise
+
+    def pending(self):
+        """尚未完成的截图数"""
+        with self._lock:
+            return self.submitted - self.saved - self.failed
+
+    def close(self, wait=True):
+        """关闭工作线程池（默认等待已提交的截图保存完成）"""
+        self._executor.shutdown(wait=wait)
+
+    def stats(self):
+        """返回截图统计信息"""
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "saved": self.saved,
+                "failed": self.failed,
+                "pending": self.submitted - self.saved - self.failed,
+                "bytes": self.bytes_written
+            }
+
+
+def _encode_spooled(frame, path, image_format):
+    """线程池任务: 编码连拍缓存中的一帧并保存，返回写入的字节数"""
+    _, data = encode_image(np.asarray(frame), image_format)
+    data.tofile(path)
+    return data.nbytes
+
+
+class BurstCapture:
+    """连拍
+
+    后台线程按 interval 的截止时间（FramePacer）抓屏，帧直接写入内存映射缓存文件中的对应位置，
+    抓屏期间不编码；抓取结束后用线程池把缓存中的每一帧编码为图片，完成后删除缓存文件。
+    on_done(stats) 在后台线程中回调，stats 中 captured / encoded 分别为抓到和编码成功的帧数。
+    """
+
+    def __init__(self, output_dir, spool_dir, interval=0.2, duration=10, bbox=None,
+                 backend=None, backend_name="auto", compositor=None, process=None,
+                 image_format="png", workers=BURST_WORKERS, on_done=None):
+        if image_format not in SCREENSHOT_ENCODE_PARAMS:
+            raise ValueError(f"不支持的截图格式: {image_format}")
+        self.output_dir = output_dir
+        self.spool_dir = spool_dir
+        self.interval = float(interval)
+        self.capacity = int(math.ceil(duration / self.interval)) + 1
+        self.bbox = bbox
+        self.backend = backend
+        self.backend_name = backend_name
+        self.compositor = compositor
+        self.process = process
+        self.image_format = image_format
+        self.workers = workers
+        self.on_done = on_done
+        self.spool_path = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # 统计信息
+        self.frames_captured = 0
+        self.frames_encoded = 0
+        self.frames_failed = 0
+        self.deadlines_missed = 0
+        self.bytes_written = 0
+        self.capture_seconds = 0.0
+        self.encode_seconds = 0.0
+
+    def start(self):
+        """启动连拍线程"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """提前结束抓屏（已抓到的帧照常编码）"""
+        self._stop_event.set()
+
+    def join(self, timeout=None):
+        """等待连拍（含编码）完成"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _frame_shape(self, backend):
+        """单帧形状"""
+        if self.compositor is not None:
+            return self.compositor.frame_shape("bgr")
+        return backend.frame_shape(self.bbox, "bgr")
+
+    def _grab_into(self, backend, view):
+        """把一帧抓取到缓存文件中的 view 上"""
+        if self.compositor is not None:
+            grabbed = self.compositor.grab(backend, out=view)
+        else:
+            grabbed = backend.grab(self.bbox, out=view)
+        if grabbed is not view:
+            height = min(view.shape[0], grabbed.shape[0])
+            width = min(view.shape[1], grabbed.shape[1])
+            view[:height, :width] = grabbed[:height, :width]
+        if self.process is not None:
+            self.process(view)
+
+    def _open_spool(self, frame_shape):
+        """创建连拍缓存文件，空间不足时抛出异常"""
+        shape = (self.capacity,) + tuple(frame_shape)
+        size = int(np.prod(shape))
+        os.makedirs(self.spool_dir, exist_ok=True)
+        free = shutil.disk_usage(self.spool_dir).free
+        if free < size:
+            raise RuntimeError(f"连拍缓存空间不足: 需要 {size / 1024 ** 2:.0f} MB，"
+                               f"可用 {free / 1024 ** 2:.0f} MB")
+        self.spool_path = os.path.join(self.spool_dir, f"burst_{os.getpid()}_{id(self)}.spool")
+        return np.memmap(self.spool_path, dtype=np.uint8, mode="w+", shape=shape)
+
+    def _capture(self, backend):
+        """抓屏阶段，返回写满（或提前结束）的缓存"""
+        spool = self._open_spool(self._frame_shape(backend))
+        pacer = FramePacer(1.0 / self.interval)
+        started = time.perf_counter()
+        # 按帧位计数: 抓屏跟不上时跳过的帧位计为错过，总时长仍为 duration
+        while pacer.slots_filled < self.capacity and not self._stop_event.is_set():
+            capture_time = pacer.wait()
+            self._grab_into(backend, spool[self.frames_captured])
+            self.frames_captured += 1
+            self.deadlines_missed += max(0, pacer.commit(capture_time) - 1)
+        spool.flush()
+        self.capture_seconds = time.perf_counter() - started
+        return spool
+
+    def _encode(self, shape):
+        """编码阶段: 线程池逐帧编码，各线程共用一个只读映射"""
+        started = time.perf_counter()
+        folder = os.path.join(self.output_dir, f"burst_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        os.makedirs(folder, exist_ok=True)
+        extension = SCREENSHOT_ENCODE_PARAMS[self.image_format][0]
+        spool = np.memmap(self.spool_path, dtype=np.uint8, mode="r", shape=shape)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="burst-encode") as executor:
+            futures = [
+                executor.submit(_encode_spooled, spool[index],
+                                os.path.join(folder, f"burst_{index + 1:04d}{extension}"), self.image_format)
+                for index in range(self.frames_captured)
+            ]
+            for future in as_completed(futures):
+                try:
+                    self.bytes_written += future.result()
+                    self.frames_encoded += 1
+                except Exception as e:
+                    self.frames_failed += 1
+                    print(f"❌ 连拍帧编码失败: {e}")
+            del futures
+        # 关闭只读映射后才能删除缓存文件
+        del spool
+        self.encode_seconds = time.perf_counter() - started
+        return folder
+
+    def _run(self):
+        """连拍线程"""
+        folder = None
+        try:
+            if self.backend is not None:
+                spool = self._capture(self.backend)
+            else:
+                with create_capture_backend(self.backend_name) as backend:
+                    spool = self._capture(backend)
+            shape = spool.shape
+            # 先关闭写入映射（Windows 上映射未关闭时无法删除文件），编码阶段重新以只读方式映射
+            del spool
+            folder = self._encode(shape)
+        except Exception as e:
+            print(f"❌ 连拍错误: {e}")
+        finally:
+            if self.spool_path and os.path.exists(self.spool_path):
+                try:
+                    os.remove(self.spool_path)
+                except OSError as e:
+                    print(f"⚠️ 删除连拍缓存失败: {e}")
+        stats = self.stats()
+        stats["folder"] = folder
+        if self.on_done is not None:
+            self.on_done(stats)
+
+    def stats(self):
+        """返回连拍统计信息"""
+        return {
+            "captured": self.frames_captured,
+            "encoded": self.frames_encoded,
+            "failed": self.frames_failed,
+            "missed": self.deadlines_missed,
+            "bytes": self.bytes_written,
+            "capture_seconds": self.capture_seconds,
+            "encode_seconds": self.encode_seconds
+        }
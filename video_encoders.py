@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Super Hi Vision - 视频编码后端
+编码器对外提供与 cv2.VideoWriter 相同的 write / release / isOpened 接口:
+- OpenCVVideoEncoder: 封装 cv2.VideoWriter，只接受 BGR 帧
+- FFmpegPipeEncoder: 通过 rawvideo 管道把原始帧送入常驻 FFmpeg 进程，
+  可直接接受捕获后端的原生 BGRA 帧，省去 cv2.cvtColor 颜色转换；
+  按 SUPPORTED_CODECS / QUALITY_PRESETS 一次编码出最终文件，录制结束后无需二次压缩；
+  启用实时混流时音频块经本地回环连接作为第二路输入同步写入，停止录制即得到成品文件；
+  可变帧率模式下帧带着抓取时间戳封装成 Matroska 流送入 FFmpeg，输出文件使用真实 PTS
+"""
+
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import threading
+from collections import deque
+
+import cv2
+
+from capture_backends import PIXEL_FORMATS
+
+# 支持的视频编码器
+SUPPORTED_CODECS = {
+    "H.264 (libx264)": "libx264",
+    "H.265/HEVC (libx265)": "libx265",
+    "MPEG-4 (mpeg4)": "mpeg4",
+    "VP8 (libvpx)": "libvpx",
+    "VP9 (libvpx-vp9)": "libvpx-vp9",
+    "AV1 (libaom-av1)": "libaom-av1"
+}
+
+# 录制质量配置，包括蓝光选项
+QUALITY_PRESETS = {
+    "low": {"fps": 15, "bitrate": "500k", "crf": 30},
+    "medium": {"fps": 30, "bitrate": "2000k", "crf": 25},
+    "high": {"fps": 30, "bitrate": "5000k", "crf": 20},
+    "ultra": {"fps": 60, "bitrate": "10000k", "crf": 18},
+    "bluray": {"fps": 60, "bitrate": "25000k", "crf": 15}  # 蓝光配置
+}
+
+# 各容器格式可以封装的编码器（未列出的容器不做限制）
+CONTAINER_CODECS = {
+    "mp4": ("libx264", "libx265", "mpeg4", "libvpx-vp9", "libaom-av1"),
+    "mov": ("libx264", "libx265", "mpeg4"),
+    "flv": ("libx264",),
+    "avi": ("libx264", "mpeg4", "libvpx", "libvpx-vp9")
+}
+
+# 像素格式 -> FFmpeg rawvideo 像素格式
+FFMPEG_PIXEL_FORMATS = {
+    "bgr": "bgr24",
+    "bgra": "bgra"
+}
+
+# 帧率模式（界面显示名称 -> 模式名称）
+FRAME_RATE_MODES = {
+    "恒定帧率 (CFR)": "cfr",
+    "可变帧率 (VFR)": "vfr"
+}
+
+# 像素格式 -> Matroska V_UNCOMPRESSED 的 ColourSpace FourCC
+MATROSKA_FOURCC = {
+    "bgr": b"BGR\x18",
+    "bgra": b"BGRA"
+}
+
+
+def ffmpeg_available():
+    """检查系统是否安装了 FFmpeg"""
+    return shutil.which("ffmpeg") is not None
+
+
+def resolve_codec(output_file, codec):
+    """检查编码器能否封装进输出文件的容器，不兼容时回退到 libx264"""
+    ext = os.path.splitext(output_file)[1].lstrip('.').lower()
+    allowed = CONTAINER_CODECS.get(ext)
+    if allowed is not None and codec not in allowed:
+        print(f"⚠️ {ext.upper()} 容器不支持 {codec}，改用 libx264")
+        return "libx264"
+    return codec
+
+
+def codec_quality_args(codec, crf=None, bitrate=None, preset="veryfast"):
+    """按编码器生成质量参数：CRF 控制画质，码率作为峰值上限"""
+    args = []
+    if codec in ('libx264', 'libx265'):
+        args += ['-preset', preset]
+        if crf is not None:
+            args += ['-crf', str(crf)]
+        if bitrate:
+            bufsize = f"{int(bitrate.rstrip('kK')) * 2}k"
+            args += ['-maxrate', bitrate, '-bufsize', bufsize]
+    elif codec in ('libvpx', 'libvpx-vp9', 'libaom-av1'):
+        # 实时编码速度，CRF + 目标码率即受限质量模式
+        if codec == 'libaom-av1':
+            args += ['-cpu-used', '8', '-row-mt', '1']
+        else:
+            args += ['-deadline', 'realtime', '-cpu-used', '8']
+        if crf is not None:
+            args += ['-crf', str(crf)]
+        args += ['-b:v', bitrate or '0']
+    elif bitrate:
+        # mpeg4 等不支持 CRF 的编码器使用固定码率
+        args += ['-b:v', bitrate]
+    return args
+
+
+def _ebml_size(size):
+    """EBML 长度字段，统一使用 8 字节编码"""
+    return b"\x01" + size.to_bytes(7, "big")
+
+
+def _ebml_element(element_id, payload):
+    """生成一个 EBML 元素（element_id 为含长度标记的原始 ID 字节）"""
+    return element_id + _ebml_size(len(payload)) + payload
+
+
+def _ebml_uint(element_id, value):
+    """生成无符号整数元素"""
+    return _ebml_element(element_id, int(value).to_bytes(8, "big"))
+
+
+def matroska_header(width, height, pixel_format):
+    """生成只含一条未压缩视频轨的 Matroska 头（时间刻度为 1 毫秒，Segment 长度未知）"""
+    ebml = _ebml_element(b"\x1a\x45\xdf\xa3", b"".join([
+        _ebml_uint(b"\x42\x86", 1),            # EBMLVersion
+        _ebml_uint(b"\x42\xf7", 1),            # EBMLReadVersion
+        _ebml_uint(b"\x42\xf2", 4),            # EBMLMaxIDLength
+        _ebml_uint(b"\x42\xf3", 8),            # EBMLMaxSizeLength
+        _ebml_element(b"\x42\x82", b"matroska"),  # DocType
+        _ebml_uint(b"\x42\x87", 4),            # DocTypeVersion
+        _ebml_uint(b"\x42\x85", 2)             # DocTypeReadVersion
+    ]))
+    info = _ebml_element(b"\x15\x49\xa9\x66", b"".join([
+        _ebml_uint(b"\x2a\xd7\xb1", 1000000),  # TimestampScale: 1ms
+        _ebml_element(b"\x4d\x80", b"Super Hi Vision"),  # MuxingApp
+        _ebml_element(b"\x57\x41", b"Super Hi Vision")   # WritingApp
+    ]))
+    video = _ebml_element(b"\xe0", b"".join([
+        _ebml_uint(b"\xb0", width),             # PixelWidth
+        _ebml_uint(b"\xba", height),            # PixelHeight
+        _ebml_element(b"\x2e\xb5\x24", MATROSKA_FOURCC[pixel_format])  # ColourSpace
+    ]))
+    track = _ebml_element(b"\xae", b"".join([
+        _ebml_uint(b"\xd7", 1),                 # TrackNumber
+        _ebml_uint(b"\x73\xc5", 1),            # TrackUID
+        _ebml_uint(b"\x83", 1),                 # TrackType: video
+        _ebml_uint(b"\x9c", 0),                 # FlagLacing
+        _ebml_element(b"\x86", b"V_UNCOMPRESSED"),  # CodecID
+        video
+    ]))
+    tracks = _ebml_element(b"\x16\x54\xae\x6b", track)
+    segment = b"\x18\x53\x80\x67" + b"\x01\xff\xff\xff\xff\xff\xff\xff"
+    return ebml + segment + info + tracks
+
+
+def matroska_frame_header(timestamp_ms, frame_size):
+    """生成单帧 Cluster 的头部（Cluster + Timestamp + SimpleBlock 头），帧数据紧随其后"""
+    cluster_time = _ebml_uint(b"\xe7", timestamp_ms)
+    # SimpleBlock: 轨道号 1、相对时间 0、关键帧标记
+    block_head = b"\x81" + struct.pack(">hB", 0, 0x80)
+    block = b"\xa3" + _ebml_size(len(block_head) + frame_size) + block_head
+    cluster_size = len(cluster_time) + len(block) + frame_size
+    return b"\x1f\x43\xb6\x75" + _ebml_size(cluster_size) + cluster_time + block
+
+
+def negotiate_pixel_format(native_format, accepted_formats):
+    """协商帧格式：编码器能直接接受捕获后端的原生格式时使用原生格式，否则统一为 BGR"""
+    if native_format in accepted_formats:
+        return native_format
+    return "bgr"
+
+
+class OpenCVVideoEncoder:
+    """cv2.VideoWriter 编码器（输出未按质量预设压缩，录制后需要再压缩一次）"""
+    accepted_formats = ("bgr",)
+    needs_compression = True
+
+    def __init__(self, output_file, fourcc, fps, size):
+        self.output_file = output_file
+        self.pixel_format = "bgr"
+        self._writer = cv2.VideoWriter(output_file, cv2.VideoWriter_fourcc(*fourcc), fps, tuple(size))
+
+    def isOpened(self):
+        return self._writer.isOpened()
+
+    def write(self, frame, timestamp=None):
+        """写入一帧（恒定帧率，忽略时间戳）"""
+        self._writer.write(frame)
+
+    def release(self):
+        """关闭视频文件"""
+        self._writer.release()
+
+
+class FFmpegPipeEncoder:
+    """FFmpeg rawvideo 管道编码器
+
+    原始帧按 pixel_format 直接写入 FFmpeg 标准输入，由 FFmpeg 完成颜色空间转换和编码，
+    编码器与 crf / bitrate 直接决定最终文件，不再需要录制后的压缩步骤。
+
+    传入 audio_format={"rate": 44100, "channels": 1} 时开启实时混流:
+    FFmpeg 以客户端身份连接本地回环端口作为第二路 s16le 输入，write_audio()
+    写入的 PCM 数据直接编码为 AAC，不再生成临时 WAV 也无需录制后合并。
+    （Windows 上没有 mkfifo，因此用回环 TCP 代替命名管道。）
+
+    vfr=True 时每帧按 write(frame, timestamp) 传入的抓取时间戳（秒）写入:
+    管道内容是 V_UNCOMPRESSED 的 Matroska 流，FFmpeg 以 -vsync vfr 保留原始 PTS，
+    画面静止或抓屏变慢时不必重复写帧，播放速度也不会失真。
+    """
+    accepted_formats = ("bgra", "bgr")
+    needs_compression = False
+
+    def __init__(self, output_file, size, fps, pixel_format="bgr", codec="libx264",
+                 crf=None, bitrate=None, preset="veryfast", audio_format=None, vfr=False):
+        if pixel_format not in self.accepted_formats:
+            raise ValueError(f"FFmpeg 管道不支持像素格式: {pixel_format}")
+        self.output_file = output_file
+        self.width, self.height = (int(v) for v in size)
+        self.fps = fps
+        self.pixel_format = pixel_format
+        self.codec = resolve_codec(output_file, codec)
+        self.crf = crf
+        self.bitrate = bitrate
+        self.preset = preset
+        self.audio_format = audio_format
+        self.vfr = vfr
+        self.frames_written = 0
+        self._last_timestamp_ms = -1
+        self.process = None
+        self._stderr_tail = deque(maxlen=20)
+        self._stderr_thread = None
+
+        # 实时混流的音频连接
+        self._audio_server = None
+        self._audio_conn = None
+        self._audio_closed = False
+        self._audio_ready = threading.Event()
+        self._audio_lock = threading.Lock()
+        self.audio_bytes_written = 0
+
+        self.open()
+
+    @property
+    def live_audio(self):
+        """是否启用了实时音频混流"""
+        return self.audio_format is not None
+
+    def build_command(self):
+        """生成 FFmpeg 命令行"""
+        cmd = ['ffmpeg', '-y', '-loglevel', 'error']
+        if self.vfr:
+            # 帧格式和时间戳由 Matroska 流自身携带
+            cmd += ['-f', 'matroska']
+        else:
+            cmd += [
+                '-f', 'rawvideo',
+                '-pix_fmt', FFMPEG_PIXEL_FORMATS[self.pixel_format],
+                '-s', f'{self.width}x{self.height}',
+                '-r', str(self.fps)
+            ]
+        cmd += ['-thread_queue_size', '512', '-i', '-']
+        if self.live_audio:
+            port = self._audio_server.getsockname()[1]
+            # 原始 PCM 无需探测；默认会先缓冲 5 秒音频，期间视频管道被阻塞
+            cmd += [
+                '-analyzeduration', '0',
+                '-probesize', '32',
+                '-f', 's16le',
+                '-ar', str(self.audio_format["rate"]),
+                '-ac', str(self.audio_format["channels"]),
+                '-thread_queue_size', '512',
+                '-i', f'tcp://127.0.0.1:{port}',
+                '-c:a', 'aac',
+                '-b:a', '128k'
+            ]
+        else:
+            cmd += ['-an']
+        if self.vfr:
+            cmd += ['-vsync', 'vfr']
+        cmd += ['-c:v', self.codec]
+        cmd += codec_quality_args(self.codec, self.crf, self.bitrate, self.preset)
+        if self.codec == 'libx265' and self.output_file.lower().endswith(('.mp4', '.mov')):
+            # 使用 hvc1 标记，兼容 QuickTime / Safari 播放
+            cmd += ['-tag:v', 'hvc1']
+        # yuv420p 要求宽高为偶数，奇数尺寸时补齐一像素
+        cmd += [
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            '-pix_fmt', 'yuv420p'
+        ]
+        cmd += self.output_args()
+        return cmd
+
+    def output_args(self):
+        """输出部分的命令行参数（子类可改为分段输出等）"""
+        return [self.output_file]
+
+    def open(self):
+        """启动 FFmpeg 进程"""
+        if self.live_audio:
+            # 先监听回环端口，FFmpeg 启动后主动连接
+            self._audio_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._audio_server.bind(('127.0.0.1', 0))
+            self._audio_server.listen(1)
+            self._audio_server.settimeout(10.0)
+            threading.Thread(target=self._accept_audio, daemon=True).start()
+
+        try:
+            self.process = subprocess.Popen(
+                self.build_command(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE
+            )
+        except OSError as e:
+            print(f"❌ 启动FFmpeg失败: {e}")
+            self.process = None
+            if self._audio_server is not None:
+                self._audio_server.close()
+            return False
+
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+
+        if self.vfr:
+            self.process.stdin.write(matroska_header(self.width, self.height, self.pixel_format))
+        return True
+
+    def _accept_audio(self):
+        """等待 FFmpeg 连接音频输入"""
+        try:
+            conn, _ = self._audio_server.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._audio_lock:
+                if self._audio_closed:
+                    # 连接建立前音频已结束：立即发送 EOF
+                    conn.shutdown(socket.SHUT_WR)
+                    conn.close()
+                else:
+                    self._audio_conn = conn
+        except OSError as e:
+            print(f"❌ FFmpeg音频输入连接失败: {e}")
+        finally:
+            self._audio_server.close()
+            self._audio_ready.set()
+
+    def write_audio(self, data):
+        """写入一块 s16le PCM 音频数据"""
+        if not self.live_audio or not self._audio_ready.wait(timeout=5.0):
+            return False
+        with self._audio_lock:
+            if self._audio_conn is None:
+                return False
+            self._audio_conn.sendall(data)
+            self.audio_bytes_written += len(data)
+        return True
+
+    def close_audio(self):
+        """结束音频输入（FFmpeg 收到 EOF 后只继续编码视频）"""
+        with self._audio_lock:
+            self._audio_closed = True
+            if self._audio_conn is not None:
+                try:
+                    self._audio_conn.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+                self._audio_conn.close()
+                self._audio_conn = None
+
+    def _drain_stderr(self):
+        """持续读取 FFmpeg 错误输出，避免管道写满阻塞"""
+        for line in iter(self.process.stderr.readline, b''):
+            self._stderr_tail.append(line.decode('utf-8', errors='replace').rstrip())
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() is None
+
+    def write(self, frame, timestamp=None):
+        """写入一帧原始数据（timestamp 为抓取时间，单位秒，仅 VFR 模式使用）"""
+        if frame.shape[2] != PIXEL_FORMATS[self.pixel_format]:
+            raise ValueError(f"帧通道数 {frame.shape[2]} 与协商的像素格式 {self.pixel_format} 不一致")
+        if frame.shape[0] != self.height or frame.shape[1] != self.width:
+            frame = cv2.resize(frame, (self.width, self.height))
+        if not frame.flags['C_CONTIGUOUS']:
+            frame = frame.copy()
+
+        if self.vfr:
+            if timestamp is None:
+                timestamp = self.frames_written / self.fps
+            # 时间戳必须严格递增（毫秒精度）
+            timestamp_ms = max(int(round(timestamp * 1000)), self._last_timestamp_ms + 1)
+            self._last_timestamp_ms = timestamp_ms
+            self.process.stdin.write(matroska_frame_header(timestamp_ms, frame.nbytes))
+        self.process.stdin.write(frame.data)
+        self.frames_written += 1
+
+    def release(self):
+        """关闭管道并等待 FFmpeg 写完文件"""
+        self.close_audio()
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        if self._stderr_thread:
+            self._stderr_thread.join(timeout=1.0)
+        if self.process.returncode != 0:
+            print(f"❌ FFmpeg编码失败 (返回码 {self.process.returncode}): "
+                  f"{' | '.join(self._stderr_tail)}")
+        self.process = None